@@ -1,4 +1,4 @@
-from flask import Flask, render_template, redirect, url_for, request, session, flash
+from flask import Flask, render_template, redirect, url_for, request, session, flash, jsonify
 from werkzeug.utils import secure_filename
 import os
 import sqlite3
@@ -8,23 +8,101 @@ from dotenv import load_dotenv
 def create_app():
 
     app = Flask(__name__)
+    from features.uploads import UploadRequest
+    app.request_class = UploadRequest
     load_dotenv()
     app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'dev-secret-change-me')
-    app.config['DATABASE'] = os.path.join(app.root_path, 'dermaai.db')
-    app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
-    app.config['MODELS_DIR'] = os.path.join(app.root_path, 'models')
+    app.config['DATABASE'] = os.getenv('DATABASE', os.path.join(app.root_path, 'dermaai.db'))
+    # Idle SQLite connections kept open between requests (0 opens one per request)
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', '8'))
+    # Content-addressed upload store (features/uploads.py), served from /uploads rather than /static
+    app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', os.path.join(app.root_path, 'uploads'))
+    app.config['UPLOAD_QUOTA_MB'] = float(os.getenv('UPLOAD_QUOTA_MB', '512'))
+    app.config['UPLOAD_MAX_AGE_DAYS'] = float(os.getenv('UPLOAD_MAX_AGE_DAYS', '30'))
+    app.config['UPLOAD_THUMB_SIZE'] = int(os.getenv('UPLOAD_THUMB_SIZE', '256'))
+    app.config['MODELS_DIR'] = os.getenv('MODELS_DIR', os.path.join(app.root_path, 'models'))
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
+    # Keep uploaded originals: async (background write), sync, or off
+    app.config['UPLOAD_PERSIST'] = os.getenv('UPLOAD_PERSIST', 'async')
+    # Opt-in micro-batching of concurrent predictions (features/batching.py)
+    app.config['INFERENCE_BATCHING'] = os.getenv('INFERENCE_BATCHING', '0') == '1'
+    app.config['INFERENCE_BATCH_MAX_SIZE'] = int(os.getenv('INFERENCE_BATCH_MAX_SIZE', '8'))
+    app.config['INFERENCE_BATCH_MAX_WAIT_MS'] = float(os.getenv('INFERENCE_BATCH_MAX_WAIT_MS', '5'))
+    # When to load and warm up the models: eager (inside create_app), background or lazy (first request or /readyz probe)
+    app.config['MODEL_PRELOAD'] = os.getenv('MODEL_PRELOAD', 'background')
+    # A model that failed to load is retried once its file changes, or after this many seconds
+    app.config['MODEL_RETRY_SECONDS'] = float(os.getenv('MODEL_RETRY_SECONDS', '30'))
+    # Runtime serving the models: keras, or tflite / onnx files made by `python -m features.export_models`
+    app.config['INFERENCE_BACKEND'] = os.getenv('INFERENCE_BACKEND', 'keras')
+    # float, or a quantized variant made by `python -m features.quantize_models` (int8 / fp16)
+    app.config['MODEL_VARIANT'] = os.getenv('MODEL_VARIANT', 'float')
+    # Test-time augmentation: views of each upload (flips, crops, rotations) classified in one batch and averaged
+    app.config['TTA_VIEWS'] = int(os.getenv('TTA_VIEWS', '1'))
+    # Seconds between checks of MODELS_DIR for replaced model files, swapped in without a restart (0 = off)
+    app.config['MODEL_WATCH_SECONDS'] = float(os.getenv('MODEL_WATCH_SECONDS', '0'))
+    # A/B serving: "skin=file.keras,nail=file.keras" candidates (in MODELS_DIR) get this share of requests
+    app.config['MODEL_CANDIDATES'] = {
+        name.strip(): os.path.join(app.config['MODELS_DIR'], filename.strip())
+        for name, _, filename in (item.partition('=') for item in os.getenv('MODEL_CANDIDATES', '').split(','))
+        if name.strip() and filename.strip()
+    }
+    app.config['MODEL_CANDIDATE_PERCENT'] = float(os.getenv('MODEL_CANDIDATE_PERCENT', '0'))
+    # Run forward passes inline, or in a pool of worker processes (features/executor.py)
+    app.config['INFERENCE_EXECUTOR'] = os.getenv('INFERENCE_EXECUTOR', 'inline')
+    app.config['INFERENCE_WORKERS'] = int(os.getenv('INFERENCE_WORKERS', '2'))
+    app.config['INFERENCE_TIMEOUT'] = float(os.getenv('INFERENCE_TIMEOUT', '30'))
+    app.config['INFERENCE_QUEUE_SIZE'] = int(os.getenv('INFERENCE_QUEUE_SIZE', '16'))
+    # Asynchronous JSON prediction jobs (/skin/api/predict, /nail/api/predict)
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', '2'))
+    app.config['JOB_BATCH_SIZE'] = int(os.getenv('JOB_BATCH_SIZE', '16'))
+    app.config['JOB_MAX_IMAGES'] = int(os.getenv('JOB_MAX_IMAGES', '64'))
+    app.config['JOB_TTL_SECONDS'] = int(os.getenv('JOB_TTL_SECONDS', '3600'))
+    # Prediction cache keyed by image hash + model version (features/prediction_cache.py)
+    app.config['PREDICTION_CACHE_SIZE'] = int(os.getenv('PREDICTION_CACHE_SIZE', '512'))
+    app.config['PREDICTION_CACHE_DB'] = (os.path.join(os.path.dirname(app.config['DATABASE']), 'prediction_cache.db')
+                                         if os.getenv('PREDICTION_CACHE_PERSIST', '0') == '1' else None)
+    app.config['PREDICTION_CACHE_DB_MAX_ENTRIES'] = int(os.getenv('PREDICTION_CACHE_DB_MAX_ENTRIES', '10000'))
+
+    # Groq LLM fallback of the chatbot (features/llm_client.py); the URL can point at a local stub
+    app.config['GROQ_API_URL'] = os.getenv('GROQ_API_URL', 'https://api.groq.com/openai/v1/chat/completions')
+    app.config['LLM_CONNECT_TIMEOUT'] = float(os.getenv('LLM_CONNECT_TIMEOUT', '3.05'))
+    app.config['LLM_READ_TIMEOUT'] = float(os.getenv('LLM_READ_TIMEOUT', '30'))
+    app.config['LLM_MAX_RETRIES'] = int(os.getenv('LLM_MAX_RETRIES', '2'))
+    app.config['LLM_MAX_CONCURRENCY'] = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+    # Gemini routine generation (features/routine.py): cached by normalized inputs, coalesced, bounded in time
+    app.config['ROUTINE_CACHE_SIZE'] = int(os.getenv('ROUTINE_CACHE_SIZE', '256'))
+    app.config['ROUTINE_CACHE_TTL_SECONDS'] = float(os.getenv('ROUTINE_CACHE_TTL_SECONDS', '21600'))
+    app.config['GEMINI_TIMEOUT'] = float(os.getenv('GEMINI_TIMEOUT', '20'))
+    app.config['GEMINI_MAX_CONCURRENCY'] = int(os.getenv('GEMINI_MAX_CONCURRENCY', '4'))
+    # Routine PDF downloads (features/pdf.py): rendered once per distinct plan, optionally right after generation
+    app.config['PDF_CACHE_SIZE'] = int(os.getenv('PDF_CACHE_SIZE', '64'))
+    app.config['PDF_CACHE_TTL_SECONDS'] = float(os.getenv('PDF_CACHE_TTL_SECONDS', '3600'))
+    app.config['PDF_PRERENDER'] = os.getenv('PDF_PRERENDER', '0') == '1'
+    # Chatbot conversations kept server-side (features/chat_store.py): sqlite or memory
+    app.config['CHAT_STORE'] = os.getenv('CHAT_STORE', 'sqlite')
+    app.config['CHAT_HISTORY_WINDOW'] = int(os.getenv('CHAT_HISTORY_WINDOW', '6'))
+    app.config['CHAT_STORE_FLUSH_MS'] = float(os.getenv('CHAT_STORE_FLUSH_MS', '200'))
+    app.config['CHAT_STORE_MAX_CONVERSATIONS'] = int(os.getenv('CHAT_STORE_MAX_CONVERSATIONS', '10000'))
+    app.config['CHAT_STORE_IDLE_SECONDS'] = float(os.getenv('CHAT_STORE_IDLE_SECONDS', '86400'))
+    app.config['CHAT_STORE_RETENTION_DAYS'] = int(os.getenv('CHAT_STORE_RETENTION_DAYS', '30'))
+    # Cache of LLM replies keyed by the normalized question (features/response_cache.py)
+    app.config['LLM_CACHE_SIZE'] = int(os.getenv('LLM_CACHE_SIZE', '512'))
+    app.config['LLM_CACHE_TTL_SECONDS'] = float(os.getenv('LLM_CACHE_TTL_SECONDS', '86400'))
+    app.config['LLM_CACHE_SIMILARITY'] = float(os.getenv('LLM_CACHE_SIMILARITY', '1'))
+    app.config['LLM_CACHE_DB'] = (os.path.join(os.path.dirname(app.config['DATABASE']), 'llm_cache.db')
+                                  if os.getenv('LLM_CACHE_PERSIST', '0') == '1' else None)
+    app.config['LLM_CACHE_DB_MAX_ENTRIES'] = int(os.getenv('LLM_CACHE_DB_MAX_ENTRIES', '10000'))
+    # Per-stage latency histograms and request counters served at /metrics (features/metrics.py)
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '1') == '1'
 
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-    # Database helpers
-    def get_db_connection():
-        conn = sqlite3.connect(app.config['DATABASE'])
-        conn.row_factory = sqlite3.Row
-        return conn
+    # Database helpers: pooled connections, one per request (features/db.py)
+    from features.db import init_app as init_db_pool, get_db
+    db_pool = init_db_pool(app)
 
     def init_db():
-        conn = get_db_connection()
+        conn = db_pool.acquire()
         cursor = conn.cursor()
         cursor.execute(
             """
@@ -38,7 +116,7 @@ def create_app():
             """
         )
         conn.commit()
-        conn.close()
+        db_pool.release(conn)
 
     # Initialize database once at startup (Flask 3.x removed before_first_request)
     init_db()
@@ -86,9 +164,8 @@ def create_app():
             email = request.form.get('email')
             password = request.form.get('password')
             next_target = _normalize_next(request.form.get('next') or request.args.get('next', ''))
-            conn = get_db_connection()
+            conn = get_db()
             user = conn.execute('SELECT * FROM users WHERE email=? AND password=?', (email, password)).fetchone()
-            conn.close()
             if user:
                 session['user_id'] = user['id']
                 session['user_email'] = user['email']
@@ -106,7 +183,7 @@ def create_app():
             last_name = request.form.get('lastName')
             email = request.form.get('email')
             password = request.form.get('password')
-            conn = get_db_connection()
+            conn = get_db()
             try:
                 conn.execute(
                     'INSERT INTO users (first_name, last_name, email, password) VALUES (?, ?, ?, ?)',
@@ -117,9 +194,8 @@ def create_app():
                 # Show message on signup page, then auto-redirect via JS
                 return render_template('signup.html', redirect_to_login=True)
             except sqlite3.IntegrityError:
+                conn.rollback()
                 flash('Email already registered', 'error')
-            finally:
-                conn.close()
         return render_template('signup.html', redirect_to_login=False)
 
     @app.route('/logout')
@@ -133,11 +209,73 @@ def create_app():
     from features.nail import nail_bp
     from features.chatbot import chatbot_bp
     from features.routine import routine_bp
+    from features.uploads import uploads_bp
+    from features.analyze import analyze_bp
 
     app.register_blueprint(skin_bp, url_prefix='/skin')
     app.register_blueprint(nail_bp, url_prefix='/nail')
     app.register_blueprint(chatbot_bp, url_prefix='/chat')
     app.register_blueprint(routine_bp, url_prefix='/routine')
+    app.register_blueprint(uploads_bp, url_prefix='/uploads')
+    app.register_blueprint(analyze_bp, url_prefix='/analyze')
+
+    # Load the models registered by the feature blueprints
+    from features.ml_utils import model_registry
+    from features.executor import inference_executor
+    inference_executor.init_app(app, model_registry.model_paths(app.config['MODELS_DIR']))
+    model_registry.init_app(app)
+
+    from features.prediction_cache import prediction_cache
+    prediction_cache.init_app(app)
+
+    from features.jobs import job_store
+    job_store.init_app(app)
+
+    from features.uploads import upload_store
+    upload_store.init_app(app)
+
+    from features.llm_client import llm_client
+    llm_client.init_app(app)
+
+    from features.response_cache import response_cache
+    response_cache.init_app(app)
+
+    from features.chat_store import chat_store
+    chat_store.init_app(app)
+
+    from features.routine import routine_planner
+    routine_planner.init_app(app)
+
+    from features.pdf import routine_pdf
+    routine_pdf.init_app(app)
+
+    from features.metrics import metrics
+    metrics.init_app(app)
+
+    # Liveness / readiness probes for the load balancer
+    @app.route('/healthz')
+    def healthz():
+        return jsonify({'status': 'ok'})
+
+    @app.route('/readyz')
+    def readyz():
+        ready = model_registry.ready()
+        return jsonify({'ready': ready, 'models': model_registry.status()}), (200 if ready else 503)
+
+    @app.route('/stats/inference')
+    def inference_stats():
+        from features.batching import get_stats
+        return jsonify({'batching': get_stats(), 'prediction_cache': prediction_cache.stats(),
+                        'executor': inference_executor.stats(), 'llm': llm_client.stats(),
+                        'llm_cache': response_cache.stats(), 'routine': routine_planner.stats(),
+                        'pdf': routine_pdf.stats(), 'uploads': upload_store.stats(),
+                        'models': model_registry.stats()})
+
+    # Prometheus scrape target; empty while METRICS_ENABLED=0
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return app.response_class(metrics.render() if metrics.enabled else "",
+                                  mimetype='text/plain; version=0.0.4')
 
     # Profile routes
     @app.route('/profile', methods=['GET', 'POST'])
@@ -145,7 +283,7 @@ def create_app():
         if not session.get('user_id'):
             return redirect('/login?next=/profile')
         user_id = session['user_id']
-        conn = get_db_connection()
+        conn = get_db()
         if request.method == 'POST':
             first_name = request.form.get('firstName')
             last_name = request.form.get('lastName')
@@ -157,9 +295,9 @@ def create_app():
                 session['user_email'] = email
                 flash('Profile updated', 'success')
             except sqlite3.IntegrityError:
+                conn.rollback()
                 flash('Email already in use', 'error')
         user = conn.execute('SELECT * FROM users WHERE id=?', (user_id,)).fetchone()
-        conn.close()
         return render_template('profile.html', user=user)
 
     return app
@@ -0,0 +1,106 @@
+"""Load test for features/batching.py.
+
+Runs N client threads issuing single-image predictions against a model, once
+calling the model directly and once through a MicroBatcher, and prints the
+throughput of both. By default the model is simulated with a fixed per-call
+overhead plus a per-row cost (roughly how Keras behaves on CPU); pass
+--keras-model to use a real .keras file instead.
+
+    python benchmarks/bench_batching.py --threads 16 --requests 400
+    python benchmarks/bench_batching.py --keras-model "models/skin_disease_finetuned (1).keras"
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features.batching import MicroBatcher  # noqa: E402
+
+
+def simulated_model(call_overhead_ms: float, per_row_ms: float):
+    # The lock stands in for the CPU: a real forward pass already uses every
+    # core, so concurrent calls queue behind each other instead of overlapping.
+    cpu = threading.Lock()
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        with cpu:
+            time.sleep((call_overhead_ms + per_row_ms * batch.shape[0]) / 1000.0)
+        return np.tile(np.array([[0.1, 0.2, 0.3, 0.4]], dtype="float32"), (batch.shape[0], 1))
+    return predict
+
+
+def keras_model(path: str):
+    from tensorflow import keras
+    model = keras.models.load_model(path, compile=False)
+    model.predict(np.zeros((1, 224, 224, 3), dtype="float32"), verbose=0)
+    return lambda batch: model.predict(batch, verbose=0)
+
+
+def run(call, threads: int, requests: int) -> dict:
+    x = np.zeros((1, 224, 224, 3), dtype="float32")
+    latencies = []
+    lock = threading.Lock()
+    per_thread = max(1, requests // threads)
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            t0 = time.perf_counter()
+            call(x)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    lat_ms = np.array(latencies) * 1000.0
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat_ms, 95)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--call-overhead-ms", type=float, default=20.0)
+    parser.add_argument("--per-row-ms", type=float, default=4.0)
+    parser.add_argument("--keras-model", help="Benchmark a real .keras model instead of the simulated one")
+    args = parser.parse_args()
+
+    if args.keras_model:
+        predict = keras_model(args.keras_model)
+    else:
+        predict = simulated_model(args.call_overhead_ms, args.per_row_ms)
+
+    batcher = MicroBatcher("bench", predict, args.max_batch_size, args.max_wait_ms)
+    direct = run(predict, args.threads, args.requests)
+    batched = run(batcher.submit, args.threads, args.requests)
+
+    print(json.dumps({
+        "direct": direct,
+        "batched": batched,
+        "speedup": round(batched["throughput_rps"] / direct["throughput_rps"], 2),
+        "batcher_stats": batcher.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
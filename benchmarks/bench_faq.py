@@ -0,0 +1,91 @@
+"""Compare the chatbot's old nested FAQ scan with the precompiled FAQIndex.
+
+Builds synthetic knowledge bases of increasing size, checks that both
+matchers pick the same entry for every query and reports the mean time per
+query along with the one-off index build time.
+
+    python benchmarks/bench_faq.py --sizes 100 1000 10000 --queries 2000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features.chatbot import faq_data  # noqa: E402
+from features.faq_index import FAQIndex  # noqa: E402
+
+WORDS = ["red", "itchy", "patch", "scalp", "nail", "dry", "flaky", "spot", "rash", "bump", "ring", "scar"]
+
+
+def synthetic_faq(n: int, rng: random.Random) -> dict:
+    data = {category: dict(items) for category, items in faq_data.items()}
+    extra = data.setdefault("synthetic", {})
+    while sum(len(items) for items in data.values()) < n:
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)}itis {len(extra)}"
+        extra[name] = {"definition": name, "treatment": ["see a dermatologist"]}
+    return data
+
+
+def synthetic_queries(data: dict, count: int, rng: random.Random) -> list:
+    conditions = [c for items in data.values() for c in items]
+    queries = []
+    for i in range(count):
+        if i % 3 == 0:  # a third of the queries miss the knowledge base entirely
+            queries.append(f"why is my skin {rng.choice(WORDS)} and {rng.choice(WORDS)} after the gym")
+        else:
+            queries.append(f"how do i treat {rng.choice(conditions)} on my arm")
+    return queries
+
+
+def naive_match(data: dict, query_lower: str):
+    # The loop chat_api() ran before the index
+    for category, items in data.items():
+        for condition, info in items.items():
+            if condition in query_lower:
+                return category, condition, info
+    return None
+
+
+def per_query_us(fn, queries) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    report = {}
+    for size in args.sizes:
+        data = synthetic_faq(size, rng)
+        queries = synthetic_queries(data, args.queries, rng)
+
+        start = time.perf_counter()
+        index = FAQIndex(data)
+        build_ms = (time.perf_counter() - start) * 1000.0
+
+        mismatches = sum(naive_match(data, q) != index.match(q) for q in queries)
+        naive_us = per_query_us(lambda q: naive_match(data, q), queries)
+        index_us = per_query_us(index.match, queries)
+        report[size] = {
+            "entries": len(index),
+            "index_build_ms": round(build_ms, 2),
+            "naive_us_per_query": round(naive_us, 2),
+            "index_us_per_query": round(index_us, 2),
+            "speedup": round(naive_us / index_us, 2),
+            "mismatches": mismatches,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare bare requests.post with the pooled LLM client against the local stub.
+
+Starts benchmarks/stub_llm.py in-process, fires the same number of calls
+from a few threads through both paths and reports latency percentiles,
+the number of TCP connections the stub saw and how many calls failed.
+
+    python benchmarks/bench_llm.py --calls 200 --threads 8 --latency-ms 20 --fail-rate 0.05
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_llm import serve  # noqa: E402
+from features.llm_client import LLMClient, LLMError  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "what helps with dry skin?"}]
+
+
+def bare_call(url: str) -> bool:
+    # What query_groq() did before: no session, no timeout, no retry
+    response = requests.post(url, headers={"Authorization": "Bearer stub"},
+                             json={"model": "stub", "messages": MESSAGES})
+    return "choices" in response.json()
+
+
+def client_call(client: LLMClient) -> bool:
+    try:
+        return "choices" in client.chat_completion(MESSAGES)
+    except LLMError:
+        return False
+
+
+def run(fn, calls: int, threads: int) -> dict:
+    def timed(_):
+        started = time.perf_counter()
+        ok = fn()
+        return (time.perf_counter() - started) * 1000.0, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(timed, range(calls)))
+    wall = time.perf_counter() - started
+    latencies = np.array([r[0] for r in results])
+    return {
+        "calls_per_s": round(calls / wall, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "failed": sum(not r[1] for r in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)  # retry warnings are expected here
+
+    report = {}
+    for name in ("requests.post", "LLMClient"):
+        server = serve(latency_ms=args.latency_ms, fail_rate=args.fail_rate)
+        url = f"http://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions"
+        if name == "LLMClient":
+            client = LLMClient()
+            client.url = url
+            client.backoff = 0.01
+            report[name] = run(lambda: client_call(client), args.calls, args.threads)
+            report[name]["client_stats"] = {k: v for k, v in client.stats().items()
+                                            if k in ("attempts", "retries", "errors", "rejected")}
+        else:
+            report[name] = run(lambda: bare_call(url), args.calls, args.threads)
+        report[name]["tcp_connections"] = len(server.RequestHandlerClass.connections)
+        server.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
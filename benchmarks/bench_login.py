@@ -0,0 +1,86 @@
+"""Login throughput under concurrent load, with and without SQLite connection pooling.
+
+Creates a throwaway database, signs up one user, then runs N threads that
+each POST /login repeatedly through Flask's test client. Runs once with
+DB_POOL_SIZE=0 (a fresh connection per request, as before pooling) and once
+with the pool, and prints requests/second and latency percentiles for both.
+
+    python benchmarks/bench_login.py --threads 8 --requests 2000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run(pool_size: int, threads: int, requests: int) -> dict:
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ.setdefault("MODEL_PRELOAD", "lazy")
+    from app import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE"] = os.path.join(tmp, "bench.db")
+        app = create_app()
+        form = {"email": "bench@example.com", "password": "secret"}
+        app.test_client().post("/signup", data={"firstName": "B", "lastName": "M", **form})
+
+        latencies, lock = [], threading.Lock()
+        per_thread = max(1, requests // threads)
+
+        def worker():
+            client = app.test_client()
+            local = []
+            for _ in range(per_thread):
+                t0 = time.perf_counter()
+                resp = client.post("/login", data=form)
+                local.append(time.perf_counter() - t0)
+                assert resp.status_code == 302, resp.status_code
+            with lock:
+                latencies.extend(local)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        app.extensions["sqlite_pool"].close_all()
+
+    lat_ms = np.array(latencies) * 1000.0
+    return {
+        "db_pool_size": pool_size,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=8)
+    args = parser.parse_args()
+
+    unpooled = run(0, args.threads, args.requests)
+    pooled = run(args.pool_size, args.threads, args.requests)
+    print(json.dumps({
+        "unpooled": unpooled,
+        "pooled": pooled,
+        "speedup": round(pooled["throughput_rps"] / unpooled["throughput_rps"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
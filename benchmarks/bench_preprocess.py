@@ -0,0 +1,92 @@
+"""Compare the legacy per-classifier preprocessing with features/preprocessing.py.
+
+Synthesises representative uploads (phone-sized JPEGs, a PNG screenshot, a
+small JPEG) and reports the mean time per image for both paths, plus the
+mean absolute pixel difference of their outputs.
+
+    python benchmarks/bench_preprocess.py --repeat 20
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features.preprocessing import CAFFE_MEAN_BGR, decode_image, resnet50_batch  # noqa: E402
+
+SIZES = {
+    "jpeg_640x480": ((640, 480), "JPEG"),
+    "jpeg_3000x4000_12mp": ((3000, 4000), "JPEG"),
+    "jpeg_4032x3024_12mp": ((4032, 3024), "JPEG"),
+    "png_1920x1080": ((1920, 1080), "PNG"),
+}
+
+
+def synthetic_image(size, fmt) -> bytes:
+    w, h = size
+    # Smooth gradients plus noise: compresses like a photo rather than like flat colour
+    x = np.linspace(0, 255, w, dtype="float32")[None, :, None]
+    y = np.linspace(0, 255, h, dtype="float32")[:, None, None]
+    rng = np.random.default_rng(0)
+    arr = (x * 0.6 + y * 0.4 + rng.normal(0, 12, (h, w, 3))).clip(0, 255).astype("uint8")
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format=fmt, quality=90)
+    return buf.getvalue()
+
+
+def legacy(image_bytes: bytes) -> np.ndarray:
+    # The path SkinDiseaseClassifier / NailDiseaseClassifier used before, with
+    # keras' resnet50 preprocess_input written out in numpy
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image = image.resize((224, 224), Image.BILINEAR)
+    arr = np.asarray(image).astype("float32")
+    if arr.ndim == 2:
+        arr = np.stack([arr] * 3, axis=-1)
+    elif arr.shape[-1] == 4:
+        arr = arr[..., :3]
+    arr = arr[..., ::-1] - CAFFE_MEAN_BGR
+    return np.expand_dims(arr, axis=0)
+
+
+def fast(image_bytes: bytes) -> np.ndarray:
+    return resnet50_batch([decode_image(image_bytes, (224, 224))])
+
+
+def timed(fn, data: bytes, repeat: int) -> float:
+    fn(data)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(data)
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    report = {}
+    for name, (size, fmt) in SIZES.items():
+        data = synthetic_image(size, fmt)
+        legacy_ms = timed(legacy, data, args.repeat)
+        fast_ms = timed(fast, data, args.repeat)
+        report[name] = {
+            "bytes": len(data),
+            "legacy_ms": round(legacy_ms, 2),
+            "fast_ms": round(fast_ms, 2),
+            "speedup": round(legacy_ms / fast_ms, 2),
+            "mean_abs_diff": round(float(np.abs(legacy(data) - fast(data)).mean()), 3),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Latency of test-time augmentation (TTA_VIEWS) by number of views.
+
+Classifies the same phone-sized JPEG with the skin (or nail) classifier at
+each view count, all views in one batch as the app does, and compares that
+with running the views one after another (N single-view predictions). By
+default the model is simulated with a fixed per-call overhead plus a
+per-image cost, as in bench_batching.py; pass --model to time a real model
+file with one of the inference backends instead.
+
+    python benchmarks/bench_tta.py --views 1,2,4,6,8,10 --repeat 30
+    python benchmarks/bench_tta.py --model "models/skin_disease_finetuned (1).keras" --backend tflite
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import SimulatedModels  # noqa: E402
+from features.nail import NailDiseaseClassifier  # noqa: E402
+from features.skin import SkinDiseaseClassifier  # noqa: E402
+
+CLASSIFIERS = {"skin": SkinDiseaseClassifier, "nail": NailDiseaseClassifier}
+
+
+def photo(size=(3000, 4000)) -> bytes:
+    w, h = size
+    x = np.linspace(0, 255, w, dtype="float32")[None, :, None]
+    y = np.linspace(0, 255, h, dtype="float32")[:, None, None]
+    arr = (x * 0.6 + y * 0.4 + np.random.default_rng(0).normal(0, 12, (h, w, 3))).clip(0, 255).astype("uint8")
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def time_predict(clf, image: bytes, repeat: int) -> np.ndarray:
+    clf.predict(image)  # warm-up at this batch size
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        clf.predict(image)
+        times.append(time.perf_counter() - t0)
+    return np.array(times) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--classifier", choices=sorted(CLASSIFIERS), default="skin")
+    parser.add_argument("--views", default="1,2,4,6,8,10", help="Comma-separated TTA_VIEWS values")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--model", help="Time this model file instead of the simulated model")
+    parser.add_argument("--backend", default="keras", help="Backend for --model: keras, tflite or onnx")
+    parser.add_argument("--call-overhead-ms", type=float, default=20.0)
+    parser.add_argument("--per-row-ms", type=float, default=4.0)
+    args = parser.parse_args()
+
+    cls = CLASSIFIERS[args.classifier]
+    if args.model:
+        def make(views):
+            return cls(args.model, args.backend, tta_views=views)
+    else:
+        models = SimulatedModels(args.call_overhead_ms, args.per_row_ms)
+
+        def make(views):
+            return cls(f"simulated-{args.classifier}", executor=models, tta_views=views)
+
+    image = photo()
+    single = time_predict(make(1), image, args.repeat)
+    results = {}
+    for views in (int(v) for v in args.views.split(",")):
+        batched = time_predict(make(views), image, args.repeat) if views > 1 else single
+        results[views] = {
+            "p50_ms": round(float(np.percentile(batched, 50)), 2),
+            "p95_ms": round(float(np.percentile(batched, 95)), 2),
+            # What N separate single-view predictions would cost
+            "sequential_ms": round(float(np.percentile(single, 50)) * views, 2),
+            "cost_per_extra_view_ms": (round((float(np.percentile(batched, 50)) - float(np.percentile(single, 50)))
+                                             / (views - 1), 2) if views > 1 else None),
+        }
+
+    print(json.dumps({
+        "classifier": args.classifier,
+        "model": args.model or "simulated",
+        "backend": args.backend if args.model else None,
+        "views": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
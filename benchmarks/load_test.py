@@ -0,0 +1,304 @@
+"""Offline load test of the app's main endpoints.
+
+Builds the app with create_app() against a throwaway database, replaces the
+skin and nail models with simulated ones (a fixed per-call cost plus a
+per-image cost behind a lock, like bench_batching.py), points the chatbot at
+benchmarks/stub_llm.py and swaps the Gemini call for a local stub, so nothing
+needs model files, API keys or the network. Each scenario then runs N client
+threads against one endpoint through Flask's test client:
+
+    login             POST /login
+    skin              POST /skin/predict
+    nail              POST /nail/predict
+    chat              POST /chat/api/chat
+    routine           POST /routine/api/generate
+    routine_download  GET  /routine/download
+
+and reports throughput, p50/p95/p99 latency, errors and the process's peak
+RSS so far. Caches are disabled unless --warm-caches is given, so every
+request takes the full path. Save a run with --json and compare a later one
+against it with --baseline:
+
+    python benchmarks/load_test.py --threads 8 --requests 400 --json before.json
+    python benchmarks/load_test.py --threads 8 --requests 400 --baseline before.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_llm import serve  # noqa: E402
+from features.backends import InferenceBackend  # noqa: E402
+
+SCENARIOS = ("login", "skin", "nail", "chat", "routine", "routine_download")
+USER = {"email": "bench@example.com", "password": "secret"}
+ROUTINE_REPLY = json.dumps({
+    "skin_analysis": "Stubbed analysis.",
+    "morning_routine": ["Gentle cleanser", "Moisturizer", "SPF 50"],
+    "evening_routine": ["Cleanser", "Ceramide cream"],
+    "diet_tips": ["Hydration"],
+    "lifestyle": ["Sleep"],
+})
+
+
+class SimulatedBackend(InferenceBackend):
+    """Stands in for a model: sleeps like a CPU forward pass and returns fixed probabilities."""
+
+    name = "simulated"
+    output_is_softmax = True
+    # Shared by both models: a real forward pass already uses every core
+    cpu = threading.Lock()
+
+    def __init__(self, path: str, classes: int, call_overhead_ms: float, per_row_ms: float):
+        super().__init__(path)
+        self.probs = np.full((1, classes), 1.0 / classes, dtype="float32")
+        self.probs[0, 0] += 0.01
+        self.probs /= self.probs.sum()
+        self.call_overhead_ms = call_overhead_ms
+        self.per_row_ms = per_row_ms
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self.cpu:
+            time.sleep((self.call_overhead_ms + self.per_row_ms * batch.shape[0]) / 1000.0)
+        return np.repeat(self.probs, batch.shape[0], axis=0)
+
+
+class SimulatedModels:
+    """Passed to the classifiers as their executor, which is where they get their backend from."""
+
+    def __init__(self, call_overhead_ms: float, per_row_ms: float):
+        self.call_overhead_ms = call_overhead_ms
+        self.per_row_ms = per_row_ms
+
+    def backend(self, name: str) -> SimulatedBackend:
+        from features.nail import NAIL_CLASSES
+        from features.skin import SKIN_CLASSES
+        classes = len(SKIN_CLASSES if name == "skin" else NAIL_CLASSES)
+        return SimulatedBackend(f"simulated-{name}", classes, self.call_overhead_ms, self.per_row_ms)
+
+
+def install_stub_models(call_overhead_ms: float, per_row_ms: float):
+    """Re-register the skin and nail models so the registry loads simulated ones."""
+    from features.batching import make_batcher
+    from features.ml_utils import model_registry
+    from features.nail import NAIL_CLASSES, NAIL_MODEL_FILE, NailDiseaseClassifier
+    from features.skin import SKIN_CLASSES, SKIN_MODEL_FILE, SkinDiseaseClassifier
+
+    models = SimulatedModels(call_overhead_ms, per_row_ms)
+
+    def loader(name, cls):
+        def load(model_path):
+            clf = cls(model_path, executor=models, tta_views=model_registry.config.get("TTA_VIEWS", 1))
+            # Honour INFERENCE_BATCHING like the real loaders
+            clf.batcher = make_batcher(name, clf.predict_batch, model_registry.config)
+            return clf
+        return load
+
+    model_registry.register("skin", SKIN_MODEL_FILE, loader("skin", SkinDiseaseClassifier),
+                            input_size=(224, 224), class_names=SKIN_CLASSES)
+    model_registry.register("nail", NAIL_MODEL_FILE, loader("nail", NailDiseaseClassifier),
+                            input_size=(224, 224), class_names=NAIL_CLASSES)
+
+
+def install_stub_gemini(latency_ms: float):
+    import features.routine as routine
+
+    def call_gemini(prompt_text):
+        time.sleep(latency_ms / 1000.0)
+        return ROUTINE_REPLY
+
+    routine.call_gemini = call_gemini
+
+
+def make_images(count: int, size=(640, 480)) -> list:
+    """Distinct JPEG photos, so the prediction cache (when enabled) cannot answer every request."""
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        pixels = rng.integers(0, 256, size=(size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(pixels).resize(size).save(buf, format="JPEG", quality=85)
+        images.append(buf.getvalue())
+    return images
+
+
+def scenario_request(name: str, images: list):
+    """Return request(client, i) -> response for scenario `name`."""
+    if name == "login":
+        return lambda client, i: client.post("/login", data=USER)
+    if name in ("skin", "nail"):
+        def predict(client, i):
+            data = {"image": (io.BytesIO(images[i % len(images)]), f"photo{i}.jpg")}
+            return client.post(f"/{name}/predict", data=data, content_type="multipart/form-data")
+        return predict
+    if name == "chat":
+        # Worded so no FAQ entry answers it and every request reaches the LLM
+        return lambda client, i: client.post("/chat/api/chat", json={"message": f"question {i} about my zebra stripes"})
+    if name == "routine":
+        return lambda client, i: client.post("/routine/api/generate", json={
+            "age": str(18 + i % 60), "skin_type": random.choice(["oily", "dry", "combination"]),
+            "allergies": "none", "lifestyle": "office work"})
+    if name == "routine_download":
+        return lambda client, i: client.get("/routine/download")
+    raise ValueError(f"Unknown scenario {name!r}")
+
+
+def signed_in_client(app):
+    client = app.test_client()
+    client.post("/login", data=USER)
+    return client
+
+
+def run_scenario(app, name: str, threads: int, requests: int, images: list) -> dict:
+    request = scenario_request(name, images)
+    latencies, errors, lock = [], [0], threading.Lock()
+    per_thread = max(1, requests // threads)
+    start_barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        client = signed_in_client(app)
+        if name == "routine_download":
+            client.post("/routine/api/generate", json={"age": str(offset), "skin_type": "oily"})
+        local, failed = [], 0
+        start_barrier.wait()
+        for i in range(offset, offset + per_thread):
+            t0 = time.perf_counter()
+            resp = request(client, i)
+            resp.get_data()
+            local.append(time.perf_counter() - t0)
+            if resp.status_code >= 400 or (name == "login" and resp.status_code != 302):
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    lat_ms = np.array(latencies) * 1000.0
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat_ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 2),
+        # ru_maxrss is in KiB on Linux and never decreases, so this is the peak up to the end of the scenario
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Relative change of throughput and p95/p99 per scenario ("+0.12" = 12% higher than the baseline)."""
+    diff = {}
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        diff[name] = {
+            metric: round(result[metric] / before[metric] - 1.0, 3) if before[metric] else None
+            for metric in ("throughput_rps", "p95_ms", "p99_ms")
+        }
+    return diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400, help="Requests per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset to run")
+    parser.add_argument("--images", type=int, default=64, help="Distinct test photos to cycle through")
+    parser.add_argument("--call-overhead-ms", type=float, default=20.0, help="Simulated model cost per call")
+    parser.add_argument("--per-row-ms", type=float, default=4.0, help="Simulated model cost per image")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=200.0)
+    parser.add_argument("--warm-caches", action="store_true", help="Keep the prediction/LLM/routine/PDF caches on")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra app settings")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--baseline", help="Earlier --json report to compare against")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.WARNING)
+    stub = serve(latency_ms=args.llm_latency_ms)
+    settings = {
+        "GROQ_API_URL": f"http://127.0.0.1:{stub.server_address[1]}/openai/v1/chat/completions",
+        "MODEL_PRELOAD": "eager",
+        "INFERENCE_EXECUTOR": "inline",
+        "UPLOAD_PERSIST": "off",
+        "CHAT_STORE": "memory",
+    }
+    if not args.warm_caches:
+        settings.update({"PREDICTION_CACHE_SIZE": "0", "LLM_CACHE_SIZE": "0",
+                         "ROUTINE_CACHE_SIZE": "0", "PDF_CACHE_SIZE": "0"})
+    settings.update(kv.split("=", 1) for kv in args.env)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.setdefault("DATABASE", os.path.join(tmp, "bench.db"))
+        os.environ.update(settings)
+        install_stub_models(args.call_overhead_ms, args.per_row_ms)
+        install_stub_gemini(args.gemini_latency_ms)
+        from app import create_app
+        app = create_app()
+        app.test_client().post("/signup", data={"firstName": "B", "lastName": "M", **USER})
+
+        images = make_images(args.images)
+        results = {name: run_scenario(app, name, args.threads, args.requests, images) for name in scenarios}
+        app.extensions["sqlite_pool"].close_all()
+    stub.shutdown()
+
+    report = {
+        "revision": git_revision(),
+        "threads": args.threads,
+        "settings": {k: v for k, v in settings.items() if k not in ("GROQ_API_URL", "DATABASE")},
+        "stubs": {"call_overhead_ms": args.call_overhead_ms, "per_row_ms": args.per_row_ms,
+                  "llm_latency_ms": args.llm_latency_ms, "gemini_latency_ms": args.gemini_latency_ms},
+        "scenarios": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["baseline_revision"] = baseline.get("revision")
+        report["change_vs_baseline"] = compare(report, baseline)
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Measure cold-start time of create_app() with `python -X importtime`.
+
+Each run starts a fresh interpreter that imports app.py and calls
+create_app(), so nothing is shared between runs. Reports the wall time of
+the whole start, the import time of the slowest top-level modules, and
+which heavy optional libraries ended up imported at startup. With
+--max-seconds the exit status is 1 when the median start is slower, so the
+script can gate CI:
+
+    python benchmarks/startup_time.py --runs 5 --max-seconds 1.5 --json startup.json
+
+Models are not loaded during the measurement (MODEL_PRELOAD=lazy) unless
+--preload is given; use --env KEY=VALUE to try other settings.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should only be imported once a feature actually needs them
+HEAVY_MODULES = ("tensorflow", "keras", "google.genai", "reportlab", "onnxruntime", "ai_edge_litert", "tflite_runtime")
+
+CHILD = """
+import sys, time, json
+started = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = time.perf_counter() - started
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+print(json.dumps({{"create_app_s": elapsed, "heavy_modules": heavy}}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(heavy=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"create_app() failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # "import time: self [us] | cumulative | imported package", nesting shown by indentation
+    top_level = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            top_level[name.strip()] = int(cumulative) / 1e6
+    result["top_level_imports_s"] = top_level
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to report")
+    parser.add_argument("--preload", action="store_true", help="Keep the configured MODEL_PRELOAD")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--max-seconds", type=float, help="Fail when the median create_app() time exceeds this")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not args.preload:
+        env["MODEL_PRELOAD"] = "lazy"
+    env.update(kv.split("=", 1) for kv in args.env)
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    times = [r["create_app_s"] for r in runs]
+    modules = {}
+    for r in runs:
+        for name, seconds in r["top_level_imports_s"].items():
+            modules.setdefault(name, []).append(seconds)
+    slowest = sorted(((statistics.median(v), k) for k, v in modules.items()), reverse=True)[:args.top]
+
+    report = {
+        "runs": args.runs,
+        "create_app_s_median": round(statistics.median(times), 4),
+        "create_app_s_min": round(min(times), 4),
+        "create_app_s_max": round(max(times), 4),
+        "heavy_modules_at_startup": runs[-1]["heavy_modules"],
+        "slowest_top_level_imports_s": {name: round(seconds, 4) for seconds, name in slowest},
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_seconds is not None and report["create_app_s_median"] > args.max_seconds:
+        print(f"create_app() took {report['create_app_s_median']}s (limit {args.max_seconds}s)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Local stand-in for the Groq chat completions endpoint.
+
+Answers every POST with an OpenAI-shaped completion after a configurable
+delay, and can fail a fraction of requests with 503 to exercise retries.
+Point the app at it with GROQ_API_URL:
+
+    python benchmarks/stub_llm.py --port 8099 --latency-ms 300 --fail-rate 0.1
+    GROQ_API_URL=http://127.0.0.1:8099/openai/v1/chat/completions python app.py
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = {
+    "Definition": "A stubbed answer from the local LLM server.",
+    "Recommendation": ["Keep the skin moisturized.", "See a dermatologist if it persists."],
+}
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    latency_ms = 0.0
+    fail_rate = 0.0
+    connections = set()
+    lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        with self.lock:
+            self.connections.add(self.client_address)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        request = json.loads(body or b"{}")
+        time.sleep(self.latency_ms / 1000.0)
+        if random.random() < self.fail_rate:
+            self._send(503, {"error": {"message": "stub overloaded"}}, {"Retry-After": "0"})
+            return
+        content = json.dumps(REPLY)
+        if request.get("stream"):
+            self._stream(content)
+            return
+        self._send(200, {
+            "id": "stub",
+            "object": "chat.completion",
+            "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+        })
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i in range(0, len(content), 8):
+            chunk = {"choices": [{"index": 0, "delta": {"content": content[i:i + 8]}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def serve(port: int = 0, latency_ms: float = 0.0, fail_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stub on a background thread and return the server (its port is server_address[1])."""
+    handler = type("Handler", (StubLLMHandler,), {
+        "latency_ms": latency_ms, "fail_rate": fail_rate, "connections": set(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = serve(args.port, args.latency_ms, args.fail_rate)
+    print(f"Stub LLM listening on http://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
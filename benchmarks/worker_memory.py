@@ -0,0 +1,172 @@
+"""Per-worker memory of gunicorn with and without loading the models in the master.
+
+Starts `gunicorn -c gunicorn.conf.py wsgi:app` twice, once with
+GUNICORN_PRELOAD=1 (models loaded in the master and, with an in-process
+backend, shared copy-on-write) and once with GUNICORN_PRELOAD=0 and
+MODEL_PRELOAD=eager (every worker loads its own copy). Once /readyz
+answers, it reads /proc/<pid>/smaps_rollup of the master, each worker and
+every process a worker started (the inference processes of
+INFERENCE_EXECUTOR=process, which load their own models either way) and
+reports RSS, PSS and USS (unique set size: Private_Clean + Private_Dirty,
+the memory a process would free on exit). Linux only; needs gunicorn and
+the model files.
+
+Each worker runs a warm-up prediction before it serves, so a backend that
+does not survive being loaded before the fork shows up as preloaded
+workers that never become ready; the script then exits with status 1.
+Run it with the real models (not stand-ins) before turning
+GUNICORN_PRELOAD on for a backend.
+
+    python benchmarks/worker_memory.py --workers 4 --json worker_memory.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def smaps_rollup(pid: int) -> dict:
+    """The FIELDS of /proc/<pid>/smaps_rollup in MiB, plus uss."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0].rstrip(":") in FIELDS:
+                values[parts[0].rstrip(":").lower()] = int(parts[1]) / 1024.0
+    values["uss"] = values["private_clean"] + values["private_dirty"]
+    return {k: round(v, 1) for k, v in values.items()}
+
+
+def children(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def descendants(pid: int) -> list:
+    """Every process below `pid` (e.g. a worker's inference pool and its resource tracker)."""
+    found = []
+    for child in children(pid):
+        found.append(child)
+        found.extend(descendants(child))
+    return found
+
+
+def process_tree(pid: int) -> dict:
+    """smaps_rollup of `pid`, with that of each of its descendants under "children"."""
+    stats = smaps_rollup(pid)
+    stats["children"] = []
+    for child in descendants(pid):
+        try:
+            stats["children"].append(smaps_rollup(child))
+        except OSError:
+            continue  # exited meanwhile
+    return stats
+
+
+def tree_total(stats: dict, field: str) -> float:
+    return stats[field] + sum(child[field] for child in stats["children"])
+
+
+def wait_ready(url: str, workers: int, timeout: float) -> bool:
+    # Consecutive successes make it likely that every worker has answered at least once
+    deadline, streak = time.monotonic() + timeout, 0
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                streak = streak + 1 if response.status == 200 else 0
+        except (urllib.error.URLError, OSError):
+            streak = 0
+        if streak >= workers * 4:
+            return True
+        time.sleep(0.25)
+    return False
+
+
+def measure(preload: bool, workers: int, timeout: float, settle: float, extra_env: dict) -> dict:
+    port = free_port()
+    env = dict(os.environ, GUNICORN_PRELOAD="1" if preload else "0", WEB_CONCURRENCY=str(workers),
+               GUNICORN_BIND=f"127.0.0.1:{port}")
+    env.pop("MODEL_PRELOAD", None)
+    if not preload:
+        env["MODEL_PRELOAD"] = "eager"
+    env.update(extra_env)
+
+    started = time.monotonic()
+    master = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready = wait_ready(f"http://127.0.0.1:{port}/readyz", workers, timeout)
+        boot_seconds = round(time.monotonic() - started, 1)
+        time.sleep(settle)
+        if master.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {master.returncode}")
+        worker_stats = [process_tree(pid) for pid in children(master.pid)]
+        master_stats = smaps_rollup(master.pid)
+    finally:
+        master.send_signal(signal.SIGTERM)
+        try:
+            master.wait(30)
+        except subprocess.TimeoutExpired:
+            master.kill()
+
+    n = max(1, len(worker_stats))
+    return {
+        "preload": preload,
+        "ready": ready,
+        "boot_seconds": boot_seconds,
+        "master": master_stats,
+        "workers": worker_stats,
+        "worker_uss_mb_mean": round(sum(w["uss"] for w in worker_stats) / n, 1),
+        "worker_rss_mb_mean": round(sum(w["rss"] for w in worker_stats) / n, 1),
+        "worker_children": sum(len(w["children"]) for w in worker_stats),
+        # A worker together with the inference processes it started
+        "worker_tree_uss_mb_mean": round(sum(tree_total(w, "uss") for w in worker_stats) / n, 1),
+        # PSS splits shared pages between the processes using them, so the sum is the real footprint
+        "total_pss_mb": round(master_stats["pss"] + sum(tree_total(w, "pss") for w in worker_stats), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for /readyz")
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds to wait after ready before measuring")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra app settings")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    extra_env = dict(kv.split("=", 1) for kv in args.env)
+    with_preload = measure(True, args.workers, args.timeout, args.settle, extra_env)
+    without = measure(False, args.workers, args.timeout, args.settle, extra_env)
+    report = {
+        "workers": args.workers,
+        "preload": with_preload,
+        "no_preload": without,
+        "worker_uss_saved_mb": round(without["worker_tree_uss_mb_mean"] - with_preload["worker_tree_uss_mb_mean"], 1),
+        "total_pss_saved_mb": round(without["total_pss_mb"] - with_preload["total_pss_mb"], 1),
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if not with_preload["ready"]:
+        sys.exit("Preloaded workers never became ready: keep GUNICORN_PRELOAD=0 for this backend")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, jsonify, request, session, url_for
+
+from features.executor import InferenceBusy
+from features.metrics import timed
+from features.ml_utils import model_registry
+from features.prediction_cache import prediction_cache
+from features.preprocessing import decode_views
+from features.uploads import read_upload, upload_store
+
+analyze_bp = Blueprint("analyze", __name__)
+
+# Models run by /analyze, with how each formats its labels (as on its own result page)
+MODELS = {"skin": str, "nail": str.title}
+
+# All but one model of a request run here, concurrently with the request thread
+_model_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="analyze")
+
+
+class SharedViews:
+    """Decodes an upload once per input size and TTA setting, however many models ask for it."""
+
+    def __init__(self, image_bytes: bytes):
+        self.image_bytes = image_bytes
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def get(self, clf) -> list:
+        key = (clf.input_w, clf.input_h, clf.tta_views)
+        # Held while decoding, so a concurrent model waits for the result instead of decoding again
+        with self._lock:
+            if key not in self._views:
+                with timed("analyze", "decode"):
+                    self._views[key] = decode_views(self.image_bytes, (clf.input_w, clf.input_h), clf.tta_views)
+            return self._views[key]
+
+
+def _classify(name: str, clf, image_bytes: bytes, views: SharedViews) -> dict:
+    pred = prediction_cache.predict(name, clf, image_bytes, compute=lambda: clf.predict_views(views.get(clf)))
+    return {
+        "model": os.path.basename(clf.model_path),
+        "predicted": MODELS[name](pred["label"]),
+        "confidence": round(pred["probability"], 4),
+    }
+
+
+@analyze_bp.route("/", methods=["POST"])
+def analyze():
+    """Screen one upload with the skin and nail models at once, sharing its decode and resize."""
+    if not session.get("user_id"):
+        return jsonify({"error": "Authentication required"}), 401
+
+    file = request.files.get("image")
+    if not file:
+        return jsonify({"error": "Upload an image in the 'image' field"}), 400
+
+    with timed("analyze", "read_upload"):
+        img_bytes = read_upload(file)
+    with timed("analyze", "persist_upload"):
+        image_filename = upload_store.save(img_bytes)
+
+    results, loaded = {}, []
+    for name in MODELS:
+        clf = model_registry.get(name)
+        if clf is None:
+            results[name] = {"error": f"{name.title()} model not available"}
+        else:
+            loaded.append((name, clf))
+
+    views = SharedViews(img_bytes)
+    busy = None
+    with timed("analyze", "classify"):
+        futures = {name: _model_pool.submit(_classify, name, clf, img_bytes, views) for name, clf in loaded[1:]}
+        for name, clf in loaded:
+            try:
+                # The first model runs in this thread while the others run on the pool
+                results[name] = futures[name].result() if name in futures else _classify(name, clf, img_bytes, views)
+            except InferenceBusy as e:
+                busy = e
+            except Exception as e:
+                logging.exception("Prediction error: %s", e)
+                results[name] = {"error": f"Prediction failed: {e}"}
+
+    if busy is not None:
+        return jsonify({"error": "The server is busy right now; please try again in a few seconds."}), 503, \
+            {"Retry-After": str(busy.retry_after)}
+
+    body = {name: results[name] for name in MODELS}
+    if image_filename:
+        body["image_url"] = url_for("uploads.original", name=image_filename)
+        body["thumbnail_url"] = url_for("uploads.thumbnail", name=image_filename)
+    ok = any("error" not in result for result in results.values())
+    return jsonify(body), (200 if ok else 503)
@@ -0,0 +1,137 @@
+import os
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+
+
+# File extension of the exported model for each backend; "keras" serves the original file
+BACKEND_EXTENSIONS = {"keras": ".keras", "tflite": ".tflite", "onnx": ".onnx"}
+
+
+class InferenceBackend:
+    """Runs a float32 (n, h, w, 3) batch through a model and returns its raw outputs."""
+
+    name = "base"
+    # True/False when the runtime can tell whether the last layer is a softmax, None otherwise
+    output_is_softmax: Optional[bool] = None
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class KerasBackend(InferenceBackend):
+    name = "keras"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        # Imported here so the exported backends never pay for TensorFlow
+        try:
+            from tensorflow import keras
+        except Exception:
+            import keras  # type: ignore
+        self.model = keras.models.load_model(path, compile=False)
+        try:
+            last_layer = self.model.layers[-1]
+            activation = getattr(last_layer, "activation", None)
+            self.output_is_softmax = getattr(activation, "__name__", None) == "softmax"
+        except Exception:
+            self.output_is_softmax = None
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model.predict(batch, verbose=0)
+
+
+def _tflite_interpreter_class():
+    try:
+        from ai_edge_litert.interpreter import Interpreter  # type: ignore
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter  # type: ignore
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf  # type: ignore
+    return tf.lite.Interpreter
+
+
+class TFLiteBackend(InferenceBackend):
+    name = "tflite"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        interpreter_cls = _tflite_interpreter_class()
+        self.interpreter = interpreter_cls(model_path=path, num_threads=os.cpu_count())
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # An interpreter holds its tensors internally and is not safe to share between threads
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=self._input["dtype"])
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self._input["index"], batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output["index"]).copy()
+
+
+class OnnxBackend(InferenceBackend):
+    name = "onnx"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        import onnxruntime as ort  # type: ignore
+        self.session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch.astype("float32", copy=False)})[0]
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+
+# Quantized variants made by `python -m features.quantize_models`, as file name infixes
+MODEL_VARIANTS = {"float": "", "int8": ".int8", "fp16": ".fp16"}
+
+
+def backend_model_path(keras_path: str, backend: str, variant: str = "float") -> str:
+    """Path of the file `backend` serves for the model exported from `keras_path`.
+
+    Quantized variants sit next to the float export, e.g.
+    `best_nail_model.int8.tflite`. The keras backend only serves the float model.
+    """
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant {variant!r}; expected one of {', '.join(MODEL_VARIANTS)}")
+    if backend == "keras":
+        if variant != "float":
+            raise ValueError(f"The keras backend cannot serve the {variant} variant; use tflite or onnx")
+        return keras_path
+    stem, _ = os.path.splitext(keras_path)
+    return stem + MODEL_VARIANTS[variant] + BACKEND_EXTENSIONS[backend]
+
+
+def load_backend(keras_path: str, backend: str = "keras", variant: str = "float") -> InferenceBackend:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    path = backend_model_path(keras_path, backend, variant)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model not found for {backend} backend: {path}")
+    logging.info("Loading %s with the %s backend", path, backend)
+    return BACKENDS[backend](path)
@@ -0,0 +1,189 @@
+import os
+import time
+import queue
+import logging
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+
+# Queue-wait histogram bucket upper bounds, in milliseconds
+WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Every batcher created in this process, by model name (used for stats reporting)
+_batchers: Dict[str, "MicroBatcher"] = {}
+_batchers_lock = threading.Lock()
+
+
+class _Pending:
+    __slots__ = ("x", "enqueued_at", "event", "result", "error")
+
+    def __init__(self, x: np.ndarray):
+        self.x = x
+        self.enqueued_at = time.perf_counter()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Collects concurrent predict calls for one model into a single forward pass.
+
+    Callers submit a (n, H, W, C) tensor and block until their rows of the
+    output are ready. A background thread waits for the first pending request,
+    then keeps collecting until either `max_batch_size` rows are queued or
+    `max_wait_ms` has passed, and runs `predict_fn` once on the concatenation.
+    """
+
+    def __init__(self, name: str, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+        self._batch_sizes: Dict[int, int] = {}
+        self._wait_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._wait_sum_ms = 0.0
+        self._requests = 0
+        self._batches = 0
+
+    def _ensure_worker(self):
+        # Called with self._lock held. The worker is started on first use and
+        # restarted after a fork (so a batcher created in a pre-fork master
+        # still works in the children) or after `close`.
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        if self._pid != pid:
+            self._queue = queue.Queue()
+        self._pid = pid
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, x: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        if x.ndim == 3:
+            x = np.expand_dims(x, axis=0)
+        pending = _Pending(x)
+        with self._lock:
+            self._ensure_worker()
+            self._queue.put(pending)
+        if not pending.event.wait(timeout):
+            raise TimeoutError(f"{self.name} batcher did not answer within {timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def close(self):
+        """Stop the worker thread after the requests already queued (e.g. once the model is replaced).
+
+        A later submit starts a new thread, so closing a batcher that is still in use is safe.
+        """
+        self._queue.put(None)
+
+    def _collect(self):
+        first = self._queue.get()
+        while first is None:
+            with self._lock:
+                # Decided under the lock submit() enqueues with, so no request is left behind
+                if self._queue.empty():
+                    self._thread = None
+                    return None, 0
+            first = self._queue.get()
+        batch = [first]
+        rows = first.x.shape[0]
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # run what was collected, then stop
+                break
+            batch.append(item)
+            rows += item.x.shape[0]
+        return batch, rows
+
+    def _run(self):
+        while True:
+            batch, rows = self._collect()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                if len(batch) == 1:
+                    inputs = batch[0].x
+                else:
+                    inputs = np.concatenate([p.x for p in batch], axis=0)
+                outputs = np.asarray(self.predict_fn(inputs))
+                offset = 0
+                for p in batch:
+                    n = p.x.shape[0]
+                    p.result = outputs[offset:offset + n]
+                    offset += n
+            except Exception as e:
+                logging.exception("Batched %s prediction failed: %s", self.name, e)
+                for p in batch:
+                    p.error = e
+            self._record(batch, rows, started)
+            for p in batch:
+                p.event.set()
+
+    def _record(self, batch, rows: int, started: float):
+        with self._lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._batch_sizes[rows] = self._batch_sizes.get(rows, 0) + 1
+            for p in batch:
+                wait_ms = (started - p.enqueued_at) * 1000.0
+                self._wait_sum_ms += wait_ms
+                self._wait_counts[bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            buckets = {str(b): c for b, c in zip(WAIT_BUCKETS_MS, self._wait_counts)}
+            buckets["+Inf"] = self._wait_counts[-1]
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "requests": self._requests,
+                "batches": self._batches,
+                "mean_batch_size": (sum(k * v for k, v in self._batch_sizes.items()) / self._batches
+                                    if self._batches else 0.0),
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "queue_wait_ms_histogram": buckets,
+                "queue_wait_ms_sum": round(self._wait_sum_ms, 3),
+            }
+
+
+def make_batcher(name: str, predict_fn: Callable[[np.ndarray], np.ndarray], config) -> Optional[MicroBatcher]:
+    """Return a batcher for `name` if INFERENCE_BATCHING is enabled in `config`, else None."""
+    if not config.get("INFERENCE_BATCHING"):
+        return None
+    batcher = MicroBatcher(
+        name,
+        predict_fn,
+        max_batch_size=config.get("INFERENCE_BATCH_MAX_SIZE", 8),
+        max_wait_ms=config.get("INFERENCE_BATCH_MAX_WAIT_MS", 5.0),
+    )
+    with _batchers_lock:
+        _batchers[name] = batcher
+    logging.info("Micro-batching enabled for %s (max_batch_size=%d, max_wait_ms=%.1f)",
+                 name, batcher.max_batch_size, batcher.max_wait * 1000.0)
+    return batcher
+
+
+def get_stats() -> dict:
+    with _batchers_lock:
+        return {name: b.stats() for name, b in _batchers.items()}
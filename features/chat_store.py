@@ -0,0 +1,181 @@
+import os
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import List, Optional
+
+from features.caching import TTLCache
+
+
+class ChatStore:
+    """Server-side chatbot conversations; the session cookie only carries a conversation ID.
+
+    With the `memory` backend each conversation keeps its last `window`
+    messages in an in-memory LRU of `max_conversations`. With the `sqlite`
+    backend the database is the only copy, so every server process sees the
+    messages written by the others: messages are written by a background
+    thread that batches them into one transaction every `flush_ms`, and
+    reading a history flushes this process's queue first and then reads the
+    last `window` rows in the order they were sent.
+    """
+
+    def __init__(self):
+        self.backend = "memory"
+        self.window = 6
+        self.flush_interval = 0.2
+        self.retention_days = 30
+        self._recent = TTLCache(10000)
+        self._pool = None
+        self._queue: "queue.Queue" = queue.Queue()
+        self._flush_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._flushes = 0
+        self.batches = 0
+        self.rows_written = 0
+        atexit.register(self.flush)
+
+    def init_app(self, app):
+        self.flush()
+        self.backend = app.config.get("CHAT_STORE", "sqlite")
+        self.window = max(1, app.config.get("CHAT_HISTORY_WINDOW", 6))
+        self.flush_interval = app.config.get("CHAT_STORE_FLUSH_MS", 200) / 1000.0
+        self.retention_days = app.config.get("CHAT_STORE_RETENTION_DAYS", 30)
+        self._recent = TTLCache(app.config.get("CHAT_STORE_MAX_CONVERSATIONS", 10000),
+                                app.config.get("CHAT_STORE_IDLE_SECONDS", 86400))
+        self._pool = app.extensions["sqlite_pool"] if self.backend == "sqlite" else None
+        if self._pool is not None:
+            self._create_table()
+
+    def _create_table(self):
+        conn = self._pool.acquire()
+        try:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    user_id INTEGER,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                """
+            )
+            # Matches the ORDER BY of `_load`, so a history read is a short index walk without a sort
+            conn.execute("DROP INDEX IF EXISTS idx_chat_messages_conversation")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_conversation_time"
+                         " ON chat_messages(conversation_id, created_at, id)")
+            conn.commit()
+        finally:
+            self._pool.release(conn)
+
+    @staticmethod
+    def new_conversation_id() -> str:
+        return uuid.uuid4().hex
+
+    def history(self, conversation_id: str) -> List[dict]:
+        """The last `window` messages of the conversation, oldest first."""
+        if self._pool is not None:
+            return self._load(conversation_id)
+        messages = self._recent.get(conversation_id)
+        if messages is None:
+            return []
+        with self._lock:
+            return list(messages)
+
+    def _load(self, conversation_id: str) -> List[dict]:
+        # Our own queued messages first; another process's are at most `flush_ms` behind
+        self.flush()
+        conn = self._pool.acquire()
+        try:
+            # Processes flush in their own batches, so row ids need not follow the order messages were sent in
+            rows = conn.execute(
+                "SELECT role, content FROM chat_messages WHERE conversation_id=?"
+                " ORDER BY created_at DESC, id DESC LIMIT ?",
+                (conversation_id, self.window),
+            ).fetchall()
+        finally:
+            self._pool.release(conn)
+        return [{"role": row["role"], "content": row["content"]} for row in reversed(rows)]
+
+    def append(self, conversation_id: str, role: str, content: str, user_id=None):
+        if self._pool is not None:
+            self._queue.put((conversation_id, user_id, role, content, time.time()))
+            self._ensure_writer()
+            return
+        messages = self._recent.get(conversation_id)
+        if messages is None:
+            messages = deque(maxlen=self.window)
+            self._recent.set(conversation_id, messages)
+        with self._lock:
+            messages.append({"role": role, "content": content})
+
+    # ---------------- Batched writes ----------------
+
+    def _ensure_writer(self):
+        # Started on first use (and again after a fork), like the micro-batcher's thread
+        pid = os.getpid()
+        if self._writer is not None and self._pid == pid and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is None or self._pid != pid or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name="chat-store-writer", daemon=True)
+                self._pid = pid
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error("Failed to write chat messages: %s", e)
+
+    def flush(self):
+        """Write every queued message in one transaction."""
+        if self._pool is None:
+            return
+        with self._flush_lock:
+            rows = []
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not rows:
+                return
+            conn = self._pool.acquire()
+            try:
+                # Rows that fail to insert are dropped (and logged by the caller) rather than retried forever
+                conn.executemany(
+                    "INSERT INTO chat_messages (conversation_id, user_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._flushes += 1
+                if self.retention_days and self._flushes % 500 == 0:
+                    conn.execute("DELETE FROM chat_messages WHERE created_at < ?",
+                                 (time.time() - self.retention_days * 86400,))
+                conn.commit()
+                self.batches += 1
+                self.rows_written += len(rows)
+            finally:
+                self._pool.release(conn)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "window": self.window,
+            "conversations_in_memory": len(self._recent) if self._pool is None else 0,
+            "queued_writes": self._queue.qsize(),
+            "batches": self.batches,
+            "rows_written": self.rows_written,
+        }
+
+
+chat_store = ChatStore()
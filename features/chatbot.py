@@ -1,14 +1,20 @@
-import os
+import re
 import json
-import requests
-from flask import Blueprint, render_template, request, jsonify, session
+import logging
+from flask import Blueprint, Response, render_template, request, jsonify, session
 from dotenv import load_dotenv
 
+from features.chat_store import chat_store
+from features.faq_index import FAQIndex
+from features.llm_client import LLMError, llm_client
+from features.metrics import UPSTREAM_ERRORS, timed
+from features.response_cache import response_cache
+from features.sse import JSONSectionParser, sse_event
+
 chatbot_bp = Blueprint('chatbot', __name__, template_folder='../templates')
 
-# Load API key once
+# GROQ_API_KEY is read from the environment / .env by features/llm_client.py
 load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
 # ---------------- FAQ Knowledge Base ----------------
 faq_data = {
@@ -65,6 +71,33 @@ faq_data = {
     }
 }
 
+# Other names users type for a condition (matched like the condition name itself)
+FAQ_ALIASES = {
+    "fungal": ["onychomycosis", "nail fungus"],
+    "hairfall": ["hair fall"],
+    "ingrown": ["ingrowing"],
+}
+
+# ---------------- Precompiled matchers ----------------
+FAQ_INDEX = FAQIndex(faq_data, FAQ_ALIASES)
+
+GREETINGS = frozenset(["hi", "hello", "hey", "good morning", "good afternoon", "good evening"])
+CASUAL_RE = re.compile("|".join(map(re.escape, [
+    "thanks", "thank you", "ok thanks", "ok thank you", "thanks a lot", "thanks!"
+])))
+INTENT_PATTERNS = [
+    ("definition", re.compile(r"what is|define|definition")),
+    ("treatment", re.compile(r"treat|treatment|how to cure|recommend")),
+    ("precautions", re.compile(r"precaution|avoid|care|prevent")),
+]
+
+
+def detect_intent(query_lower):
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.search(query_lower):
+            return intent
+    return "general"
+
 # ---------------- Prompt Template ----------------
 PROMPT_TEMPLATE = """
 You are a professional dermatologist assistant chatbot.
@@ -94,127 +127,61 @@ User Query: {query}
 Context Info (if relevant): {context}
 """
 
+GROQ_UNAVAILABLE = "⚠️ Error: The Groq API is unavailable, please try again."
+
+
 # ---------------- Groq API Query ----------------
 def query_groq(prompt):
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {GROQ_API_KEY}"}
-    data = {
-        "model": "llama-3.1-8b-instant",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.7
-    }
-    response = requests.post(url, headers=headers, json=data)
     try:
-        result = response.json()
-    except Exception as e:
-        print("⚠️ Failed to parse JSON:", e)
-        return "⚠️ Error: Invalid response from Groq API."
+        with timed("chatbot", "llm"):
+            result = llm_client.chat_completion([{"role": "user", "content": prompt}], temperature=0.7)
+    except LLMError as e:
+        UPSTREAM_ERRORS.inc("groq")
+        logging.warning("Groq request failed: %s", e)
+        return GROQ_UNAVAILABLE
 
     if "choices" not in result:
         return f"⚠️ API Error: {result.get('error', 'Unexpected response')}"
 
     return result["choices"][0]["message"]["content"]
 
-# ---------------- Blueprint Routes ----------------
-@chatbot_bp.route('/')
-def chat_page():
-    if not session.get('user_id'):
-        from flask import redirect
-        return redirect('/login?next=/chat/')
-    return render_template('chatbot.html', reply=None, history=session.get('chat_history', []))
 
-@chatbot_bp.route('/api/chat', methods=['POST'])
-def chat_api():
-    user_query = request.json.get("message", "").strip()
-    if not user_query:
-        return jsonify({"reply": "Please enter a valid query."})
+def is_error_reply(llm_reply):
+    return llm_reply.startswith("⚠️")
 
-    query_lower = user_query.lower()
-
-    # Initialize session memory
-    if "chat_history" not in session:
-        session["chat_history"] = []
-
-    # Append user query to memory
-    session["chat_history"].append({"role": "user", "content": user_query})
-    MAX_MEMORY = 5
-    session["chat_history"] = session["chat_history"][-MAX_MEMORY:]
-
-    # --- 1. Handle greetings ---
-    greetings = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening"]
-    if query_lower in greetings:
-        reply = "Hello! 👋 How can I assist you with skin, hair, or nail concerns today?"
-        session["chat_history"].append({"role": "bot", "content": reply})
-        return jsonify({"reply": reply})
 
-    # --- 2. Handle casual/polite messages ---
-    casual_responses = ["thanks", "thank you", "ok thanks", "ok thank you", "thanks a lot", "thanks!"]
-    if any(phrase in query_lower for phrase in casual_responses):
-        reply = "You're welcome! 😊 Let me know if you have any more questions about skin, hair, or nails."
-        session["chat_history"].append({"role": "bot", "content": reply})
-        return jsonify({"reply": reply})
+def cached_query_groq(user_query, prompt):
+    """query_groq(prompt), answered from the response cache when `user_query` was asked before."""
+    llm_reply = response_cache.get(user_query)
+    if llm_reply is None:
+        llm_reply = query_groq(prompt)
+        if not is_error_reply(llm_reply):
+            response_cache.set(user_query, llm_reply)
+    return llm_reply
 
-    # --- 3. Intent-aware FAQ handling ---
-    def detect_intent(user_query):
-        if any(word in query_lower for word in ["what is", "define", "definition"]):
-            return "definition"
-        elif any(word in query_lower for word in ["treat", "treatment", "how to cure", "recommend"]):
-            return "treatment"
-        elif any(word in query_lower for word in ["precaution", "avoid", "care", "prevent"]):
-            return "precautions"
-        else:
-            return "general"
-
-    intent = detect_intent(user_query)
-    context_info = {}
-
-    for category, items in faq_data.items():
-        for condition, info in items.items():
-            if condition in query_lower:
-                context_info = info
-                # Use structured response directly if possible
-                reply_dict = {}
-                if intent == "definition" and "definition" in info:
-                    reply_dict["Definition"] = info["definition"]
-                elif intent == "treatment" and "treatment" in info:
-                    reply_dict["Recommendation"] = info["treatment"]
-                elif intent == "precautions" and "precautions" in info:
-                    reply_dict["Precautions"] = info["precautions"]
-                else:  # fallback: include all relevant info
-                    for k, v in info.items():
-                        reply_dict[k.capitalize()] = v
-                # Convert to HTML bullet format
-                reply_html = ""
-                for k, v in reply_dict.items():
-                    if isinstance(v, list):
-                        reply_html += f"<strong>{k}:</strong><ul>"
-                        for item in v:
-                            reply_html += f"<li>{item}</li>"
-                        reply_html += "</ul>"
-                    else:
-                        reply_html += f"<strong>{k}:</strong> {v}<br>"
-                session["chat_history"].append({"role": "bot", "content": reply_html})
-                return jsonify({"reply": reply_html})
 
-    # --- 4. Fallback to LLM with memory context ---
-    messages_text = "\n".join([h['content'] for h in session.get('chat_history', [])][-6:])  # Last 6
-    structured_prompt = PROMPT_TEMPLATE.format(
-        query=user_query,
-        messages=messages_text,
-        context=json.dumps(context_info) if context_info else "None"
-    )
+def stream_groq(prompt):
+    """Yield the reply to `prompt` piece by piece; raises LLMError when the API fails, possibly midway."""
+    try:
+        yield from llm_client.stream_chat_completion([{"role": "user", "content": prompt}], temperature=0.7)
+    except LLMError as e:
+        UPSTREAM_ERRORS.inc("groq")
+        logging.warning("Groq stream failed: %s", e)
+        raise
 
-    llm_reply = query_groq(structured_prompt)
 
-    # Parse JSON safely
+def parse_llm_reply(llm_reply):
     try:
         structured = json.loads(llm_reply)
-    except:
-        structured = {"Response": llm_reply}  # fallback
+    except ValueError:
+        structured = None
+    return structured if isinstance(structured, dict) else {"Response": llm_reply}  # fallback
+
 
-    # Convert to HTML bullet format
+def render_reply(reply_dict):
+    """Convert {section: text or list} to the HTML bullet format shown in the chat."""
     reply_html = ""
-    for key, value in structured.items():
+    for key, value in reply_dict.items():
         if isinstance(value, list):
             reply_html += f"<strong>{key}:</strong><ul>"
             for item in value:
@@ -222,8 +189,144 @@ def chat_api():
             reply_html += "</ul>"
         else:
             reply_html += f"<strong>{key}:</strong> {value}<br>"
+    return reply_html
+
+
+# ---------------- Conversation memory ----------------
+def conversation_id():
+    """ID of this browser's conversation in the chat store, created on first use."""
+    conv_id = session.get("conversation_id")
+    if conv_id is None:
+        conv_id = session["conversation_id"] = chat_store.new_conversation_id()
+        # History used to live in the cookie itself
+        session.pop("chat_history", None)
+    return conv_id
+
+
+def remember(conv_id, role, content):
+    chat_store.append(conv_id, role, content, user_id=session.get("user_id"))
+
+
+def local_reply(query_lower):
+    """Answer greetings, thanks and FAQ matches without the LLM; None when the LLM is needed."""
+    # --- 1. Handle greetings ---
+    if query_lower in GREETINGS:
+        return "Hello! 👋 How can I assist you with skin, hair, or nail concerns today?"
+
+    # --- 2. Handle casual/polite messages ---
+    if CASUAL_RE.search(query_lower):
+        return "You're welcome! 😊 Let me know if you have any more questions about skin, hair, or nails."
+
+    # --- 3. Intent-aware FAQ handling ---
+    match = FAQ_INDEX.match(query_lower)
+    if match is None:
+        return None
+    intent = detect_intent(query_lower)
+    category, condition, info = match
+    # Use structured response directly if possible
+    reply_dict = {}
+    if intent == "definition" and "definition" in info:
+        reply_dict["Definition"] = info["definition"]
+    elif intent == "treatment" and "treatment" in info:
+        reply_dict["Recommendation"] = info["treatment"]
+    elif intent == "precautions" and "precautions" in info:
+        reply_dict["Precautions"] = info["precautions"]
+    else:  # fallback: include all relevant info
+        for k, v in info.items():
+            reply_dict[k.capitalize()] = v
+    return render_reply(reply_dict)
+
+
+def llm_prompt(conv_id, user_query):
+    # --- 4. Fallback to LLM with memory context ---
+    messages_text = "\n".join([h['content'] for h in chat_store.history(conv_id)][-6:])  # Last 6
+    return PROMPT_TEMPLATE.format(query=user_query, messages=messages_text, context="None")
+
+# ---------------- Blueprint Routes ----------------
+@chatbot_bp.route('/')
+def chat_page():
+    if not session.get('user_id'):
+        from flask import redirect
+        return redirect('/login?next=/chat/')
+    conv_id = session.get("conversation_id")
+    return render_template('chatbot.html', reply=None, history=chat_store.history(conv_id) if conv_id else [])
+
+@chatbot_bp.route('/api/chat', methods=['POST'])
+def chat_api():
+    user_query = request.json.get("message", "").strip()
+    if not user_query:
+        return jsonify({"reply": "Please enter a valid query."})
+
+    conv_id = conversation_id()
+    remember(conv_id, "user", user_query)
+    with timed("chatbot", "faq_match"):
+        reply_html = local_reply(user_query.lower())
+    if reply_html is None:
+        llm_reply = cached_query_groq(user_query, llm_prompt(conv_id, user_query))
+        with timed("chatbot", "render"):
+            reply_html = render_reply(parse_llm_reply(llm_reply))
+
+    remember(conv_id, "bot", reply_html)
+    return jsonify({"reply": reply_html})
+
+@chatbot_bp.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Like /api/chat, but as Server-Sent Events.
+
+    `token` events carry the raw LLM output as it is generated, `section`
+    events the rendered HTML of each reply section once it is complete, and
+    a final `done` event the full reply. When the LLM fails, an `error`
+    event carrying the message comes before `done`, whose reply then only
+    holds the sections completed before the failure.
+    """
+    user_query = (request.get_json(silent=True) or {}).get("message", "").strip()
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if not user_query:
+        body = sse_event("done", {"reply": "Please enter a valid query."})
+        return Response(body, mimetype="text/event-stream", headers=headers)
+
+    conv_id = conversation_id()
+    user_id = session.get("user_id")
+    remember(conv_id, "user", user_query)
+    with timed("chatbot", "faq_match"):
+        reply_html = local_reply(user_query.lower())
+    if reply_html is None:
+        cached = response_cache.get(user_query)
+        if cached is not None:
+            reply_html = render_reply(parse_llm_reply(cached))
+    if reply_html is not None:
+        remember(conv_id, "bot", reply_html)
+        return Response(sse_event("done", {"reply": reply_html}), mimetype="text/event-stream", headers=headers)
+
+    prompt = llm_prompt(conv_id, user_query)
 
-    session["chat_history"].append({"role": "bot", "content": reply_html})
-    session.modified = True
+    def generate():
+        parser = JSONSectionParser()
+        sections = {}
+        failed = finished = False
+        try:
+            # Includes the time the client takes to read each event
+            with timed("chatbot", "llm_stream"):
+                try:
+                    for piece in stream_groq(prompt):
+                        yield sse_event("token", {"text": piece})
+                        for key, value in parser.feed(piece):
+                            sections[key] = value
+                            yield sse_event("section", {"html": render_reply({key: value})})
+                    finished = True
+                except LLMError:
+                    failed = True
+            if failed:
+                # Kept out of parser.text: the error is not part of the reply
+                yield sse_event("error", {"message": GROQ_UNAVAILABLE})
+            elif finished and parser.text and not is_error_reply(parser.text):
+                # Only replies whose stream reached [DONE] without an error are cached
+                response_cache.set(user_query, parser.text)
+        finally:
+            # Also runs when the client disconnects mid-stream, keeping the sections generated so far
+            reply_html = render_reply(parse_llm_reply(parser.text) if finished else sections)
+            if reply_html:
+                chat_store.append(conv_id, "bot", reply_html, user_id=user_id)
+        yield sse_event("done", {"reply": reply_html})
 
-    return jsonify({"reply": reply_html})
\ No newline at end of file
+    return Response(generate(), mimetype="text/event-stream", headers=headers)
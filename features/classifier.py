@@ -0,0 +1,100 @@
+import numpy as np
+
+from features.backends import load_backend
+from features.metrics import timed
+from features.ml_utils import model_file_version
+from features.preprocessing import TTA_VIEWS, decode_views
+
+
+class ImageClassifier:
+    """Serving code shared by the skin and nail classifiers.
+
+    Subclasses set `name` (the model's name in the registry, the executor and
+    the metrics) and `classes`, and implement `preprocess_batch` (the
+    model's own preprocess_input) and `_to_probs` (raw outputs to
+    probabilities).
+    """
+
+    name = ""
+    classes: list = []
+
+    def __init__(self, model_path: str, backend: str = "keras", variant: str = "float", executor=None,
+                 tta_views: int = 1):
+        self.input_h, self.input_w = 224, 224
+        if executor is not None:
+            # The model lives in the executor's worker processes, not in this one
+            self.backend = executor.backend(self.name)
+        else:
+            self.backend = load_backend(model_path, backend, variant)
+        # The file actually served (e.g. the exported .tflite), and its version for the prediction cache
+        self.model_path = self.backend.path
+        # Views averaged per prediction (see TTA_VIEWS in features/preprocessing.py); 1 turns TTA off
+        self.tta_views = max(1, min(tta_views, len(TTA_VIEWS)))
+        self.version = model_file_version(self.model_path)
+        # Optional MicroBatcher shared by concurrent requests (see features/batching.py)
+        self.batcher = None
+
+    def preprocess_batch(self, images) -> np.ndarray:
+        """Turn decoded (h, w, 3) uint8 RGB images into this model's float32 input batch."""
+        raise NotImplementedError
+
+    def _to_probs(self, outputs: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _decode_views(self, image_bytes: bytes) -> list:
+        """The upload resized to the model input, or its `tta_views` augmented views."""
+        return decode_views(image_bytes, (self.input_w, self.input_h), self.tta_views)
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        return self.backend.predict(batch)
+
+    def _infer(self, input_tensor: np.ndarray) -> np.ndarray:
+        if self.batcher is not None:
+            return self.batcher.submit(input_tensor)
+        return self.predict_batch(input_tensor)
+
+    def _to_result(self, probs: np.ndarray) -> dict:
+        best_idx = int(np.argmax(probs))
+        return {
+            "label": self.classes[best_idx],
+            "probability": float(probs[best_idx]),
+        }
+
+    def predict(self, image_bytes: bytes) -> dict:
+        with timed(self.name, "decode"):
+            views = self._decode_views(image_bytes)
+        return self.predict_views(views)
+
+    def predict_views(self, views: list) -> dict:
+        """Classify the decoded views of one upload (as returned by `_decode_views`)."""
+        with timed(self.name, "preprocess"):
+            input_tensor = self.preprocess_batch(views)
+        with timed(self.name, "inference"):
+            outputs = self._infer(input_tensor)
+        with timed(self.name, "postprocess"):
+            # All views went through the model as one batch; their probabilities are averaged
+            return self._to_result(self._to_probs(outputs).mean(axis=0))
+
+    def predict_many(self, images_bytes) -> list:
+        """Classify several uploads with one forward pass.
+
+        Returns one result dict per image, or the exception raised while
+        decoding it, in input order.
+        """
+        results, decoded = [None] * len(images_bytes), []
+        with timed(self.name, "decode"):
+            for i, image_bytes in enumerate(images_bytes):
+                try:
+                    decoded.append((i, self._decode_views(image_bytes)))
+                except Exception as e:
+                    results[i] = e
+        if decoded:
+            with timed(self.name, "preprocess"):
+                batch = self.preprocess_batch([view for _, views in decoded for view in views])
+            with timed(self.name, "inference"):
+                outputs = self._infer(batch)
+            with timed(self.name, "postprocess"):
+                probs = self._to_probs(outputs).reshape(len(decoded), -1, len(self.classes))
+                for (i, _), views in zip(decoded, probs):
+                    results[i] = self._to_result(views.mean(axis=0))
+        return results
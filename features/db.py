@@ -0,0 +1,91 @@
+import sqlite3
+import logging
+import threading
+from typing import List
+
+from flask import current_app, g
+
+
+# Applied to every new connection. WAL lets readers proceed while signup /
+# profile updates write; synchronous=NORMAL is durable in WAL mode except
+# for the last commits on power loss; cache_size is in KiB when negative.
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", "-8000"),
+    ("mmap_size", str(64 * 1024 * 1024)),
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", "5000"),
+)
+
+
+class SQLitePool:
+    """Small pool of long-lived SQLite connections.
+
+    Keeping connections open means the pragmas are applied once and each
+    connection's statement cache (`cached_statements`) keeps the prepared
+    login / profile queries between requests. With size 0 every acquire
+    opens a fresh connection, which is how the app behaved before pooling.
+    """
+
+    def __init__(self, path: str, size: int = 8):
+        self.path = path
+        self.size = size
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections move between request threads, but only one thread uses a connection at a time
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS:
+            conn.execute(f"PRAGMA {name}={value}")
+        self.opened += 1
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logging.warning("Dropping broken SQLite connection: %s", e)
+            conn.close()
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def init_app(app) -> SQLitePool:
+    pool = SQLitePool(app.config['DATABASE'], app.config.get('DB_POOL_SIZE', 8))
+    app.extensions['sqlite_pool'] = pool
+
+    @app.teardown_appcontext
+    def _release_db(exc):
+        conn = g.pop('db', None)
+        if conn is not None:
+            pool.release(conn)
+
+    return pool
+
+
+def get_db() -> sqlite3.Connection:
+    """Connection for the current request, checked out of the app's pool on first use."""
+    if 'db' not in g:
+        g.db = current_app.extensions['sqlite_pool'].acquire()
+    return g.db
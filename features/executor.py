@@ -0,0 +1,211 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from features.backends import InferenceBackend, backend_model_path, load_backend
+
+
+class InferenceBusy(Exception):
+    """Raised when the executor queue is full; callers should answer 503 with Retry-After."""
+
+    def __init__(self, retry_after: int = 2):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+# ---------------- Worker process side ---------------- #
+
+_worker_backends: Dict[str, InferenceBackend] = {}
+
+
+def _init_worker(specs: Dict[str, Tuple[str, str, str]]):
+    for name, (keras_path, backend, variant) in specs.items():
+        try:
+            model = load_backend(keras_path, backend, variant)
+            # Both classifiers take 224x224 RGB inputs
+            model.predict(np.zeros((1, 224, 224, 3), dtype="float32"))
+            _worker_backends[name] = model
+        except Exception as e:
+            logging.error("Inference worker %d could not load %s: %s", os.getpid(), name, e)
+
+
+def _run_task(name: str, shm_name: str, shape, dtype: str) -> np.ndarray:
+    model = _worker_backends.get(name)
+    if model is None:
+        raise RuntimeError(f"Model {name} is not loaded in inference worker {os.getpid()}")
+    # Worker processes share the parent's resource tracker, so attaching here
+    # does not take ownership; the parent unlinks the block when the task is done
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        outputs = np.array(model.predict(np.ndarray(shape, dtype=dtype, buffer=shm.buf)))
+    finally:
+        shm.close()
+    return outputs
+
+
+# ---------------- Request process side ---------------- #
+
+# Seconds a client is asked to wait after a worker died: the new workers load every model first
+RESTART_RETRY_AFTER = 10
+
+class InferenceExecutor:
+    """Fixed pool of worker processes that each load every model once.
+
+    Preprocessed batches are handed over through shared memory rather than
+    pickled, and at most `queue_size` tasks may be queued or running; beyond
+    that `run` raises InferenceBusy instead of letting requests pile up.
+    If a worker process dies (e.g. killed for running out of memory), the
+    broken pool is discarded and started again on the next task, and the
+    tasks that were in flight fail with InferenceBusy.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.workers = 2
+        self.timeout = 30.0
+        self.queue_size = 16
+        self.specs: Dict[str, Tuple[str, str, str]] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def init_app(self, app, model_files: Dict[str, str]):
+        self.shutdown()
+        self.enabled = app.config.get("INFERENCE_EXECUTOR", "inline") == "process"
+        self.workers = max(1, app.config.get("INFERENCE_WORKERS", 2))
+        self.timeout = app.config.get("INFERENCE_TIMEOUT", 30.0)
+        self.queue_size = max(1, app.config.get("INFERENCE_QUEUE_SIZE", 16))
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        backend = app.config.get("INFERENCE_BACKEND", "keras")
+        variant = app.config.get("MODEL_VARIANT", "float")
+        self.specs = {name: (path, backend, variant) for name, path in model_files.items()}
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        # Started on first use (and again after a fork) so a pre-fork master never owns the pool
+        pid = os.getpid()
+        if self._pool is not None and self._pid == pid:
+            return self._pool
+        with self._lock:
+            if self._pool is None or self._pid != pid:
+                # spawn, not fork: TensorFlow's thread pools do not survive a fork
+                ctx = multiprocessing.get_context("spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx,
+                                                 initializer=_init_worker, initargs=(self.specs,))
+                self._pid = pid
+                logging.info("Started %d inference worker processes", self.workers)
+        return self._pool
+
+    def _discard_pool(self, pool: Optional[ProcessPoolExecutor]):
+        with self._lock:
+            if pool is None or self._pool is not pool:
+                return  # already replaced by another thread
+            self._pool = None
+            self.restarts += 1
+        logging.error("An inference worker process died; starting a new pool on the next task")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, name: str, batch: np.ndarray) -> np.ndarray:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise InferenceBusy()
+        try:
+            batch = np.ascontiguousarray(batch, dtype="float32")
+            shm = shared_memory.SharedMemory(create=True, size=max(batch.nbytes, 1))
+        except Exception:
+            self._slots.release()
+            raise
+        pool = None
+        try:
+            np.ndarray(batch.shape, dtype=batch.dtype, buffer=shm.buf)[:] = batch
+            pool = self._ensure_pool()
+            future = pool.submit(_run_task, name, shm.name, batch.shape, batch.dtype.str)
+        except Exception as e:
+            shm.close()
+            shm.unlink()
+            self._slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._discard_pool(pool)
+                raise InferenceBusy(RESTART_RETRY_AFTER) from e
+            raise
+
+        released = []
+        release_lock = threading.Lock()
+
+        def _release(_=None):
+            # Free the slot and the block only once the worker is finished with them
+            with release_lock:
+                if released:
+                    return
+                released.append(True)
+            shm.close()
+            shm.unlink()
+            self._slots.release()
+
+        # Covers tasks we stopped waiting for; finished tasks are released below
+        # right away, since done-callbacks may run after result() has returned
+        future.add_done_callback(_release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"{name} inference took longer than {self.timeout}s")
+        except BrokenProcessPool as e:
+            self._discard_pool(pool)
+            raise InferenceBusy(RESTART_RETRY_AFTER) from e
+        finally:
+            if future.done():
+                _release()
+
+    def backend(self, name: str) -> "ExecutorBackend":
+        keras_path, backend, variant = self.specs[name]
+        path = backend_model_path(keras_path, backend, variant)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model not found for {backend} backend: {path}")
+        return ExecutorBackend(self, name, path)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+            }
+
+
+class ExecutorBackend(InferenceBackend):
+    """Backend that forwards batches to the worker processes instead of holding the model here."""
+
+    name = "process"
+
+    def __init__(self, executor: InferenceExecutor, model_name: str, path: str):
+        super().__init__(path)
+        self.executor = executor
+        self.model_name = model_name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.executor.run(self.model_name, batch)
+
+
+inference_executor = InferenceExecutor()
@@ -0,0 +1,137 @@
+"""Export the .keras models for the lightweight inference backends.
+
+    python -m features.export_models --format tflite
+    python -m features.export_models --format onnx --verify
+
+Exported files are written next to the originals in MODELS_DIR
+(`best_nail_model.keras` -> `best_nail_model.tflite`), which is where
+INFERENCE_BACKEND=tflite / onnx looks for them. With --verify every exported
+model is checked against the Keras backend on the images in static/uploads
+plus a few synthetic inputs: top-1 labels must match and probabilities must
+be within --atol.
+"""
+import os
+import sys
+import glob
+import argparse
+import tempfile
+
+import numpy as np
+
+from features.backends import backend_model_path
+from features.preprocessing import decode_image
+from features.skin import SKIN_MODEL_FILE, SkinDiseaseClassifier
+from features.nail import NAIL_MODEL_FILE, NailDiseaseClassifier
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODELS = {
+    "skin": (SKIN_MODEL_FILE, SkinDiseaseClassifier),
+    "nail": (NAIL_MODEL_FILE, NailDiseaseClassifier),
+}
+
+
+def _load_keras(path: str):
+    try:
+        from tensorflow import keras
+    except Exception:
+        import keras  # type: ignore
+    return keras.models.load_model(path, compile=False)
+
+
+def export_tflite(keras_path: str, out_path: str, optimizations=None, supported_types=None):
+    import tensorflow as tf
+
+    model = _load_keras(keras_path)
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        # Going through a SavedModel works for both Keras 2 and Keras 3 models
+        model.export(saved_model_dir)
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        if optimizations:
+            converter.optimizations = optimizations
+        if supported_types:
+            converter.target_spec.supported_types = supported_types
+        tflite_model = converter.convert()
+    with open(out_path, "wb") as f:
+        f.write(tflite_model)
+
+
+def export_onnx(keras_path: str, out_path: str):
+    import tensorflow as tf
+    import tf2onnx  # type: ignore
+
+    model = _load_keras(keras_path)
+    h, w = model.input_shape[1:3]
+    spec = [tf.TensorSpec((None, h, w, 3), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=17, output_path=out_path)
+
+
+def sample_images(directory: str, size=(224, 224), synthetic: int = 4):
+    """Decoded uint8 images from `directory` plus a few deterministic random ones."""
+    images = []
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        try:
+            with open(path, "rb") as f:
+                images.append(decode_image(f.read(), size))
+        except Exception:
+            continue
+    rng = np.random.default_rng(0)
+    for _ in range(synthetic):
+        images.append(rng.integers(0, 256, (size[1], size[0], 3), dtype="uint8"))
+    return images
+
+
+def _probs(clf, images) -> np.ndarray:
+    outputs = np.asarray(clf.predict_batch(clf.preprocess_batch(images)))
+    sums = outputs.sum(axis=1, keepdims=True)
+    if np.all(outputs >= 0) and np.all(np.abs(sums - 1.0) < 1e-3):
+        return outputs
+    exp = np.exp(outputs - outputs.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def compare(name: str, keras_path: str, backend: str, images, atol: float) -> bool:
+    cls = MODELS[name][1]
+    reference = _probs(cls(keras_path, "keras"), images)
+    candidate = _probs(cls(keras_path, backend), images)
+    top1 = float(np.mean(reference.argmax(axis=1) == candidate.argmax(axis=1)))
+    max_diff = float(np.max(np.abs(reference - candidate)))
+    ok = top1 == 1.0 and max_diff <= atol
+    print(f"{name} [{backend}]: top-1 agreement {top1:.2%}, max |dp| {max_diff:.5f} -> {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=["tflite", "onnx"], default="tflite")
+    parser.add_argument("--models-dir", default=os.path.join(ROOT, "models"))
+    parser.add_argument("--only", choices=sorted(MODELS), help="Export a single model")
+    parser.add_argument("--verify", action="store_true", help="Check parity with the Keras backend after exporting")
+    parser.add_argument("--images", default=os.path.join(ROOT, "static", "uploads"),
+                        help="Directory of sample images for --verify")
+    parser.add_argument("--atol", type=float, default=1e-3, help="Max allowed probability difference for --verify")
+    args = parser.parse_args(argv)
+
+    ok = True
+    images = sample_images(args.images) if args.verify else None
+    for name, (filename, _) in MODELS.items():
+        if args.only and name != args.only:
+            continue
+        keras_path = os.path.join(args.models_dir, filename)
+        if not os.path.exists(keras_path):
+            print(f"{name}: {keras_path} not found, skipping", file=sys.stderr)
+            ok = False
+            continue
+        out_path = backend_model_path(keras_path, args.format)
+        if args.format == "tflite":
+            export_tflite(keras_path, out_path)
+        else:
+            export_onnx(keras_path, out_path)
+        print(f"{name}: wrote {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB)")
+        if args.verify:
+            ok = compare(name, keras_path, args.format, images, args.atol) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: finds every pattern in one pass over the text."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        # goto[state] maps a character to the next state; state 0 is the root
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        if not pattern:
+            # Keeps its id, so later ids still line up with the caller's list, but never matches
+            self.patterns.append(pattern)
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (len(self.patterns),)
+        self.patterns.append(pattern)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                # Inherit the matches of the longest proper suffix
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[int]:
+        """Ids (indexes into `patterns`) of every pattern occurring in `text`, without duplicates."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found, seen = [], set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pid in out[state]:
+                if pid not in seen:
+                    seen.add(pid)
+                    found.append(pid)
+        return found
+
+
+class FAQIndex:
+    """Index over the chatbot knowledge base, built once at import.
+
+    Every condition name and alias becomes a pattern of one Aho-Corasick
+    automaton, so a query is matched against the whole knowledge base in a
+    single pass. Matching keeps the semantics of the old nested scan: a
+    condition matches when its name (or an alias) is a substring of the
+    lower-cased query, and ties go to the condition listed first.
+    """
+
+    def __init__(self, faq_data: Dict[str, Dict[str, dict]], aliases: Optional[Dict[str, List[str]]] = None):
+        aliases = aliases or {}
+        # (category, condition, info) in knowledge-base order
+        self.entries: List[Tuple[str, str, dict]] = []
+        terms: List[str] = []
+        term_entry: List[int] = []
+        for category, items in faq_data.items():
+            for condition, info in items.items():
+                entry_id = len(self.entries)
+                self.entries.append((category, condition, info))
+                for term in [condition] + list(aliases.get(condition, [])):
+                    if not term.strip():
+                        continue
+                    terms.append(term.lower())
+                    term_entry.append(entry_id)
+        self._term_entry = term_entry
+        self._matcher = AhoCorasick(terms)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def match_all(self, query_lower: str) -> List[Tuple[str, str, dict]]:
+        entry_ids = sorted({self._term_entry[pid] for pid in self._matcher.find(query_lower)})
+        return [self.entries[i] for i in entry_ids]
+
+    def match(self, query_lower: str) -> Optional[Tuple[str, str, dict]]:
+        entry_ids = [self._term_entry[pid] for pid in self._matcher.find(query_lower)]
+        return self.entries[min(entry_ids)] if entry_ids else None
@@ -0,0 +1,212 @@
+import json
+import time
+import uuid
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from flask import jsonify, request, session, url_for
+from werkzeug.utils import secure_filename
+
+from features.executor import InferenceBusy
+from features.prediction_cache import prediction_cache
+from features.uploads import read_upload
+
+
+class Job:
+    def __init__(self, kind: str, owner, total: int):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.total = total
+        self.status = "queued"  # queued -> running -> done | failed
+        self.results: List[dict] = []
+        self.completed = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row) -> "Job":
+        job = cls(row["kind"], row["owner"], row["total"])
+        job.id = row["id"]
+        job.status = row["status"]
+        job.results = json.loads(row["results"]) if row["results"] else []
+        job.completed = row["completed"]
+        job.error = row["error"]
+        job.created_at = row["created_at"]
+        job.finished_at = row["finished_at"]
+        return job
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "results": self.results if self.status == "done" else [],
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobStore:
+    """Asynchronous prediction jobs, kept in the `jobs` table of the app database.
+
+    Jobs run on a small thread pool of the process that accepted them, but
+    their status, progress and results are written to SQLite, so a poll
+    answered by any server process sees them. Finished jobs are kept for
+    JOB_TTL_SECONDS; so are jobs that never finish because their process died.
+    """
+
+    def __init__(self):
+        self._db = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.ttl = 3600
+        self.batch_size = 16
+        self.max_images = 64
+
+    def init_app(self, app):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self._pool = ThreadPoolExecutor(max_workers=app.config.get("JOB_WORKERS", 2), thread_name_prefix="predict-job")
+        self.ttl = app.config.get("JOB_TTL_SECONDS", 3600)
+        self.batch_size = max(1, app.config.get("JOB_BATCH_SIZE", 16))
+        self.max_images = app.config.get("JOB_MAX_IMAGES", 64)
+        self._db = app.extensions["sqlite_pool"]
+        self._execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                owner INTEGER,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                results TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            );
+            """
+        )
+
+    def _execute(self, sql: str, params=()):
+        conn = self._db.acquire()
+        try:
+            row = conn.execute(sql, params).fetchone()
+            conn.commit()
+            return row
+        finally:
+            self._db.release(conn)
+
+    def submit(self, kind: str, owner, fn: Callable[[Job], None], total: int) -> Job:
+        job = Job(kind, owner, total)
+        # Also drops jobs whose process died before they finished
+        self._execute("DELETE FROM jobs WHERE COALESCE(finished_at, created_at) < ?", (time.time() - self.ttl,))
+        self._execute(
+            "INSERT INTO jobs (id, kind, owner, status, total, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job.id, job.kind, job.owner, job.status, job.total, job.created_at),
+        )
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def save(self, job: Job):
+        """Write the status and progress of `job`; the results once it is done."""
+        job.completed = len(job.results)
+        try:
+            self._execute(
+                "UPDATE jobs SET status=?, completed=?, results=?, error=?, finished_at=? WHERE id=?",
+                (job.status, job.completed, json.dumps(job.results) if job.status == "done" else None,
+                 job.error, job.finished_at, job.id),
+            )
+        except sqlite3.Error as e:
+            logging.error("Failed to save prediction job %s: %s", job.id, e)
+
+    def _run(self, job: Job, fn: Callable[[Job], None]):
+        job.status = "running"
+        self.save(job)
+        try:
+            fn(job)
+            job.status = "done"
+        except Exception as e:
+            logging.exception("Prediction job %s failed: %s", job.id, e)
+            job.error = str(e)
+            job.status = "failed"
+        job.finished_at = time.time()
+        self.save(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._execute("SELECT * FROM jobs WHERE id=?", (job_id,))
+        return Job.from_row(row) if row is not None else None
+
+
+def run_prediction_job(job: Job, model_name: str, clf, items: List[Tuple[str, bytes]],
+                       format_label: Callable[[str], str] = str, batch_size: int = 16):
+    """Classify `items` (filename, bytes) in batches of `batch_size`, appending results to `job`."""
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        for attempt in range(5):
+            try:
+                preds = prediction_cache.predict_many(model_name, clf, [data for _, data in chunk])
+                break
+            except InferenceBusy as e:
+                # Unlike an interactive request, a job can afford to wait for capacity
+                if attempt == 4:
+                    raise
+                time.sleep(e.retry_after)
+        for (filename, _), pred in zip(chunk, preds):
+            if isinstance(pred, Exception):
+                job.results.append({"filename": filename, "error": f"Could not read image: {pred}"})
+            else:
+                job.results.append({
+                    "filename": filename,
+                    "predicted": format_label(pred["label"]),
+                    "confidence": round(pred["probability"], 4),
+                })
+        # Progress for polls, which may be answered by another server process
+        job_store.save(job)
+
+
+job_store = JobStore()
+
+
+def add_job_routes(bp, model_name: str, get_classifier: Callable[[], object], format_label: Callable[[str], str] = str):
+    """Add the JSON batch API of `model_name` to `bp`: POST api/predict and GET api/jobs/<job_id>."""
+
+    def api_predict():
+        """Queue a batch of images for classification; poll the returned status_url for results."""
+        if not session.get("user_id"):
+            return jsonify({"error": "Authentication required"}), 401
+
+        files = request.files.getlist("images") or request.files.getlist("image")
+        if not files:
+            return jsonify({"error": "Upload one or more files in the 'images' field"}), 400
+        if len(files) > job_store.max_images:
+            return jsonify({"error": f"At most {job_store.max_images} images per request"}), 400
+
+        clf = get_classifier()
+        if clf is None:
+            return jsonify({"error": f"{model_name.title()} model not available"}), 503
+
+        items = [(secure_filename(f.filename or "") or f"image-{i}", read_upload(f)) for i, f in enumerate(files)]
+        job = job_store.submit(
+            model_name, session["user_id"],
+            lambda job: run_prediction_job(job, model_name, clf, items, format_label=format_label,
+                                           batch_size=job_store.batch_size),
+            total=len(items),
+        )
+        return jsonify({"job_id": job.id, "status": job.status,
+                        "status_url": url_for(f"{bp.name}.api_job", job_id=job.id)}), 202
+
+    def api_job(job_id):
+        job = job_store.get(job_id)
+        if job is None or job.kind != model_name or job.owner != session.get("user_id"):
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job.to_dict())
+
+    bp.add_url_rule("/api/predict", "api_predict", api_predict, methods=["POST"])
+    bp.add_url_rule("/api/jobs/<job_id>", "api_job", api_job, methods=["GET"])
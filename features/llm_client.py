@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from bisect import bisect_left
+from typing import Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama-3.1-8b-instant"
+
+# Upstream statuses worth another attempt; anything else is returned to the caller as is
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Call latency histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class LLMError(Exception):
+    """The LLM endpoint could not be reached or did not return JSON."""
+
+
+class LLMClient:
+    """Thread-safe client for the OpenAI-compatible chat completions endpoint.
+
+    One `requests.Session` per process keeps TLS connections alive between
+    chatbot requests. Every call has connect/read timeouts, connection errors
+    and 429/5xx answers are retried a bounded number of times with jittered
+    exponential backoff, and at most `max_concurrency` calls are in flight so
+    a slow upstream cannot tie up every request thread.
+    """
+
+    def __init__(self):
+        self.url = GROQ_API_URL
+        self.model = GROQ_MODEL
+        self.api_key: Optional[str] = None
+        self.connect_timeout = 3.05
+        self.read_timeout = 30.0
+        self.max_retries = 2
+        self.backoff = 0.5
+        self.max_concurrency = 8
+        self.pool_size = 8
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._session: Optional[requests.Session] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def init_app(self, app):
+        self.url = app.config.get("GROQ_API_URL", GROQ_API_URL)
+        self.model = app.config.get("GROQ_MODEL", GROQ_MODEL)
+        self.api_key = app.config.get("GROQ_API_KEY") or os.getenv("GROQ_API_KEY")
+        self.connect_timeout = app.config.get("LLM_CONNECT_TIMEOUT", 3.05)
+        self.read_timeout = app.config.get("LLM_READ_TIMEOUT", 30.0)
+        self.max_retries = max(0, app.config.get("LLM_MAX_RETRIES", 2))
+        self.max_concurrency = max(1, app.config.get("LLM_MAX_CONCURRENCY", 8))
+        self.pool_size = self.max_concurrency
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.close()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._attempts = 0
+        self._retries = 0
+        self._errors = 0
+        self._rejected = 0
+        self._latency_sum_ms = 0.0
+        self._latency_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._first_token_sum_ms = 0.0
+        self._first_token_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def _get_session(self) -> requests.Session:
+        # Sockets must not be shared with a forked parent, so each process opens its own pool
+        pid = os.getpid()
+        if self._session is not None and self._pid == pid:
+            return self._session
+        with self._lock:
+            if self._session is None or self._pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+                self._pid = pid
+        return self._session
+
+    def _sleep_before_retry(self, attempt: int, retry_after: Optional[str] = None):
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        time.sleep(min(delay, self.read_timeout))
+
+    def _acquire_slot(self):
+        # Wait at most a connect timeout for a free slot rather than queueing indefinitely
+        if not self._slots.acquire(timeout=self.connect_timeout):
+            with self._stats_lock:
+                self._rejected += 1
+            raise LLMError("Too many concurrent LLM requests")
+
+    def _payload(self, messages: List[dict], temperature: float, stream: bool = False) -> dict:
+        payload = {"model": self.model, "messages": messages, "temperature": temperature}
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def chat_completion(self, messages: List[dict], temperature: float = 0.7) -> dict:
+        """POST a chat completion and return the decoded JSON body (including API error bodies)."""
+        self._acquire_slot()
+        started = time.perf_counter()
+        try:
+            response = self._post(self._payload(messages, temperature))
+            try:
+                return response.json()
+            except ValueError:
+                raise LLMError(f"Invalid response from LLM endpoint (HTTP {response.status_code})")
+        except LLMError:
+            with self._stats_lock:
+                self._errors += 1
+            raise
+        finally:
+            self._slots.release()
+            self._record((time.perf_counter() - started) * 1000.0)
+
+    def stream_chat_completion(self, messages: List[dict], temperature: float = 0.7) -> Iterator[str]:
+        """Yield the content deltas of a streamed chat completion as they arrive.
+
+        Retries only happen before the first byte; the concurrency slot is held
+        until the stream is exhausted or the generator is closed. A stream that
+        ends without the final `data: [DONE]` raises LLMError, so a reply cut
+        off by the upstream is never mistaken for a complete one.
+        """
+        self._acquire_slot()
+        started = time.perf_counter()
+        first_token = True
+        response = None
+        try:
+            response = self._post(self._payload(messages, temperature, stream=True), stream=True)
+            if response.status_code != 200:
+                try:
+                    error = response.json().get("error", "Unexpected response")
+                except ValueError:
+                    error = f"HTTP {response.status_code}"
+                raise LLMError(f"API Error: {error}")
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                try:
+                    choices = json.loads(data).get("choices") or [{}]
+                except ValueError:
+                    raise LLMError("Invalid chunk in LLM stream")
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    if first_token:
+                        first_token = False
+                        self._record_first_token((time.perf_counter() - started) * 1000.0)
+                    yield delta
+            raise LLMError("LLM stream ended before [DONE]")
+        except requests.exceptions.RequestException as e:
+            with self._stats_lock:
+                self._errors += 1
+            raise LLMError(f"LLM stream interrupted: {e}")
+        except LLMError:
+            with self._stats_lock:
+                self._errors += 1
+            raise
+        finally:
+            if response is not None:
+                response.close()
+            self._slots.release()
+            self._record((time.perf_counter() - started) * 1000.0)
+
+    def _post(self, payload: dict, stream: bool = False) -> requests.Response:
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        session = self._get_session()
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            with self._stats_lock:
+                self._attempts += 1
+                self._retries += attempt > 0
+            try:
+                response = session.post(self.url, headers=headers, json=payload, stream=stream,
+                                        timeout=(self.connect_timeout, self.read_timeout))
+            except requests.exceptions.ReadTimeout:
+                # A stuck upstream is not retried: that would only multiply the wait
+                raise LLMError(f"LLM request timed out after {self.read_timeout}s")
+            except requests.exceptions.RequestException as e:
+                if last:
+                    raise LLMError(f"LLM request failed: {e}")
+                logging.warning("LLM request failed (attempt %d): %s", attempt + 1, e)
+                self._sleep_before_retry(attempt)
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last:
+                logging.warning("LLM endpoint returned %d (attempt %d)", response.status_code, attempt + 1)
+                response.close()
+                self._sleep_before_retry(attempt, response.headers.get("Retry-After"))
+                continue
+            return response
+        raise LLMError("LLM request failed")
+
+    def _record(self, latency_ms: float):
+        with self._stats_lock:
+            self._calls += 1
+            self._latency_sum_ms += latency_ms
+            self._latency_counts[bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+    def _record_first_token(self, latency_ms: float):
+        with self._stats_lock:
+            self._first_token_sum_ms += latency_ms
+            self._first_token_counts[bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+    def close(self):
+        with self._lock:
+            if self._session is not None and self._pid == os.getpid():
+                self._session.close()
+            self._session = None
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            buckets = {str(b): c for b, c in zip(LATENCY_BUCKETS_MS, self._latency_counts)}
+            buckets["+Inf"] = self._latency_counts[-1]
+            first_token = {str(b): c for b, c in zip(LATENCY_BUCKETS_MS, self._first_token_counts)}
+            first_token["+Inf"] = self._first_token_counts[-1]
+            return {
+                "url": self.url,
+                "max_concurrency": self.max_concurrency,
+                "calls": self._calls,
+                "attempts": self._attempts,
+                "retries": self._retries,
+                "errors": self._errors,
+                "rejected": self._rejected,
+                "latency_ms_histogram": buckets,
+                "latency_ms_sum": round(self._latency_sum_ms, 3),
+                "first_token_ms_histogram": first_token,
+                "first_token_ms_sum": round(self._first_token_sum_ms, 3),
+            }
+
+
+llm_client = LLMClient()
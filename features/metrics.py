@@ -0,0 +1,169 @@
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from flask import g, request
+
+
+# Histogram bucket upper bounds, in seconds (Prometheus convention)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("labels", "started")
+
+    def __init__(self, labels):
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Process-wide metrics, exposed in the Prometheus text format at /metrics.
+
+    When disabled (METRICS_ENABLED=0), `timed` hands out a shared no-op
+    context manager and no request hooks are installed, so instrumented code
+    pays one attribute check per stage.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._metrics: list = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=STAGE_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def timed(self, feature: str, stage: str):
+        """Context manager recording the duration of `stage` of `feature` (e.g. "skin", "decode")."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer((feature, stage))
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", True)
+        if not self.enabled:
+            return
+
+        @app.before_request
+        def _start_request_timer():
+            g.metrics_started = time.perf_counter()
+
+        @app.after_request
+        def _record_request(response):
+            started = g.pop("metrics_started", None)
+            if started is not None:
+                # The endpoint name, not the path, keeps label cardinality bounded
+                endpoint = request.endpoint or "unmatched"
+                REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+                REQUESTS.inc(endpoint, request.method, str(response.status_code))
+            return response
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+timed = metrics.timed
+
+STAGE_SECONDS = metrics.histogram("dermaai_stage_seconds", "Time spent in each hot-path stage.", ("feature", "stage"))
+REQUEST_SECONDS = metrics.histogram("dermaai_http_request_seconds", "Request handling time by endpoint.", ("endpoint",))
+REQUESTS = metrics.counter("dermaai_http_requests_total", "Requests by endpoint, method and status.",
+                           ("endpoint", "method", "status"))
+UPSTREAM_ERRORS = metrics.counter("dermaai_upstream_errors_total", "Failed LLM / Gemini calls.", ("service",))
+MODEL_SECONDS = metrics.histogram("dermaai_model_seconds", "Model call time by model file version.",
+                                  ("model", "version"))
+MODEL_PREDICTIONS = metrics.counter("dermaai_model_predictions_total", "Predicted labels by model file version.",
+                                    ("model", "version", "label"))
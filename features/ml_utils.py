@@ -1,5 +1,14 @@
 import os
-from typing import List, Tuple
+import time
+import random
+import logging
+import threading
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from features.metrics import MODEL_PREDICTIONS, MODEL_SECONDS, metrics
 
 
 def _lazy_import_tf():
@@ -10,25 +19,129 @@ def _lazy_import_tf():
         return None
 
 
+def model_file_version(path: str) -> str:
+    """Cheap identity for a model file: changes whenever the file is replaced or rewritten."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
 class ModelWrapper:
-    def __init__(self, model_path: str, input_size: Tuple[int, int], class_names: List[str]):
+    """Loads, warms up and holds one model.
+
+    `loader` builds the object that serves predictions (e.g. a
+    SkinDiseaseClassifier) from the model path; without one the file is
+    loaded as a plain Keras model. Loading is guarded by a lock so concurrent
+    callers never load the same file twice. A failed load is tried again by
+    the next caller once the model file has changed (e.g. it was downloaded
+    after startup) or `retry_seconds` have passed.
+    """
+
+    def __init__(self, model_path: str, input_size: Tuple[int, int], class_names: List[str],
+                 loader: Optional[Callable[[str], object]] = None, name: Optional[str] = None,
+                 retry_seconds: float = 30.0):
         self.model_path = model_path
         self.input_size = input_size
         self.class_names = class_names
+        self.loader = loader
+        self.name = name or os.path.basename(model_path)
         self.model = None
+        self.state = "pending"  # pending -> loading -> ready | failed
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        # The file the loader actually served (e.g. an exported .tflite) and its version, once loaded
+        self.served_path: Optional[str] = None
+        self.file_version: Optional[str] = None
+        self.retry_seconds = retry_seconds
+        self._failed_version: Optional[str] = None
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
 
-    def load(self) -> bool:
-        tf = _lazy_import_tf()
-        if tf is None:
-            return False
-        if not os.path.exists(self.model_path):
-            return False
-        try:
-            self.model = tf.keras.models.load_model(self.model_path)
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def retry_due(self) -> bool:
+        """Whether a failed load may be tried again."""
+        return (self.state == "failed"
+                and (model_file_version(self.model_path) != self._failed_version
+                     or time.monotonic() - self._failed_at >= self.retry_seconds))
+
+    def load(self, warmup: bool = True) -> bool:
+        if self.model is not None:
             return True
-        except Exception:
-            self.model = None
-            return False
+        with self._lock:
+            if self.model is not None:
+                return True
+            if self.state == "failed" and not self.retry_due():
+                return False
+            self.state = "loading"
+            version = model_file_version(self.model_path)
+            started = time.perf_counter()
+            try:
+                if self.loader is not None:
+                    # Loaders resolve their own files (e.g. an exported .tflite next to the .keras)
+                    model = self.loader(self.model_path)
+                else:
+                    if not os.path.exists(self.model_path):
+                        raise FileNotFoundError(f"Model file missing: {self.model_path}")
+                    tf = _lazy_import_tf()
+                    if tf is None:
+                        raise ImportError("TensorFlow is not installed")
+                    model = tf.keras.models.load_model(self.model_path)
+                if warmup:
+                    self._warmup(model)
+            except Exception as e:
+                logging.error("Failed to load %s model: %s", self.name, e)
+                self.state = "failed"
+                self.error = str(e)
+                self._failed_version = version
+                self._failed_at = time.monotonic()
+                return False
+            self.error = None
+            self.load_seconds = time.perf_counter() - started
+            self.served_path = getattr(model, "model_path", self.model_path)
+            self.file_version = getattr(model, "version", None) or model_file_version(self.served_path)
+            # Publish only after warm-up so readiness implies a traced graph
+            self.model = model
+            self.state = "ready" if warmup else "loaded"
+            logging.info("Loaded %s %s model from %s in %.1fs", "and warmed" if warmup else "(not warmed)",
+                         self.name, self.model_path, self.load_seconds)
+            return True
+
+    def warmup(self):
+        """Run the warm-up pass on a model loaded with warmup=False (e.g. in a pre-fork master)."""
+        if self.model is None or self.state == "ready":
+            return
+        with self._lock:
+            if self.state == "ready":
+                return
+            try:
+                self._warmup(self.model)
+            except Exception as e:
+                logging.error("Failed to warm up %s model: %s", self.name, e)
+                return
+            self.state = "ready"
+
+    def _warmup(self, model):
+        h, w = self.input_size
+        dummy = np.zeros((1, h, w, 3), dtype="float32")
+        if hasattr(model, "predict_batch"):
+            model.predict_batch(dummy)
+        else:
+            model.predict(dummy, verbose=0)
+
+    def retire(self):
+        """Release what a replaced model holds; requests still using it keep working."""
+        batcher = getattr(self.model, "batcher", None)
+        if batcher is not None:
+            batcher.close()
+
+    def status(self) -> dict:
+        return {"state": self.state, "path": self.served_path or self.model_path, "version": self.file_version,
+                "load_seconds": self.load_seconds, "error": self.error}
 
     def predict_image_path(self, image_path: str):
         tf = _lazy_import_tf()
@@ -47,3 +160,240 @@ class ModelWrapper:
         return label, confidence
 
 
+CANDIDATE = "@candidate"
+# Recent per-image latencies kept per model version for the p50/p95 in /stats/inference
+LATENCY_WINDOW = 1000
+
+
+class ModelRegistry:
+    """Process-wide set of ModelWrappers, one per registered model name.
+
+    Feature modules register their model at import time; `init_app` resolves
+    the files against MODELS_DIR and, depending on MODEL_PRELOAD, loads them
+    right away ("eager"), in a background thread ("background") or on the
+    first request or readiness probe that needs them ("lazy"). "fork"
+    loads them right away but leaves the warm-up to `warmup_all`, for a
+    pre-forking server whose workers share the master's weights: inference
+    runtimes start their thread pools on the first forward pass, and those
+    would not survive the fork.
+
+    With MODEL_WATCH_SECONDS set, a background thread polls the model files
+    and, when one is replaced, loads and warms up the new version next to
+    the old one and swaps it in; requests already holding the old model
+    finish with it. MODEL_CANDIDATES registers a second version of a model
+    ("skin@candidate") that serves MODEL_CANDIDATE_PERCENT of its requests,
+    and `record` keeps latency and label counts per model version so the
+    two can be compared before cutting over.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, dict] = {}
+        self._wrappers: Dict[str, ModelWrapper] = {}
+        self._lock = threading.Lock()
+        self.config: dict = {}
+        self.candidate_percent = 0.0
+        self.watch_seconds = 0.0
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_pid: Optional[int] = None
+        self._seen: Dict[str, str] = {}  # slot -> changed version seen on the previous poll
+        self._rejected: Dict[str, str] = {}  # slot -> version that failed to load
+        self._versions: Dict[str, dict] = {}
+        self._stats_lock = threading.Lock()
+        self.reloads = 0
+
+    def register(self, name: str, filename: str, loader: Callable[[str], object],
+                 input_size: Tuple[int, int], class_names: List[str]):
+        self._specs[name] = {"filename": filename, "loader": loader,
+                             "input_size": input_size, "class_names": class_names}
+
+    def model_paths(self, models_dir: str) -> Dict[str, str]:
+        return {name: os.path.join(models_dir, spec["filename"]) for name, spec in self._specs.items()}
+
+    def _wrapper_for(self, slot: str, path: str) -> ModelWrapper:
+        spec = self._specs[slot.split("@")[0]]
+        return ModelWrapper(path, spec["input_size"], spec["class_names"], loader=spec["loader"], name=slot,
+                            retry_seconds=self.config.get("MODEL_RETRY_SECONDS", 30.0))
+
+    def init_app(self, app):
+        self.config = app.config
+        models_dir = app.config.get("MODELS_DIR") or ""
+        paths = self.model_paths(models_dir)
+        candidates = dict(app.config.get("MODEL_CANDIDATES") or {})
+        self.watch_seconds = app.config.get("MODEL_WATCH_SECONDS", 0)
+        self.candidate_percent = min(100.0, max(0.0, app.config.get("MODEL_CANDIDATE_PERCENT", 0)))
+        if app.config.get("INFERENCE_EXECUTOR") == "process" and (candidates or self.watch_seconds > 0):
+            # The worker processes load their models once, from the registered files
+            logging.warning("MODEL_CANDIDATES and MODEL_WATCH_SECONDS are ignored with INFERENCE_EXECUTOR=process")
+            candidates, self.watch_seconds = {}, 0
+        for name, path in candidates.items():
+            if name not in self._specs:
+                logging.warning("Ignoring candidate for unknown model %s", name)
+                continue
+            paths[name + CANDIDATE] = path
+
+        with self._lock:
+            self._wrappers = {slot: self._wrapper_for(slot, path) for slot, path in paths.items()}
+        self._seen.clear()
+        self._rejected.clear()
+        with self._stats_lock:
+            self._versions.clear()
+
+        mode = app.config.get("MODEL_PRELOAD", "background")
+        if mode == "eager":
+            self.load_all()
+        elif mode == "fork":
+            self.load_all(warmup=False)
+        elif mode == "background":
+            threading.Thread(target=self.load_all, name="model-preload", daemon=True).start()
+
+    def load_all(self, warmup: bool = True):
+        for wrapper in list(self._wrappers.values()):
+            wrapper.load(warmup)
+
+    def warmup_all(self):
+        for wrapper in list(self._wrappers.values()):
+            wrapper.warmup()
+
+    def wrapper(self, name: str) -> Optional[ModelWrapper]:
+        return self._wrappers.get(name)
+
+    def _loaded(self, wrapper: ModelWrapper):
+        if not wrapper.load():
+            return None
+        # Loaded before a fork and not warmed up in this worker yet
+        wrapper.warmup()
+        return wrapper.model
+
+    def get(self, name: str):
+        """Return the loaded model for `name`, loading it now if needed; None if unavailable.
+
+        A share of the calls gets the model's candidate instead, when one is
+        configured and loads.
+        """
+        self._ensure_watcher()
+        if self.candidate_percent > 0 and random.random() * 100 < self.candidate_percent:
+            candidate = self._wrappers.get(name + CANDIDATE)
+            model = self._loaded(candidate) if candidate is not None else None
+            if model is not None:
+                return model
+        wrapper = self._wrappers.get(name)
+        if wrapper is None:
+            logging.error("Model %s is not registered with an app", name)
+            return None
+        return self._loaded(wrapper)
+
+    def ready(self) -> bool:
+        primaries = [w for slot, w in self._wrappers.items() if slot in self._specs]
+        for wrapper in primaries:
+            # A pod that is not ready gets no requests, so the probe itself starts the load (with
+            # MODEL_PRELOAD=lazy) or the retry; a model already loading is left to finish
+            if wrapper.state == "pending" or wrapper.retry_due():
+                threading.Thread(target=wrapper.load, name="model-load", daemon=True).start()
+        return bool(primaries) and all(w.ready for w in primaries)
+
+    def status(self) -> dict:
+        return {name: w.status() for name, w in self._wrappers.items()}
+
+    # ---------------- Hot reload ---------------- #
+
+    def _ensure_watcher(self):
+        if self.watch_seconds <= 0:
+            return
+        # Threads do not survive a fork, so each worker starts its own
+        if self._watcher is not None and self._watcher_pid == os.getpid() and self._watcher.is_alive():
+            return
+        with self._lock:
+            if self._watcher is not None and self._watcher_pid == os.getpid() and self._watcher.is_alive():
+                return
+            self._watcher_pid = os.getpid()
+            self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while self.watch_seconds > 0:
+            time.sleep(self.watch_seconds)
+            try:
+                self.check_for_updates()
+            except Exception:
+                logging.exception("Model watcher failed")
+
+    def check_for_updates(self) -> List[str]:
+        """Reload every model whose file changed since it was loaded; returns the reloaded slots.
+
+        A new version is loaded only once the same one has been seen on two
+        consecutive calls, so a file that is still being copied is left alone.
+        """
+        reloaded = []
+        for slot, wrapper in list(self._wrappers.items()):
+            if wrapper.state in ("pending", "loading"):
+                continue
+            version = model_file_version(wrapper.served_path or wrapper.model_path)
+            if version == "missing" or version == wrapper.file_version:
+                self._seen.pop(slot, None)
+                continue
+            if self._seen.get(slot) != version:
+                self._seen[slot] = version
+                continue
+            if self._rejected.get(slot) == version:
+                continue
+            if self._reload(slot, wrapper, version):
+                reloaded.append(slot)
+        return reloaded
+
+    def _reload(self, slot: str, old: ModelWrapper, version: str) -> bool:
+        new = self._wrapper_for(slot, old.model_path)
+        # Warmed up before it is published, so no request pays for the first forward pass
+        if not new.load():
+            self._rejected[slot] = version
+            logging.error("Keeping the current %s model; version %s failed to load", slot, version)
+            return False
+        with self._lock:
+            if self._wrappers.get(slot) is not old:
+                return False  # init_app replaced the registry meanwhile
+            self._wrappers[slot] = new
+            self.reloads += 1
+        self._seen.pop(slot, None)
+        self._rejected.pop(slot, None)
+        old.retire()
+        logging.info("Swapped in %s model version %s (was %s)", slot, new.file_version, old.file_version)
+        return True
+
+    # ---------------- Per-version stats ---------------- #
+
+    def record(self, name: str, clf, seconds: float, results: list):
+        """Account `results` of one call to `clf` that took `seconds` to the model version that made them."""
+        results = [r for r in results if isinstance(r, dict)]
+        if not results:
+            return
+        version = f"{os.path.basename(clf.model_path)}@{getattr(clf, 'version', None)}"
+        per_image = seconds / len(results)
+        with self._stats_lock:
+            entry = self._versions.get((name, version))
+            if entry is None:
+                entry = self._versions[(name, version)] = {
+                    "predictions": 0, "latencies": deque(maxlen=LATENCY_WINDOW), "labels": Counter()}
+            entry["predictions"] += len(results)
+            entry["latencies"].extend([per_image] * len(results))
+            entry["labels"].update(r.get("label") for r in results)
+        if metrics.enabled:
+            MODEL_SECONDS.observe(seconds, name, version)
+            for r in results:
+                MODEL_PREDICTIONS.inc(name, version, r.get("label"))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            versions = {}
+            for (name, version), entry in sorted(self._versions.items()):
+                latencies = sorted(entry["latencies"])
+                total = entry["predictions"]
+                versions.setdefault(name, {})[version] = {
+                    "predictions": total,
+                    "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+                    "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+                    "labels": {label: round(count / total, 4) for label, count in entry["labels"].most_common()},
+                }
+        return {"watch_seconds": self.watch_seconds, "candidate_percent": self.candidate_percent,
+                "reloads": self.reloads, "versions": versions}
+
+
+model_registry = ModelRegistry()
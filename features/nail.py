@@ -1,105 +1,73 @@
 # nail.py
 import os
-import io
 import logging
 import numpy as np
-from PIL import Image
 
-from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from werkzeug.utils import secure_filename
 
-from tensorflow import keras
-from tensorflow.keras.applications.resnet50 import preprocess_input
+from features.batching import make_batcher
+from features.classifier import ImageClassifier
+from features.ml_utils import model_registry
+from features.prediction_cache import prediction_cache
+from features.uploads import read_upload, upload_store
+from features.preprocessing import resnet50_batch
+from features.executor import InferenceBusy, inference_executor
+from features.jobs import add_job_routes
+from features.metrics import timed
 
 nail_bp = Blueprint('nail', __name__, template_folder='../templates')
 
 # ⚠️ Must exactly match the order used during training
 NAIL_CLASSES = ["healthy", "onychomycosis", "psoriasis"]
 
-# Lazy-loaded classifier
-_nail_classifier = None
+NAIL_MODEL_FILE = "best_nail_model.keras"
 
 
-class NailDiseaseClassifier:
-    def __init__(self, model_path: str):
-        self.model_path = model_path
-        self.classes = NAIL_CLASSES
-        self.input_h, self.input_w = 224, 224
-        self.model = self._load_model()
-        # check if last layer already has softmax
-        self.has_softmax = self._check_softmax()
+class NailDiseaseClassifier(ImageClassifier):
+    name = "nail"
+    classes = NAIL_CLASSES
 
-    def _load_model(self):
-        if not os.path.exists(self.model_path):
-            raise FileNotFoundError(f"Nail model not found: {self.model_path}")
-        return keras.models.load_model(self.model_path, compile=False)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # check if last layer already has softmax (None: unknown for exported backends)
+        self.has_softmax = self.backend.output_is_softmax
 
-    def _check_softmax(self) -> bool:
-        """Check if the last layer has softmax activation"""
-        try:
-            last_layer = self.model.layers[-1]
-            if hasattr(last_layer, "activation") and last_layer.activation.__name__ == "softmax":
-                return True
-        except Exception:
-            pass
-        return False
-
-    def _preprocess_image(self, image: Image.Image) -> np.ndarray:
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        image = image.resize((self.input_w, self.input_h), Image.BILINEAR)
-        arr = np.asarray(image).astype("float32")
-
-        # Ensure 3 channels
-        if arr.ndim == 2:
-            arr = np.stack([arr] * 3, axis=-1)
-        elif arr.shape[-1] == 4:
-            arr = arr[..., :3]
-
-        arr = preprocess_input(arr)
-        return np.expand_dims(arr, axis=0)
+    def preprocess_batch(self, images) -> np.ndarray:
+        """Turn decoded (h, w, 3) uint8 RGB images into this model's float32 input batch."""
+        return resnet50_batch(images)
 
     def _softmax(self, logits: np.ndarray) -> np.ndarray:
         exp = np.exp(logits - np.max(logits, axis=1, keepdims=True))
         return exp / np.sum(exp, axis=1, keepdims=True)
 
-    def predict(self, image_bytes: bytes) -> dict:
-        image = Image.open(io.BytesIO(image_bytes))
-        input_tensor = self._preprocess_image(image)
-        outputs = self.model.predict(input_tensor, verbose=0)
+    def _looks_like_probs(self, outputs: np.ndarray) -> bool:
+        sums = np.sum(outputs, axis=1, keepdims=True)
+        return bool(np.all(outputs >= 0.0) and np.all(outputs <= 1.0) and np.all(np.abs(sums - 1.0) < 1e-3))
 
+    def _to_probs(self, outputs: np.ndarray) -> np.ndarray:
         # ✅ Apply softmax only if model doesn’t already have it
-        probs = outputs if self.has_softmax else self._softmax(outputs)
+        has_softmax = self.has_softmax if self.has_softmax is not None else self._looks_like_probs(outputs)
+        return outputs if has_softmax else self._softmax(outputs)
 
-        best_idx = int(np.argmax(probs[0]))
-        return {
-            "label": self.classes[best_idx],
-            "probability": float(probs[0][best_idx])
-        }
 
+def _load_nail_classifier(model_path: str) -> NailDiseaseClassifier:
+    config = model_registry.config
+    clf = NailDiseaseClassifier(model_path, config.get("INFERENCE_BACKEND", "keras"), config.get("MODEL_VARIANT", "float"),
+                                executor=inference_executor if inference_executor.enabled else None,
+                                tta_views=config.get("TTA_VIEWS", 1))
+    clf.batcher = make_batcher("nail", clf.predict_batch, config)
+    logging.info("Nail model softmax=%s", clf.has_softmax)
+    return clf
 
-def _get_nail_classifier() -> NailDiseaseClassifier | None:
-    global _nail_classifier
-    if _nail_classifier is not None:
-        return _nail_classifier
 
-    models_dir = current_app.config.get("MODELS_DIR")
-    if not models_dir:
-        logging.error("MODELS_DIR not set in Flask config")
-        return None
+model_registry.register("nail", NAIL_MODEL_FILE, _load_nail_classifier,
+                        input_size=(224, 224), class_names=NAIL_CLASSES)
 
-    model_file = os.path.join(models_dir, "best_nail_model.keras")
-    if not os.path.exists(model_file):
-        logging.error("Nail model file missing: %s", model_file)
-        return None
 
-    try:
-        _nail_classifier = NailDiseaseClassifier(model_file)
-        logging.info("Loaded nail model from %s (softmax=%s)", model_file, _nail_classifier.has_softmax)
-        return _nail_classifier
-    except Exception as e:
-        logging.exception("Failed to load nail model: %s", e)
-        return None
+def _get_nail_classifier() -> NailDiseaseClassifier | None:
+    # Loaded (and warmed up) by the registry at startup, or here on first use
+    return model_registry.get("nail")
 
 
 @nail_bp.route("/", methods=["GET"])
@@ -124,24 +92,27 @@ def predict():
         flash("Invalid filename", "error")
         return redirect(url_for("nail.upload"))
 
-    upload_folder = current_app.config.get("UPLOAD_FOLDER", "uploads")
-    os.makedirs(upload_folder, exist_ok=True)
-    save_path = os.path.join(upload_folder, filename)
-    file.save(save_path)
+    # Classify straight from the in-memory upload; the original is stored in the background
+    with timed("nail", "read_upload"):
+        img_bytes = read_upload(file)
+    with timed("nail", "persist_upload"):
+        image_filename = upload_store.save(img_bytes)
 
     result = None
     clf = _get_nail_classifier()
     if clf is not None:
         try:
-            with open(save_path, "rb") as f:
-                img_bytes = f.read()
-            pred = clf.predict(img_bytes)
+            with timed("nail", "classify"):
+                pred = prediction_cache.predict("nail", clf, img_bytes)
             result = {
-                "model": "best_nail_model.keras",
+                "model": os.path.basename(clf.model_path),
                 "classes": clf.classes,
                 "predicted": pred["label"].title(),
                 "confidence": round(pred["probability"], 4),
             }
+        except InferenceBusy as e:
+            flash("The server is busy right now; please try again in a few seconds.", "error")
+            return render_template("nail.html", image_filename=image_filename), 503, {"Retry-After": str(e.retry_after)}
         except Exception as e:
             logging.exception("Prediction error: %s", e)
             flash("Prediction failed: " + str(e), "error")
@@ -155,4 +126,9 @@ def predict():
             "confidence": 0.88,
         }
 
-    return render_template("nail.html", result=result, image_filename=filename)
+    with timed("nail", "render"):
+        return render_template("nail.html", result=result, image_filename=image_filename)
+
+
+# JSON batch API: /nail/api/predict and /nail/api/jobs/<job_id>
+add_job_routes(nail_bp, "nail", _get_nail_classifier, format_label=str.title)
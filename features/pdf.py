@@ -0,0 +1,110 @@
+import io
+import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+from xml.sax.saxutils import escape
+
+from features.caching import SingleFlight, TTLCache
+
+
+# Sections of the downloadable plan, in order: (title, routine key, value when missing)
+ROUTINE_SECTIONS = (
+    ("Skin Analysis", "skin_analysis", ""),
+    ("Morning Routine", "morning_routine", []),
+    ("Evening Routine", "evening_routine", []),
+    ("Diet Tips", "diet_tips", []),
+    ("Lifestyle", "lifestyle", []),
+)
+
+
+@lru_cache(maxsize=1)
+def _styles():
+    # getSampleStyleSheet() builds a fresh stylesheet on every call; ReportLab
+    # itself is only imported once the first PDF is requested
+    from reportlab.lib.styles import getSampleStyleSheet
+    styles = getSampleStyleSheet()
+    return styles['Heading2'], styles['Normal']
+
+
+def _text(value) -> str:
+    # Plan text comes from the LLM; ReportLab would parse any markup in it
+    return escape(str(value))
+
+
+def routine_etag(routine: dict) -> str:
+    """Content hash of a routine, used as cache key and ETag of its PDF."""
+    return hashlib.sha256(json.dumps(routine, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def build_routine_pdf(routine: dict) -> bytes:
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    heading, normal = _styles()
+    story = []
+    for title, key, default in ROUTINE_SECTIONS:
+        content = routine.get(key, default)
+        story.append(Paragraph(f"<b>{title}</b>", heading))
+        if isinstance(content, list):
+            for item in content:
+                story.append(Paragraph("• " + _text(item), normal))
+        else:
+            story.append(Paragraph(_text(content), normal))
+        story.append(Spacer(1, 12))
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer).build(story)
+    return buffer.getvalue()
+
+
+class RoutinePDFRenderer:
+    """Renders routine PDFs once per distinct plan.
+
+    Rendered bytes are memoized by the plan's content hash, concurrent
+    downloads of the same plan share one render, and with `prerender`
+    enabled a plan's PDF is built on a background thread as soon as the plan
+    is generated, so the download is usually served straight from memory.
+    """
+
+    def __init__(self):
+        self.prerender_enabled = False
+        self._cache = TTLCache(64)
+        self._flights = SingleFlight()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.renders = 0
+
+    def init_app(self, app):
+        self._cache = TTLCache(app.config.get('PDF_CACHE_SIZE', 64), app.config.get('PDF_CACHE_TTL_SECONDS', 3600))
+        self.prerender_enabled = app.config.get('PDF_PRERENDER', False)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self._pool = (ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-render")
+                      if self.prerender_enabled else None)
+
+    def render(self, routine: dict) -> Tuple[str, bytes]:
+        """Return (etag, pdf_bytes) for `routine`, from the cache when possible."""
+        etag = routine_etag(routine)
+        pdf = self._cache.get(etag)
+        if pdf is None:
+            pdf = self._flights.do(etag, lambda: self._build(etag, routine))
+        return etag, pdf
+
+    def _build(self, etag: str, routine: dict) -> bytes:
+        pdf = build_routine_pdf(routine)
+        self.renders += 1
+        self._cache.set(etag, pdf)
+        return pdf
+
+    def prerender(self, routine: dict):
+        if self._pool is None:
+            return
+        future = self._pool.submit(self.render, routine)
+        future.add_done_callback(
+            lambda f: f.exception() and logging.error("Background PDF render failed: %s", f.exception()))
+
+    def stats(self) -> dict:
+        return {'cache': self._cache.stats(), 'renders': self.renders, 'prerender': self.prerender_enabled}
+
+
+routine_pdf = RoutinePDFRenderer()
@@ -0,0 +1,279 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from features.ml_utils import model_file_version, model_registry
+
+# How long a model file's stat is trusted before looking at the file again
+VERSION_CHECK_SECONDS = 1.0
+
+
+def _digest(clf, image_bytes: bytes) -> str:
+    """Cache identity of an image for `clf`; TTA results differ from single-view ones."""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    tta_views = getattr(clf, "tta_views", 1)
+    return f"{digest}/tta{tta_views}" if tta_views > 1 else digest
+
+
+class PredictionCache:
+    """Content-addressed cache of classifier predictions.
+
+    Keys are the SHA-256 of the uploaded bytes plus the model name and the
+    version of the model file that produced the result. Entries live in a
+    bounded in-memory LRU and, optionally, in an SQLite file that survives
+    restarts. When a model file on disk no longer matches the loaded model's
+    version, that version's entries are dropped and the cache is bypassed;
+    the file is looked at most once every `version_check_seconds`.
+    Up to `live_versions` versions of a model keep their entries at once (two
+    while a candidate model shares its traffic); a further one evicts the
+    least recently used.
+    """
+
+    def __init__(self, max_entries: int = 512, db_path: Optional[str] = None, max_disk_entries: int = 10000):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.live_versions = 1
+        self._versions: dict = {}  # model -> its live versions, least recently used first
+        self._stale: set = set()  # (model, version) whose file has been replaced
+        self.version_check_seconds = VERSION_CHECK_SECONDS
+        self._file_versions: dict = {}  # model path -> (checked at, version on disk)
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config.get("PREDICTION_CACHE_SIZE", 512)
+        self.db_path = app.config.get("PREDICTION_CACHE_DB") or None
+        self.max_disk_entries = app.config.get("PREDICTION_CACHE_DB_MAX_ENTRIES", 10000)
+        self.live_versions = 2 if app.config.get("MODEL_CANDIDATES") else 1
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._stale.clear()
+            self._file_versions.clear()
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            if self.db_path:
+                self._open_db()
+
+    def close(self):
+        """Close the on-disk cache; init_app opens it again."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.db_path is not None
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS predictions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                """
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_predictions_last_used ON predictions(last_used)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.error("Prediction cache database unavailable (%s): %s", self.db_path, e)
+            self._db = None
+
+    def _file_version(self, model_path: str) -> str:
+        """Version of the file on disk, stat'ed at most once per `version_check_seconds` (called without the lock)."""
+        now = time.monotonic()
+        checked = self._file_versions.get(model_path)
+        if checked is not None and now - checked[0] < self.version_check_seconds:
+            return checked[1]
+        version = model_file_version(model_path)
+        self._file_versions[model_path] = (now, version)
+        return version
+
+    def _check_version(self, model_name: str, loaded_version: str, file_version: str) -> bool:
+        """Drop stale entries for `model_name`; return False if the file changed under the loaded model."""
+        if file_version != loaded_version:
+            if (model_name, loaded_version) not in self._stale:
+                self._stale.add((model_name, loaded_version))
+                self._purge(model_name, [v for v in self._versions.get(model_name, ()) if v != loaded_version])
+            return False
+        self._stale.discard((model_name, loaded_version))
+        live = self._versions.setdefault(model_name, [])
+        if loaded_version in live:
+            live.remove(loaded_version)
+            live.append(loaded_version)
+            return True
+        live.append(loaded_version)
+        del live[:-self.live_versions]
+        self._purge(model_name, live)
+        return True
+
+    def _purge(self, model_name: str, keep_versions: list):
+        prefix = model_name + ":"
+        keep = tuple(f"{prefix}{v}:" for v in keep_versions)
+        stale = [k for k in self._entries if k.startswith(prefix) and not k.startswith(keep)]
+        for k in stale:
+            del self._entries[k]
+        removed = len(stale)
+        if self._db is not None:
+            marks = ",".join("?" * len(keep_versions))
+            cur = self._db.execute(f"DELETE FROM predictions WHERE model=? AND version NOT IN ({marks})",
+                                   (model_name, *keep_versions))
+            self._db.commit()
+            # Disk rows are a superset of the in-memory entries
+            removed = max(removed, cur.rowcount)
+        if removed:
+            self.invalidations += removed
+            logging.info("Invalidated %d cached %s predictions after a model change", removed, model_name)
+
+    def predict(self, model_name: str, clf, image_bytes: bytes, compute: Optional[Callable[[], dict]] = None) -> dict:
+        """Return clf.predict(image_bytes), served from the cache when possible.
+
+        `compute` replaces the clf.predict call on a miss, e.g. to classify
+        views decoded once for several models.
+        """
+        if not self.enabled:
+            return self._call(model_name, clf, image_bytes, compute)
+
+        version = getattr(clf, "version", None) or model_file_version(clf.model_path)
+        key = f"{model_name}:{version}:{_digest(clf, image_bytes)}"
+
+        file_version = self._file_version(clf.model_path)
+        with self._lock:
+            usable = self._check_version(model_name, version, file_version)
+            if usable:
+                cached = self._lookup(key)
+                if cached is not None:
+                    return dict(cached)
+            self.misses += 1
+
+        result = self._call(model_name, clf, image_bytes, compute)
+
+        if usable:
+            with self._lock:
+                self._store(key, model_name, version, result)
+        return result
+
+    def predict_many(self, model_name: str, clf, images_bytes) -> list:
+        """Like `predict` for several images; only the misses go through clf.predict_many in one batch."""
+        if not self.enabled:
+            return self._call_many(model_name, clf, images_bytes)
+
+        version = getattr(clf, "version", None) or model_file_version(clf.model_path)
+        keys = [f"{model_name}:{version}:{_digest(clf, b)}" for b in images_bytes]
+        results = [None] * len(images_bytes)
+        file_version = self._file_version(clf.model_path)
+        with self._lock:
+            usable = self._check_version(model_name, version, file_version)
+            if usable:
+                for i, key in enumerate(keys):
+                    cached = self._lookup(key)
+                    if cached is not None:
+                        results[i] = dict(cached)
+            missing = [i for i, r in enumerate(results) if r is None]
+            self.misses += len(missing)
+
+        if missing:
+            computed = self._call_many(model_name, clf, [images_bytes[i] for i in missing])
+            with self._lock:
+                for i, result in zip(missing, computed):
+                    results[i] = result
+                    if usable and isinstance(result, dict):
+                        self._store(keys[i], model_name, version, result)
+        return results
+
+    @staticmethod
+    def _call(model_name: str, clf, image_bytes: bytes, compute: Optional[Callable[[], dict]] = None) -> dict:
+        started = time.perf_counter()
+        result = compute() if compute is not None else clf.predict(image_bytes)
+        model_registry.record(model_name, clf, time.perf_counter() - started, [result])
+        return result
+
+    @staticmethod
+    def _call_many(model_name: str, clf, images_bytes) -> list:
+        started = time.perf_counter()
+        results = clf.predict_many(images_bytes)
+        model_registry.record(model_name, clf, time.perf_counter() - started, results)
+        return results
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT result FROM predictions WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._db.execute("UPDATE predictions SET last_used=? WHERE key=?", (time.time(), key))
+        self._db.commit()
+        result = json.loads(row[0])
+        self._remember(key, result)
+        self.disk_hits += 1
+        return result
+
+    def _remember(self, key: str, result: dict):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _store(self, key: str, model_name: str, version: str, result: dict):
+        self._remember(key, dict(result))
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO predictions (key, model, version, result, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, version, json.dumps(result), time.time()),
+            )
+            self._disk_writes += 1
+            # Trim in batches rather than counting rows on every insert
+            if self._disk_writes % 64 == 0:
+                self._db.execute(
+                    "DELETE FROM predictions WHERE key IN ("
+                    " SELECT key FROM predictions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.error("Failed to persist cached prediction: %s", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk": self.db_path,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,33 @@
+import gc
+import logging
+
+
+def before_fork(app):
+    """Run in a pre-forking server's master once the app (and its models) are loaded.
+
+    SQLite connections opened while creating the app must not be inherited
+    by the workers, and freezing the garbage collector keeps the objects
+    that exist now out of later collections, which would otherwise write to
+    (and so un-share) every page holding them.
+    """
+    from features.prediction_cache import prediction_cache
+    from features.response_cache import response_cache
+
+    app.extensions["sqlite_pool"].close_all()
+    prediction_cache.close()
+    response_cache.close()
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork(app):
+    """Run in each worker forked from a master that called `before_fork`."""
+    from features.ml_utils import model_registry
+    from features.prediction_cache import prediction_cache
+    from features.response_cache import response_cache
+
+    prediction_cache.init_app(app)
+    response_cache.init_app(app)
+    # Weights came from the master; warming up here starts the runtime's thread pools in this process
+    model_registry.warmup_all()
+    logging.info("Worker ready with models %s", model_registry.status())
@@ -0,0 +1,144 @@
+import io
+import threading
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+# ImageNet channel means used by keras.applications.resnet50.preprocess_input ("caffe" mode), in BGR order
+CAFFE_MEAN_BGR = np.array([103.939, 116.779, 123.68], dtype="float32")
+
+# EXIF Orientation tag -> transpose that brings the pixels upright
+_EXIF_ORIENTATION = 0x0112
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Test-time augmentation views, in the order they are added as TTA_VIEWS grows
+TTA_VIEWS = ("original", "hflip", "crop_center", "rotate_+8", "rotate_-8",
+             "vflip", "crop_top_left", "crop_top_right", "crop_bottom_left", "crop_bottom_right")
+# Crops cover this fraction of the image side (the usual 224-of-256 center crop)
+TTA_CROP_FRACTION = 0.875
+
+_buffers = threading.local()
+# Largest batch (in images) whose buffer a thread keeps; one upload with every TTA view fits.
+# Bigger batches (jobs, /analyze with TTA) get a fresh array that is freed after use.
+REUSED_BUFFER_ROWS = 16
+
+
+def decode_image(image_bytes: bytes, size: Tuple[int, int] = (224, 224)) -> np.ndarray:
+    """Decode an upload into an upright (h, w, 3) uint8 RGB array of the given (w, h) size.
+
+    JPEGs are decoded with draft mode, which lets libjpeg scale by 1/2, 1/4 or
+    1/8 during decoding while staying at least as large as the target, so a
+    12 MP phone photo never gets fully decoded just to become 224x224.
+    """
+    w, h = size
+    image = Image.open(io.BytesIO(image_bytes))
+    orientation = image.getexif().get(_EXIF_ORIENTATION, 1)
+    if image.format == "JPEG":
+        # Rotated photos are stored sideways, so ask for the transposed size
+        image.draft("RGB", (h, w) if orientation in (5, 6, 7, 8) else (w, h))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    # Models see a square input, so rotating after the resize is equivalent and far cheaper
+    image = image.resize((h, w) if orientation in (5, 6, 7, 8) else (w, h), Image.BILINEAR, reducing_gap=3.0)
+    if orientation in _ORIENTATION_TRANSPOSE:
+        image = image.transpose(_ORIENTATION_TRANSPOSE[orientation])
+    return np.asarray(image)
+
+
+def decode_tta_views(image_bytes: bytes, size: Tuple[int, int], views: int) -> List[np.ndarray]:
+    """Decode an upload into the first `views` entries of TTA_VIEWS, each an (h, w, 3) uint8 array.
+
+    The image is decoded once at 1/TTA_CROP_FRACTION of the target size;
+    crops are slices of that, so they keep full resolution, and rotations
+    are cropped back to the target. Rotating by 8 degrees (rather than 10)
+    keeps the crop clear of the empty corners the rotation leaves behind.
+    """
+    w, h = size
+    large = decode_image(image_bytes, (round(w / TTA_CROP_FRACTION), round(h / TTA_CROP_FRACTION)))
+    big_h, big_w = large.shape[:2]
+    top, left = (big_h - h) // 2, (big_w - w) // 2
+    original = np.asarray(Image.fromarray(large).resize((w, h), Image.BILINEAR))
+    crops = {"crop_center": (top, left), "crop_top_left": (0, 0), "crop_top_right": (0, big_w - w),
+             "crop_bottom_left": (big_h - h, 0), "crop_bottom_right": (big_h - h, big_w - w)}
+
+    def view(name: str) -> np.ndarray:
+        if name == "original":
+            return original
+        if name == "hflip":
+            return original[:, ::-1]
+        if name == "vflip":
+            return original[::-1]
+        if name.startswith("rotate_"):
+            rotated = np.asarray(Image.fromarray(large).rotate(float(name[len("rotate_"):]), Image.BILINEAR))
+            return rotated[top:top + h, left:left + w]
+        y, x = crops[name]
+        return large[y:y + h, x:x + w]
+
+    return [view(name) for name in TTA_VIEWS[:max(1, min(views, len(TTA_VIEWS)))]]
+
+
+def decode_views(image_bytes: bytes, size: Tuple[int, int], views: int = 1) -> List[np.ndarray]:
+    """The upload resized to (w, h) `size`, or its first `views` TTA views when views > 1."""
+    if views > 1:
+        return decode_tta_views(image_bytes, size, views)
+    return [decode_image(image_bytes, size)]
+
+
+def batch_buffer(n: int, h: int, w: int) -> np.ndarray:
+    """Return a per-thread float32 (n, h, w, 3) buffer, reused across requests.
+
+    The buffer is only valid until the same thread asks for another one, which
+    is fine for the request path where it is consumed by a blocking predict.
+    Batches of more than REUSED_BUFFER_ROWS images get a new array instead, so
+    one large batch does not pin its memory to the thread for good.
+    """
+    if n > REUSED_BUFFER_ROWS:
+        return np.empty((n, h, w, 3), dtype="float32")
+    key = (h, w)
+    buf = getattr(_buffers, "by_shape", None)
+    if buf is None:
+        buf = _buffers.by_shape = {}
+    arr = buf.get(key)
+    if arr is None or arr.shape[0] < n:
+        arr = buf[key] = np.empty((max(n, 1), h, w, 3), dtype="float32")
+    return arr[:n]
+
+
+def efficientnet_batch(images: Sequence[np.ndarray], out: np.ndarray = None) -> np.ndarray:
+    """Stack uint8 RGB images into a float32 EfficientNet input batch.
+
+    keras.applications.efficientnet.preprocess_input is a pass-through (the
+    model rescales internally), so this is a single uint8 -> float32 copy.
+    """
+    if out is None:
+        h, w = images[0].shape[:2]
+        out = batch_buffer(len(images), h, w)
+    for i, arr in enumerate(images):
+        out[i] = arr
+    return out
+
+
+def resnet50_batch(images: Sequence[np.ndarray], out: np.ndarray = None) -> np.ndarray:
+    """Stack uint8 RGB images into a float32 ResNet50 input batch.
+
+    Equivalent to keras.applications.resnet50.preprocess_input: channels are
+    written in BGR order while copying and the ImageNet means are subtracted
+    in place, without intermediate arrays.
+    """
+    if out is None:
+        h, w = images[0].shape[:2]
+        out = batch_buffer(len(images), h, w)
+    for i, arr in enumerate(images):
+        out[i] = arr[..., ::-1]
+    out -= CAFFE_MEAN_BGR
+    return out
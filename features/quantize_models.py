@@ -0,0 +1,133 @@
+"""Build quantized model variants and report accuracy vs latency against the float model.
+
+    python -m features.quantize_models                         # tflite int8 + fp16, report on static/uploads
+    python -m features.quantize_models --backend onnx --variants int8
+    python -m features.quantize_models --calibration-dir ~/photos --report-json quant.json
+
+Variants are written next to the float export (`best_nail_model.int8.tflite`)
+and served with MODEL_VARIANT=int8 / fp16. int8 is dynamic-range quantization
+(weights stored as int8, activations computed in float), so it needs no
+representative dataset. The calibration images are used for the report:
+per-image latency, model size and top-1 agreement with the float model.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from features.backends import backend_model_path
+from features.export_models import MODELS, ROOT, export_onnx, export_tflite, sample_images
+
+
+def quantize_tflite(keras_path: str, variant: str):
+    import tensorflow as tf
+
+    out_path = backend_model_path(keras_path, "tflite", variant)
+    if variant == "int8":
+        export_tflite(keras_path, out_path, optimizations=[tf.lite.Optimize.DEFAULT])
+    else:
+        export_tflite(keras_path, out_path, optimizations=[tf.lite.Optimize.DEFAULT],
+                      supported_types=[tf.float16])
+    return out_path
+
+
+def quantize_onnx(keras_path: str, variant: str):
+    if variant != "int8":
+        raise ValueError("Only int8 is supported for onnx; use --backend tflite for fp16")
+    from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+
+    float_path = backend_model_path(keras_path, "onnx")
+    if not os.path.exists(float_path):
+        export_onnx(keras_path, float_path)
+    out_path = backend_model_path(keras_path, "onnx", variant)
+    quantize_dynamic(float_path, out_path, weight_type=QuantType.QInt8)
+    return out_path
+
+
+def _ensure_float(keras_path: str, backend: str):
+    path = backend_model_path(keras_path, backend)
+    if not os.path.exists(path):
+        (export_tflite if backend == "tflite" else export_onnx)(keras_path, path)
+    return path
+
+
+def measure(cls, keras_path: str, backend: str, variant: str, images) -> dict:
+    clf = cls(keras_path, backend, variant)
+    clf.predict_batch(clf.preprocess_batch(images[:1]))  # warm-up
+    outputs, latencies = [], []
+    for img in images:
+        batch = clf.preprocess_batch([img])
+        started = time.perf_counter()
+        outputs.append(np.asarray(clf.predict_batch(batch))[0])
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    return {
+        "path": clf.model_path,
+        "size_mb": round(os.path.getsize(clf.model_path) / 1e6, 2),
+        "latency_ms_mean": round(float(np.mean(latencies)), 2),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+        "outputs": np.stack(outputs),
+    }
+
+
+def report(name: str, keras_path: str, backend: str, variants, images) -> dict:
+    cls = MODELS[name][1]
+    rows = {"float": measure(cls, keras_path, backend, "float", images)}
+    reference = rows["float"]["outputs"]
+    for variant in variants:
+        rows[variant] = measure(cls, keras_path, backend, variant, images)
+    for variant, row in rows.items():
+        outputs = row.pop("outputs")
+        row["top1_agreement"] = round(float(np.mean(outputs.argmax(axis=1) == reference.argmax(axis=1))), 4)
+        row["max_abs_output_diff"] = round(float(np.max(np.abs(outputs - reference))), 5)
+        row["speedup"] = round(rows["float"]["latency_ms_mean"] / row["latency_ms_mean"], 2)
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["tflite", "onnx"], default="tflite")
+    parser.add_argument("--variants", nargs="+", choices=["int8", "fp16"], default=None,
+                        help="Variants to build (default: int8 fp16 for tflite, int8 for onnx)")
+    parser.add_argument("--models-dir", default=os.path.join(ROOT, "models"))
+    parser.add_argument("--only", choices=sorted(MODELS), help="Quantize a single model")
+    parser.add_argument("--calibration-dir", default=os.path.join(ROOT, "static", "uploads"),
+                        help="Images used for the latency / agreement report")
+    parser.add_argument("--skip-build", action="store_true", help="Only report on variants that already exist")
+    parser.add_argument("--report-json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    variants = args.variants or (["int8", "fp16"] if args.backend == "tflite" else ["int8"])
+    images = sample_images(args.calibration_dir)
+    results = {}
+    for name, (filename, _) in MODELS.items():
+        if args.only and name != args.only:
+            continue
+        keras_path = os.path.join(args.models_dir, filename)
+        if not os.path.exists(keras_path):
+            print(f"{name}: {keras_path} not found, skipping", file=sys.stderr)
+            continue
+        if not args.skip_build:
+            _ensure_float(keras_path, args.backend)
+            for variant in variants:
+                quantize = quantize_tflite if args.backend == "tflite" else quantize_onnx
+                print(f"{name}: wrote {quantize(keras_path, variant)}")
+        results[name] = report(name, keras_path, args.backend, variants, images)
+
+    print(f"\n{'model':<6} {'variant':<8} {'size MB':>8} {'ms/img':>8} {'p95 ms':>8} {'speedup':>8} {'top-1 agree':>12}")
+    for name, rows in results.items():
+        for variant, row in rows.items():
+            print(f"{name:<6} {variant:<8} {row['size_mb']:>8} {row['latency_ms_mean']:>8} "
+                  f"{row['latency_ms_p95']:>8} {row['speedup']:>8} {row['top1_agreement']:>12.2%}")
+    print(f"\n{len(images)} images: those in {args.calibration_dir} plus synthetic inputs")
+
+    if args.report_json:
+        with open(args.report_json, "w") as f:
+            json.dump({"backend": args.backend, "images": len(images), "models": results}, f, indent=2)
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import FrozenSet, Optional
+
+from features.caching import TTLCache
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Words that do not change what is being asked ("how do I treat acne?" ~ "acne treatment")
+STOPWORDS = frozenset("""
+    a an the my me i im is are am was be do does did to for of on in at it its this that these those
+    please can could you your should would will how whats about with and or get got any some
+""".split())
+_SUFFIXES = ("ments", "ment", "ings", "ing", "ies", "es", "ed", "s", "e")
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def normalize_query(query: str) -> str:
+    """Order-independent key of the content words of `query` ("" when there are none)."""
+    words = {_stem(w) for w in _WORD_RE.findall(query.lower()) if w not in STOPWORDS}
+    return " ".join(sorted(words))
+
+
+def trigrams(key: str) -> FrozenSet[str]:
+    padded = f" {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of two trigram sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True when `b` is `a` with at most one character inserted, deleted or replaced."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    # Skip the differing character of b, and of a too when the lengths are equal
+    return a[i + (len(a) == len(b)):] == b[i + 1:]
+
+
+def same_question(a: str, b: str) -> bool:
+    """Whether normalized keys `a` and `b` differ only by typos.
+
+    Every content word must have a counterpart in the other key that is
+    identical or, for words of five letters or more, one edit away. So
+    "psoriasys cream" matches "psoriasis cream", but adding, dropping or swapping
+    a word ("baby", "stop" -> "start") never does: for medical questions
+    that usually changes the answer.
+    """
+    words_a, words_b = a.split(), b.split()
+    if len(words_a) != len(words_b):
+        return False
+    unmatched = list(words_b)
+    for word in words_a:
+        if word in unmatched:
+            unmatched.remove(word)
+            continue
+        for other in unmatched:
+            if min(len(word), len(other)) >= 5 and _within_one_edit(word, other):
+                unmatched.remove(other)
+                break
+        else:
+            return False
+    return True
+
+
+class ResponseCache:
+    """Cache of LLM chatbot replies keyed by the normalized user question.
+
+    Questions are reduced to their sorted, lightly stemmed content words, so
+    "How to treat dandruff?" and "dandruff treatment" share an entry. Only
+    that exact key is looked up by default. With `similarity` below 1.0, a
+    miss falls back to the closest cached question by character-trigram
+    similarity, provided it scores at least `similarity` and differs from
+    the question only by typos (see `same_question`). Replies are cached per
+    question regardless of earlier turns of the conversation. Entries expire
+    after `ttl` seconds, live in an in-memory LRU and, optionally, in an
+    SQLite file that survives restarts.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 86400, similarity: float = 1.0,
+                 db_path: Optional[str] = None, max_disk_entries: int = 10000):
+        self.similarity = similarity
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self._memory = TTLCache(max_entries, ttl)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_writes = 0
+        self.hits = 0
+        self.similar_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.similarity = app.config.get("LLM_CACHE_SIMILARITY", 1.0)
+        self.db_path = app.config.get("LLM_CACHE_DB") or None
+        self.max_disk_entries = app.config.get("LLM_CACHE_DB_MAX_ENTRIES", 10000)
+        self._memory = TTLCache(app.config.get("LLM_CACHE_SIZE", 512), app.config.get("LLM_CACHE_TTL_SECONDS", 86400))
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            if self.db_path:
+                self._open_db()
+
+    def close(self):
+        """Close the on-disk cache; init_app opens it again."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._memory.max_entries > 0 or self.db_path is not None
+
+    @property
+    def ttl(self) -> float:
+        return self._memory.ttl
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    reply TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                """
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses(last_used)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.error("LLM response cache database unavailable (%s): %s", self.db_path, e)
+            self._db = None
+
+    def get(self, query: str) -> Optional[str]:
+        """Cached reply for `query` or a sufficiently similar question, else None."""
+        key = normalize_query(query)
+        if not key or not self.enabled:
+            return None
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return entry[0]
+
+        if self.similarity < 1.0:
+            grams = trigrams(key)
+            best_key, best_score = None, self.similarity
+            for other_key, (_, other_grams) in self._memory.items():
+                score = similarity(grams, other_grams)
+                if score >= best_score and same_question(key, other_key):
+                    best_key, best_score = other_key, score
+            if best_key is not None:
+                entry = self._memory.get(best_key)
+                if entry is not None:
+                    with self._lock:
+                        self.similar_hits += 1
+                    return entry[0]
+
+        reply = self._disk_lookup(key)
+        with self._lock:
+            if reply is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._memory.set(key, (reply, trigrams(key)))
+        return reply
+
+    def _disk_lookup(self, key: str) -> Optional[str]:
+        if self._db is None:
+            return None
+        with self._lock:
+            now = time.time()
+            row = self._db.execute("SELECT reply, created FROM llm_responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl > 0 and row[1] < now - self.ttl:
+                self._db.execute("DELETE FROM llm_responses WHERE key=?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE llm_responses SET last_used=? WHERE key=?", (now, key))
+            self._db.commit()
+            return row[0]
+
+    def set(self, query: str, reply: str):
+        key = normalize_query(query)
+        if not key or not self.enabled:
+            return
+        self._memory.set(key, (reply, trigrams(key)))
+        if self._db is None:
+            return
+        with self._lock:
+            try:
+                now = time.time()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, reply, created, last_used) VALUES (?, ?, ?, ?)",
+                    (key, reply, now, now),
+                )
+                self._disk_writes += 1
+                # Trim in batches rather than counting rows on every insert
+                if self._disk_writes % 64 == 0:
+                    self._db.execute(
+                        "DELETE FROM llm_responses WHERE key IN ("
+                        " SELECT key FROM llm_responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,),
+                    )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.error("Failed to persist cached LLM reply: %s", e)
+
+    def stats(self) -> dict:
+        memory = self._memory.stats()
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.disk_hits + self.misses
+            return {
+                "entries": memory["entries"],
+                "max_entries": memory["max_entries"],
+                "ttl_seconds": memory["ttl_seconds"],
+                "similarity_threshold": self.similarity,
+                "disk": self.db_path,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.similar_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "expired": memory["expired"],
+                "evictions": memory["evictions"],
+            }
+
+
+response_cache = ResponseCache()
@@ -84,18 +84,34 @@ import os
 import json
 import io
 import re
+import copy
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from flask import Blueprint, render_template, request, send_file, session, jsonify, redirect
-from google import genai
-from google.genai import types
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
 from dotenv import load_dotenv
 
+from features.caching import SingleFlight, TTLCache
+from features.metrics import UPSTREAM_ERRORS, timed
+from features.pdf import routine_pdf
+
 routine_bp = Blueprint('routine', __name__, template_folder='../templates')
 
 load_dotenv()
 _GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-_genai_client = genai.Client(api_key=_GEMINI_API_KEY) if _GEMINI_API_KEY else None
+_genai_client = None
+_genai_lock = threading.Lock()
+
+
+def _get_genai_client():
+    # google.genai takes most of a second to import, so it is loaded on the first Gemini call
+    global _genai_client
+    if _genai_client is None and _GEMINI_API_KEY:
+        with _genai_lock:
+            if _genai_client is None:
+                from google import genai
+                _genai_client = genai.Client(api_key=_GEMINI_API_KEY)
+    return _genai_client
 
 # ---------------- Utility Functions ---------------- #
 
@@ -134,15 +150,19 @@ def clean_json(plan: dict) -> dict:
     return plan
 
 def call_gemini(prompt_text):
-    if not _genai_client:
+    client = _get_genai_client()
+    if not client:
         return None
-    resp = _genai_client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt_text,
-        config=types.GenerateContentConfig(
-            thinking_config=types.ThinkingConfig(thinking_budget=0)
+    from google.genai import types
+    # Timed on the worker thread, so calls that outlive GEMINI_TIMEOUT are still measured
+    with timed("routine", "gemini"):
+        resp = client.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=prompt_text,
+            config=types.GenerateContentConfig(
+                thinking_config=types.ThinkingConfig(thinking_budget=0)
+            )
         )
-    )
     return getattr(resp, "text", None)
 
 def parse_json_from_text(text):
@@ -160,24 +180,8 @@ def parse_json_from_text(text):
     print("⚠️ No JSON found in Gemini response:", text[:200])
     return None
 
-# ---------------- Routes ---------------- #
-
-@routine_bp.route('/', methods=['GET'])
-def form():
-    if not session.get('user_id'):
-        return redirect('/login?next=/routine/')
-    return render_template('routine.html', plan={})
-
-@routine_bp.route('/api/generate', methods=['POST'])
-def generate_api():
-    data = request.get_json() or {}
-    skin_type = data.get('skin_type', '')
-    age = data.get('age', '')
-    allergies = data.get('allergies', '')
-    lifestyle = data.get('lifestyle', '')
-
-    # Fallback routine
-    routine = {
+def sample_routine():
+    return {
         'skin_analysis': 'Sample analysis',
         'morning_routine': [
             'Cleanser (gentle, pH-balanced)',
@@ -194,16 +198,116 @@ def generate_api():
         'lifestyle': ['Adequate sleep', 'Stress management']
     }
 
-    # Call Gemini API if available
-    prompt = build_prompt(age, skin_type, allergies, lifestyle)
-    raw = call_gemini(prompt)
-    parsed = parse_json_from_text(raw)
-    if parsed:
-        routine = clean_json(parsed)
-    else:
-        routine['skin_analysis'] = 'Unable to generate routine. Showing sample plan.'
+_NONE_WORDS = {'', 'none', 'no', 'nil', 'n/a', 'na', '-'}
+
+def _normalize_text(value) -> str:
+    return ' '.join(str(value or '').lower().split())
+
+def normalize_inputs(age, skin_type, allergies, lifestyle):
+    """Canonical (age, skin_type, allergies, lifestyle) used as the cache key.
+
+    Only the key: the prompt is built from the inputs as the user entered them.
+    """
+    age = _normalize_text(age)
+    age = str(int(age)) if age.isdigit() else age
+    skin_type = _normalize_text(skin_type)
+    parts = re.split(r'[,;/]|\band\b', str(allergies or ''), flags=re.I)
+    allergy_list = sorted({a for a in map(_normalize_text, parts) if a not in _NONE_WORDS})
+    lifestyle = _normalize_text(lifestyle)
+    return age, skin_type, ', '.join(allergy_list), '' if lifestyle in _NONE_WORDS else lifestyle
+
+
+class RoutinePlanner:
+    """Generates routines through Gemini with a result cache and request coalescing.
+
+    Plans are cached by normalized inputs for `ttl` seconds, concurrent
+    requests for the same inputs share one Gemini call (prompted with the
+    first caller's text as entered), and a call that takes
+    longer than `timeout` seconds answers with the sample plan (its result is
+    still cached once it arrives).
+    """
+
+    def __init__(self):
+        self.timeout = 20.0
+        self._cache = TTLCache(256, 6 * 3600)
+        self._flights = SingleFlight()
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gemini")
+        self.timeouts = 0
+        self.errors = 0
+
+    def init_app(self, app):
+        self.timeout = app.config.get('GEMINI_TIMEOUT', 20.0)
+        self._cache = TTLCache(app.config.get('ROUTINE_CACHE_SIZE', 256), app.config.get('ROUTINE_CACHE_TTL_SECONDS', 6 * 3600))
+        self._pool.shutdown(wait=False)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, app.config.get('GEMINI_MAX_CONCURRENCY', 4)),
+                                        thread_name_prefix="gemini")
+
+    def plan(self, age, skin_type, allergies, lifestyle):
+        """Return (routine, generated); generated is False when the sample plan is served instead."""
+        key = normalize_inputs(age, skin_type, allergies, lifestyle)
+        cached = self._cache.get(key)
+        if cached is None:
+            prompt = build_prompt(age, skin_type, allergies, lifestyle)
+            cached = self._flights.do(key, lambda: self._generate(key, prompt))
+        if cached is None:
+            routine = sample_routine()
+            routine['skin_analysis'] = 'Unable to generate routine. Showing sample plan.'
+            return routine, False
+        return copy.deepcopy(cached), True
+
+    def _generate(self, key, prompt):
+        future = self._pool.submit(call_gemini, prompt)
+        try:
+            raw = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.timeouts += 1
+            UPSTREAM_ERRORS.inc("gemini")
+            logging.warning("Gemini did not answer within %.1fs; serving the sample plan", self.timeout)
+            # The slow call still fills the cache when it eventually finishes
+            future.add_done_callback(lambda f: f.exception() is None and self._store(key, f.result()))
+            return None
+        except Exception as e:
+            self.errors += 1
+            UPSTREAM_ERRORS.inc("gemini")
+            logging.error("Gemini request failed: %s", e)
+            return None
+        return self._store(key, raw)
+
+    def _store(self, key, raw):
+        with timed("routine", "parse"):
+            parsed = parse_json_from_text(raw)
+            if not isinstance(parsed, dict):
+                return None
+            routine = clean_json(parsed)
+        self._cache.set(key, routine)
+        return routine
+
+    def stats(self) -> dict:
+        return {'cache': self._cache.stats(), 'coalescing': self._flights.stats(),
+                'timeout_seconds': self.timeout, 'timeouts': self.timeouts, 'errors': self.errors}
+
+
+routine_planner = RoutinePlanner()
+
+# ---------------- Routes ---------------- #
+
+@routine_bp.route('/', methods=['GET'])
+def form():
+    if not session.get('user_id'):
+        return redirect('/login?next=/routine/')
+    return render_template('routine.html', plan={})
+
+@routine_bp.route('/api/generate', methods=['POST'])
+def generate_api():
+    data = request.get_json() or {}
+    skin_type = data.get('skin_type', '')
+    age = data.get('age', '')
+    allergies = data.get('allergies', '')
+    lifestyle = data.get('lifestyle', '')
 
+    routine, _ = routine_planner.plan(age, skin_type, allergies, lifestyle)
     session['routine'] = routine
+    routine_pdf.prerender(routine)
     return jsonify({'routine': routine})
 
 @routine_bp.route('/download', methods=['GET'])
@@ -212,31 +316,16 @@ def download_pdf():
     if not routine:
         routine = {"message": "No routine available. Please generate first."}
 
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer)
-    styles = getSampleStyleSheet()
-    story = []
-
-    def add_section(title, content):
-        story.append(Paragraph(f"<b>{title}</b>", styles['Heading2']))
-        if isinstance(content, list):
-            for item in content:
-                story.append(Paragraph("• " + item, styles['Normal']))
-        else:
-            story.append(Paragraph(content, styles['Normal']))
-        story.append(Spacer(1, 12))
-
-    add_section("Skin Analysis", routine.get("skin_analysis", ""))
-    add_section("Morning Routine", routine.get("morning_routine", []))
-    add_section("Evening Routine", routine.get("evening_routine", []))
-    add_section("Diet Tips", routine.get("diet_tips", []))
-    add_section("Lifestyle", routine.get("lifestyle", []))
-
-    doc.build(story)
-    buffer.seek(0)
-    return send_file(
-        buffer,
+    with timed("routine", "pdf"):
+        etag, pdf = routine_pdf.render(routine)
+    response = send_file(
+        io.BytesIO(pdf),
         as_attachment=True,
         download_name="skincare_plan.pdf",
-        mimetype="application/pdf"
+        mimetype="application/pdf",
+        etag=etag,
+        max_age=0,
     )
+    # Revalidated on every download; an unchanged plan gets 304 Not Modified
+    response.cache_control.private = True
+    return response.make_conditional(request)
@@ -0,0 +1,64 @@
+import json
+from typing import List, Tuple
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class JSONSectionParser:
+    """Incrementally pull top-level key/value pairs out of a streamed JSON object.
+
+    The chatbot prompt asks the LLM for `{"Definition": ..., "Recommendation":
+    [...]}`; feeding the streamed text here returns each section as soon as
+    its value is complete, so it can be rendered before the rest arrives.
+    Text that is not a JSON object never yields sections; the caller falls
+    back to the full text once the stream ends.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._pair_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        self.text += chunk
+        pairs = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"' and self._depth > 0:
+                self._in_string = True
+            elif ch == "{" or (ch == "[" and self._depth > 0):
+                self._depth += 1
+                if self._depth == 1:
+                    self._pair_start = i + 1
+            elif ch in "}]" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    pairs.extend(self._take_pair(text[self._pair_start:i]))
+            elif ch == "," and self._depth == 1:
+                pairs.extend(self._take_pair(text[self._pair_start:i]))
+                self._pair_start = i + 1
+        self._pos = len(text)
+        return pairs
+
+    @staticmethod
+    def _take_pair(fragment: str) -> List[Tuple[str, object]]:
+        if not fragment.strip():
+            return []
+        try:
+            return list(json.loads("{" + fragment + "}").items())
+        except ValueError:
+            return []
@@ -0,0 +1,268 @@
+import io
+import os
+import re
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from flask import Blueprint, Request, abort, send_from_directory
+from PIL import Image, ImageOps
+
+# Writes of retained uploads happen here so the request never waits on the upload disk
+_persist_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload-persist")
+
+uploads_bp = Blueprint("uploads", __name__)
+
+# Stored names are the first 32 hex digits of the SHA-256 of the file plus its extension
+_NAME_RE = re.compile(r"[0-9a-f]{32}\.(jpg|png|gif|webp|bmp|bin)")
+# Content-addressed files never change, so browsers may keep them for a year
+CACHE_MAX_AGE = 365 * 86400
+
+
+class UploadRequest(Request):
+    """Request that keeps uploaded files in memory up to MAX_CONTENT_LENGTH.
+
+    Werkzeug spools uploads larger than 500KB to a temporary file by default,
+    which puts a disk write in front of every phone photo we classify.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=self.max_content_length or 16 * 1024 * 1024, mode="rb+")
+
+
+def read_upload(file) -> bytes:
+    """Read an uploaded FileStorage straight from its (in-memory) stream."""
+    file.stream.seek(0)
+    return file.stream.read()
+
+
+def _write_file(path: str, data: bytes):
+    tmp_path = f"{path}.{os.getpid()}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        # Atomic rename so the result page never serves a half-written image
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.error("Failed to save upload %s: %s", path, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def image_extension(data: bytes) -> str:
+    """File extension for an upload, from its magic bytes (".bin" when not a known image format)."""
+    if data[:3] == b"\xff\xd8\xff":
+        return ".jpg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return ".png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    if data[:2] == b"BM":
+        return ".bmp"
+    return ".bin"
+
+
+def make_thumbnail(data: bytes, size: int = 256) -> bytes:
+    """Upright JPEG of the upload that fits in size x size."""
+    image = Image.open(io.BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("RGB", (size, size))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((size, size), Image.BILINEAR, reducing_gap=3.0)
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=80, optimize=True)
+    return buf.getvalue()
+
+
+class UploadStore:
+    """Content-addressed store of uploaded photos in UPLOAD_FOLDER.
+
+    Files are named by the hash of their bytes, so a photo uploaded twice is
+    stored once and different photos never overwrite each other. A small
+    JPEG thumbnail is made once per photo for the result pages. When the
+    folder grows past `quota_bytes`, photos are deleted least recently
+    uploaded first, as are photos not uploaded again within `max_age`
+    seconds. UPLOAD_PERSIST picks whether the write happens in the
+    background ("async"), before the response ("sync") or not at all ("off").
+    """
+
+    THUMBS = "thumbs"
+
+    def __init__(self):
+        self.folder = "uploads"
+        self.mode = "async"
+        self.quota_bytes = 512 * 1024 * 1024
+        self.max_age = 30 * 86400
+        self.thumb_size = 256
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._usage: Optional[int] = None  # bytes on disk, counted on the first write
+        self.writes = 0
+        self.duplicates = 0
+        self.evicted = 0
+
+    def init_app(self, app):
+        self.folder = app.config.get("UPLOAD_FOLDER", "uploads")
+        self.mode = app.config.get("UPLOAD_PERSIST", "async")
+        self.quota_bytes = int(app.config.get("UPLOAD_QUOTA_MB", 512) * 1024 * 1024)
+        self.max_age = app.config.get("UPLOAD_MAX_AGE_DAYS", 30) * 86400
+        self.thumb_size = app.config.get("UPLOAD_THUMB_SIZE", 256)
+        os.makedirs(os.path.join(self.folder, self.THUMBS), exist_ok=True)
+        self._usage = None
+
+    def _thumb_path(self, name: str) -> str:
+        return os.path.join(self.folder, self.THUMBS, os.path.splitext(name)[0] + ".jpg")
+
+    def save(self, data: bytes) -> Optional[str]:
+        """Store `data` and return its name, or None when uploads are not retained."""
+        if self.mode == "off":
+            return None
+        name = hashlib.sha256(data).hexdigest()[:32] + image_extension(data)
+        if self.mode == "sync":
+            self._store(name, data)
+            return name
+        with self._lock:
+            if name in self._pending:
+                return name  # the same photo is already being written
+            future = self._pending[name] = _persist_pool.submit(self._store, name, data)
+        # Outside the lock: the callback runs right here if the write already finished
+        future.add_done_callback(lambda f: self._finish(name))
+        return name
+
+    def _finish(self, name: str):
+        with self._lock:
+            self._pending.pop(name, None)
+
+    def wait(self, name: str, timeout: float = 5.0):
+        """Block until a background write of `name` (if any) has finished."""
+        with self._lock:
+            future = self._pending.get(name)
+        if future is not None:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+
+    def _store(self, name: str, data: bytes):
+        path = os.path.join(self.folder, name)
+        added = 0
+        if os.path.exists(path):
+            # Already stored: a fresh mtime moves it to the back of the eviction order
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.duplicates += 1
+        else:
+            _write_file(path, data)
+            added += len(data)
+        thumb_path = self._thumb_path(name)
+        if not os.path.exists(thumb_path):
+            try:
+                thumb = make_thumbnail(data, self.thumb_size)
+            except Exception as e:
+                logging.warning("No thumbnail for upload %s: %s", name, e)
+            else:
+                _write_file(thumb_path, thumb)
+                added += len(thumb)
+        with self._lock:
+            self.writes += 1
+            if self._usage is not None:
+                self._usage += added
+            # Age-based expiry only needs an occasional sweep
+            due = self._usage is None or self._usage > self.quota_bytes or self.writes % 100 == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Delete expired photos, then the least recently uploaded ones until under 90% of the quota."""
+        if not self._evict_lock.acquire(blocking=False):
+            return  # another thread is already sweeping
+        try:
+            entries, total = [], 0
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if not entry.is_file() or not _NAME_RE.fullmatch(entry.name):
+                        continue
+                    st = entry.stat()
+                    size = st.st_size
+                    try:
+                        size += os.path.getsize(self._thumb_path(entry.name))
+                    except OSError:
+                        pass
+                    entries.append((st.st_mtime, entry.name, size))
+                    total += size
+            entries.sort()
+            target = self.quota_bytes * 0.9 if total > self.quota_bytes else total
+            cutoff = time.time() - self.max_age if self.max_age > 0 else 0
+            evicted = 0
+            for mtime, name, size in entries:
+                if total <= target and mtime >= cutoff:
+                    break
+                for path in (os.path.join(self.folder, name), self._thumb_path(name)):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        logging.error("Failed to evict upload %s: %s", path, e)
+                total -= size
+                evicted += 1
+            with self._lock:
+                self._usage = total
+                self.evicted += evicted
+        finally:
+            self._evict_lock.release()
+
+    def send(self, name: str, thumbnail: bool = False):
+        if not _NAME_RE.fullmatch(name):
+            abort(404)
+        # The result page can ask for the image before its background write is done
+        self.wait(name)
+        if thumbnail:
+            response = send_from_directory(os.path.join(self.folder, self.THUMBS),
+                                           os.path.splitext(name)[0] + ".jpg", max_age=CACHE_MAX_AGE)
+        else:
+            response = send_from_directory(self.folder, name, max_age=CACHE_MAX_AGE)
+        # Medical photos: browsers may cache them for good, shared caches may not
+        response.cache_control.private = True
+        response.cache_control.public = False
+        response.cache_control.immutable = True
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "bytes": self._usage,
+                "quota_bytes": self.quota_bytes,
+                "pending_writes": len(self._pending),
+                "writes": self.writes,
+                "duplicates": self.duplicates,
+                "evicted": self.evicted,
+            }
+
+
+upload_store = UploadStore()
+
+
+@uploads_bp.route("/<name>")
+def original(name):
+    return upload_store.send(name)
+
+
+@uploads_bp.route("/thumbs/<name>")
+def thumbnail(name):
+    return upload_store.send(name, thumbnail=True)
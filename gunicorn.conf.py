@@ -0,0 +1,48 @@
+"""Gunicorn settings: `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+With GUNICORN_PRELOAD=1 the app is created in the master with
+MODEL_PRELOAD=fork before the workers are forked. With an in-process
+backend (INFERENCE_EXECUTOR=inline) the model weights are then loaded once
+and shared copy-on-write by every worker instead of being loaded by each
+of them. That is off by default: TensorFlow, ONNX Runtime and the TFLite
+XNNPACK delegate may start threads while loading a model, and threads do
+not survive a fork. Check a backend with the real model files first:
+`python benchmarks/worker_memory.py` fails when the preloaded workers do
+not become ready, and measures the memory saved.
+
+With INFERENCE_EXECUTOR=process preloading shares no weights: the master
+holds no model, and every worker starts its own pool of inference
+processes that each load every model.
+"""
+import os
+import logging
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+if preload_app:
+    if os.getenv("INFERENCE_EXECUTOR", "inline") == "process":
+        logging.warning("GUNICORN_PRELOAD=1 shares no model weights with INFERENCE_EXECUTOR=process: "
+                        "each worker's inference processes load their own models")
+    else:
+        logging.warning("GUNICORN_PRELOAD=1 loads the %s models before forking; make sure the backend "
+                        "survives a fork (see benchmarks/worker_memory.py)", os.getenv("INFERENCE_BACKEND", "keras"))
+    # Load (but do not warm up) the models in the master, before the workers are forked
+    os.environ.setdefault("MODEL_PRELOAD", "fork")
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        from features.prefork import before_fork
+        before_fork(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from features.prefork import after_fork
+        after_fork(server.app.wsgi())
@@ -59,10 +59,66 @@ async function sendMessage() {
     return html;
   }
   
+  // Default for an `error` event: its own bot message where the page has a #chat-box, else the console
+  function showStreamError(message) {
+    if (document.getElementById("chat-box")) addMessage(message, "bot");
+    else console.error(message);
+  }
+
+  // Stream a reply from /chat/api/chat/stream (Server-Sent Events over a POST).
+  // handlers: onToken(text), onSection(html), onError(message) and onDone(html), all optional.
+  // An `error` event is shown as its own message (or passed to onError), never appended to the reply.
+  async function streamChat(message, handlers = {}) {
+    const response = await fetch("/chat/api/chat/stream", {
+      method: "POST",
+      headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
+      body: JSON.stringify({ message }),
+    });
+    if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let reply = null;
+    const dispatch = (raw) => {
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      if (!data) return;
+      const payload = JSON.parse(data);
+      if (event === "token" && handlers.onToken) handlers.onToken(payload.text);
+      else if (event === "section" && handlers.onSection) handlers.onSection(payload.html);
+      else if (event === "error") (handlers.onError || showStreamError)(payload.message);
+      else if (event === "done") {
+        reply = payload.reply;
+        if (handlers.onDone) handlers.onDone(reply);
+      }
+    };
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let end;
+      while ((end = buffer.indexOf("\n\n")) !== -1) {
+        dispatch(buffer.slice(0, end));
+        buffer = buffer.slice(end + 2);
+      }
+    }
+    if (buffer.trim()) dispatch(buffer);
+    if (reply === null) throw new Error("Stream ended early");
+    return reply;
+  }
+
   // Auto-resize textarea
   const textarea = document.getElementById("user-input");
-  textarea.addEventListener("input", () => {
-    textarea.style.height = "auto";
-    textarea.style.height = textarea.scrollHeight + "px";
-  });
+  if (textarea) {
+    textarea.addEventListener("input", () => {
+      textarea.style.height = "auto";
+      textarea.style.height = textarea.scrollHeight + "px";
+    });
+  }
   
\ No newline at end of file
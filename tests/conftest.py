@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# The app is run from the repository root (`python app.py`), not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app with its database, uploads and (absent) models under tmp_path; models load on first use."""
+    env = {
+        "DATABASE": str(tmp_path / "dermaai.db"),
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "MODELS_DIR": str(tmp_path / "models"),
+        "MODEL_PRELOAD": "lazy",
+    }
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    from app import create_app
+    app = create_app()
+    app.config["TESTING"] = True
+    yield app
+    app.extensions["sqlite_pool"].close_all()
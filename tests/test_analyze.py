@@ -0,0 +1,98 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from features.executor import InferenceBusy
+from features.ml_utils import model_registry
+
+
+def jpeg() -> bytes:
+    out = io.BytesIO()
+    Image.fromarray(np.full((32, 32, 3), 128, dtype="uint8")).save(out, "JPEG")
+    return out.getvalue()
+
+
+class FakeClassifier:
+    input_w = input_h = 224
+    tta_views = 1
+    version = "v1"
+
+    def __init__(self, name, label="psoriasis", error=None):
+        self.model_path = f"{name}.keras"
+        self.label, self.error = label, error
+        self.views = []
+
+    def predict_views(self, views):
+        self.views.append(views)
+        if self.error is not None:
+            raise self.error
+        return {"label": self.label, "probability": 0.91234}
+
+
+@pytest.fixture
+def models(monkeypatch):
+    loaded = {}
+    monkeypatch.setattr(model_registry, "get", lambda name: loaded.get(name))
+    return loaded
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 1
+    return client
+
+
+def analyze(client):
+    return client.post("/analyze/", data={"image": (io.BytesIO(jpeg()), "photo.jpg")})
+
+
+def test_both_models_share_one_decode(client, models):
+    models["skin"], models["nail"] = FakeClassifier("skin", "Eczema"), FakeClassifier("nail", "psoriasis")
+    response = analyze(client)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["skin"] == {"model": "skin.keras", "predicted": "Eczema", "confidence": 0.9123}
+    assert body["nail"]["predicted"] == "Psoriasis"
+    assert body["image_url"].startswith("/uploads/") and body["thumbnail_url"].startswith("/uploads/thumbs/")
+    assert models["skin"].views[0] is models["nail"].views[0]
+
+
+def test_unavailable_model_is_reported_next_to_the_other_result(client, models):
+    models["skin"] = FakeClassifier("skin")
+    response = analyze(client)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["nail"] == {"error": "Nail model not available"}
+    assert body["skin"]["predicted"] == "psoriasis"
+
+
+def test_failed_prediction_is_reported_per_model(client, models):
+    models["skin"] = FakeClassifier("skin", error=RuntimeError("bad weights"))
+    models["nail"] = FakeClassifier("nail")
+    response = analyze(client)
+    assert response.status_code == 200
+    assert response.get_json()["skin"] == {"error": "Prediction failed: bad weights"}
+
+
+def test_no_model_answering_is_a_503(client, models):
+    models["skin"] = FakeClassifier("skin", error=RuntimeError("bad weights"))
+    response = analyze(client)
+    assert response.status_code == 503
+    assert set(response.get_json()) >= {"skin", "nail"}
+
+
+def test_busy_executor_asks_the_client_to_retry(client, models):
+    models["skin"] = FakeClassifier("skin")
+    models["nail"] = FakeClassifier("nail", error=InferenceBusy(7))
+    response = analyze(client)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_analyze_requires_a_login_and_an_image(app, client):
+    assert app.test_client().post("/analyze/").status_code == 401
+    assert client.post("/analyze/").status_code == 400
@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+import pytest
+
+from features.batching import MicroBatcher, make_batcher
+
+
+def test_micro_batcher_runs_concurrent_requests_as_one_batch():
+    batches = []
+
+    def predict(x):
+        batches.append(x.shape[0])
+        return x.reshape(x.shape[0], -1)[:, :1] * 2
+
+    batcher = MicroBatcher("test", predict, max_batch_size=8, max_wait_ms=200)
+    inputs = [np.full((i + 1, 2, 2, 1), i, dtype="float32") for i in range(3)]
+    outputs = [None] * len(inputs)
+
+    def submit(i):
+        outputs[i] = batcher.submit(inputs[i], timeout=5)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(inputs))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    batcher.close()
+
+    assert batches == [6]
+    for i, out in enumerate(outputs):
+        np.testing.assert_array_equal(out, np.full((i + 1, 1), 2 * i))
+    stats = batcher.stats()
+    assert stats["requests"] == 3 and stats["batches"] == 1
+
+
+def test_micro_batcher_expands_a_single_image_and_restarts_after_close():
+    batcher = MicroBatcher("test", lambda x: x.sum(axis=(1, 2, 3)), max_batch_size=1, max_wait_ms=0)
+    assert batcher.submit(np.ones((2, 2, 1)), timeout=5).tolist() == [4.0]
+    batcher.close()
+    assert batcher.submit(np.ones((1, 2, 2, 1)), timeout=5).tolist() == [4.0]
+    batcher.close()
+
+
+def test_micro_batcher_propagates_prediction_errors():
+    def predict(x):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher("test", predict, max_wait_ms=0)
+    with pytest.raises(RuntimeError, match="model failed"):
+        batcher.submit(np.zeros((1, 2, 2, 1)), timeout=5)
+    batcher.close()
+
+
+def test_make_batcher_is_opt_in():
+    assert make_batcher("test", lambda x: x, {}) is None
+    batcher = make_batcher("test", lambda x: x, {"INFERENCE_BATCHING": True, "INFERENCE_BATCH_MAX_SIZE": 4})
+    assert batcher.max_batch_size == 4
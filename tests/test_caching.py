@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from features.caching import SingleFlight, TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_entries=4, ttl=10)
+    cache.set("default", 1)
+    cache.set("longer", 2, ttl=60)
+    now[0] += 11
+    assert cache.get("default") is None
+    assert cache.get("longer") == 2
+    assert cache.stats()["expired"] == 1
+
+
+def test_ttl_cache_with_no_entries_is_disabled():
+    cache = TTLCache(max_entries=0)
+    cache.set("a", 1)
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+
+
+def test_single_flight_shares_one_call_between_concurrent_callers():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", work)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", work))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while flight.stats()["shared"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "calls": 1, "shared": 3}
+
+
+def test_single_flight_propagates_errors_and_forgets_the_key():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: 42) == 42
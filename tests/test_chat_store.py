@@ -0,0 +1,68 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from features.chat_store import ChatStore
+from features.db import SQLitePool
+
+
+def store(backend="sqlite", db_path=None, **config):
+    """A ChatStore as one server process would have it; sqlite stores on one db_path share the database."""
+    chat = ChatStore()
+    extensions = {"sqlite_pool": SQLitePool(db_path)} if db_path else {}
+    chat.init_app(SimpleNamespace(config={"CHAT_STORE": backend, "CHAT_STORE_FLUSH_MS": 10_000, **config},
+                                  extensions=extensions))
+    return chat
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "dermaai.db")
+
+
+def test_history_follows_send_order_across_processes(db_path, monkeypatch):
+    first, second = store(db_path=db_path), store(db_path=db_path)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(time, "time", lambda: float(next(clock)))
+    # Worker 1 answers the question but flushes after worker 2 has written the follow-up
+    first.append("c1", "user", "What is eczema?")
+    first.append("c1", "bot", "A skin condition.")
+    second.append("c1", "user", "How is it treated?")
+    second.flush()
+    first.flush()
+
+    expected = ["What is eczema?", "A skin condition.", "How is it treated?"]
+    assert [m["content"] for m in second.history("c1")] == expected
+    assert [m["content"] for m in first.history("c1")] == expected
+
+
+def test_history_flushes_queued_messages_and_keeps_the_window(db_path):
+    chat = store(db_path=db_path, CHAT_HISTORY_WINDOW=3)
+    for i in range(5):
+        chat.append("c1", "user", f"message {i}")
+    chat.append("c2", "user", "other conversation")
+    assert [m["content"] for m in chat.history("c1")] == ["message 2", "message 3", "message 4"]
+    assert chat.history("unknown") == []
+    assert chat.stats()["rows_written"] == 6
+
+
+def test_history_query_walks_the_index_without_sorting(db_path):
+    chat = store(db_path=db_path)
+    conn = chat._pool.acquire()
+    plan = " ".join(row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT role, content FROM chat_messages WHERE conversation_id=?"
+        " ORDER BY created_at DESC, id DESC LIMIT ?", ("c1", 6)))
+    chat._pool.release(conn)
+    assert "idx_chat_messages_conversation_time" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_memory_backend_keeps_the_last_messages_per_conversation():
+    chat = store("memory", CHAT_HISTORY_WINDOW=2, CHAT_STORE_MAX_CONVERSATIONS=1)
+    for text in ("a", "b", "c"):
+        chat.append("c1", "user", text)
+    assert [m["content"] for m in chat.history("c1")] == ["b", "c"]
+    chat.append("c2", "user", "d")
+    # Only one conversation is kept
+    assert chat.history("c1") == []
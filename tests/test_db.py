@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from features.db import SQLitePool, get_db
+
+
+def test_connections_are_reused_up_to_the_pool_size(tmp_path):
+    pool = SQLitePool(str(tmp_path / "dermaai.db"), size=1)
+    a, b = pool.acquire(), pool.acquire()
+    assert pool.opened == 2
+    pool.release(a)
+    pool.release(b)  # beyond the pool size: closed
+    assert pool.acquire() is a
+    assert pool.opened == 2
+    with pytest.raises(sqlite3.ProgrammingError):
+        b.execute("SELECT 1")  # the surplus connection was closed
+
+
+def test_connections_use_wal_and_rows(tmp_path):
+    pool = SQLitePool(str(tmp_path / "dermaai.db"))
+    conn = pool.acquire()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    assert conn.execute("SELECT 1 AS one").fetchone()["one"] == 1
+    pool.release(conn)
+
+
+def test_uncommitted_work_is_rolled_back_on_release(tmp_path):
+    pool = SQLitePool(str(tmp_path / "dermaai.db"))
+    conn = pool.acquire()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    pool.release(conn)
+    conn = pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.release(conn)
+
+
+def test_size_zero_opens_a_connection_per_acquire(tmp_path):
+    pool = SQLitePool(str(tmp_path / "dermaai.db"), size=0)
+    for _ in range(3):
+        pool.release(pool.acquire())
+    assert pool.opened == 3
+
+
+def test_request_connection_returns_to_the_pool(app):
+    pool = app.extensions["sqlite_pool"]
+    with app.app_context():
+        conn = get_db()
+        assert get_db() is conn
+    with app.app_context():
+        assert get_db() is conn
+    assert pool.opened == 1
+
+
+def test_signup_and_login_go_through_the_pool(app):
+    client = app.test_client()
+    client.post("/signup", data={"firstName": "Ada", "lastName": "L", "email": "ada@example.com",
+                                 "password": "secret", "confirmPassword": "secret"})
+    response = client.post("/login", data={"email": "ada@example.com", "password": "secret"})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert session["user_email"] == "ada@example.com"
@@ -0,0 +1,26 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from features.executor import InferenceBusy, InferenceExecutor
+
+
+def test_full_queue_rejects_and_counts_every_call():
+    executor = InferenceExecutor()
+    executor.init_app(SimpleNamespace(config={"INFERENCE_EXECUTOR": "process", "INFERENCE_QUEUE_SIZE": 1}), {})
+    # Take the only slot, as a task in flight would
+    assert executor._slots.acquire(blocking=False)
+
+    def call():
+        for _ in range(200):
+            with pytest.raises(InferenceBusy):
+                executor.run("skin", np.zeros((1, 2, 2, 3), dtype="float32"))
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert executor.stats()["rejected"] == 1600
@@ -0,0 +1,32 @@
+"""Parity of an exported TFLite model with its Keras original (needs TensorFlow)."""
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from features.backends import backend_model_path  # noqa: E402
+from features.export_models import compare, export_tflite, sample_images  # noqa: E402
+from features.skin import SKIN_CLASSES  # noqa: E402
+
+
+@pytest.fixture
+def keras_model(tmp_path):
+    """A tiny randomly initialised stand-in for the skin model, saved as .keras."""
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.Input((224, 224, 3)),
+        tf.keras.layers.Conv2D(4, 3, strides=4, activation="relu"),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(len(SKIN_CLASSES), activation="softmax"),
+    ])
+    path = str(tmp_path / "skin.keras")
+    model.save(path)
+    return path
+
+
+def test_tflite_export_matches_keras(keras_model, tmp_path):
+    out_path = backend_model_path(keras_model, "tflite")
+    export_tflite(keras_model, out_path)
+    images = sample_images(str(tmp_path / "no-uploads"), synthetic=4)
+    assert len(images) == 4 and images[0].dtype == np.uint8
+    assert compare("skin", keras_model, "tflite", images, atol=1e-3)
@@ -0,0 +1,43 @@
+from features.faq_index import AhoCorasick, FAQIndex
+
+
+def test_aho_corasick_finds_overlapping_patterns_once():
+    matcher = AhoCorasick(["he", "she", "his", "hers"])
+    assert sorted(matcher.find("ushers")) == [0, 1, 3]
+    # Each pattern is reported once, however often it occurs
+    assert matcher.find("she said she") == [1, 0]
+    assert matcher.find("nothing") == []
+
+
+def test_faq_index_matches_names_and_aliases():
+    faq = {
+        "Skin": {"Eczema": {"id": "eczema"}, "Psoriasis": {"id": "psoriasis"}},
+        "Nail": {"Onychomycosis": {"id": "fungus"}},
+    }
+    index = FAQIndex(faq, {"Onychomycosis": ["nail fungus"]})
+    assert len(index) == 3
+    assert index.match("what is eczema?")[1] == "Eczema"
+    assert index.match("i think i have nail fungus")[1] == "Onychomycosis"
+    assert index.match("tell me about acne") is None
+
+
+def test_faq_index_ties_go_to_the_first_listed_condition():
+    faq = {"Skin": {"Eczema": {}, "Psoriasis": {}}}
+    index = FAQIndex(faq)
+    # Psoriasis appears first in the query, but Eczema is listed first
+    assert index.match("psoriasis or eczema")[1] == "Eczema"
+    assert [c for _, c, _ in index.match_all("psoriasis or eczema")] == ["Eczema", "Psoriasis"]
+
+
+def test_empty_pattern_keeps_the_ids_of_the_patterns_after_it():
+    matcher = AhoCorasick(["acne", "", "rash"])
+    assert matcher.patterns == ["acne", "", "rash"]
+    assert matcher.find("a rash") == [2]
+
+
+def test_empty_alias_does_not_shift_matches_to_other_entries():
+    faq = {"Skin": {"Eczema": {}, "Psoriasis": {}, "Rosacea": {}}}
+    index = FAQIndex(faq, {"Eczema": ["", "  "], "Psoriasis": ["plaques"]})
+    assert index.match("red plaques on my elbows")[1] == "Psoriasis"
+    assert index.match("what is rosacea")[1] == "Rosacea"
+    assert index.match("hello") is None
@@ -0,0 +1,112 @@
+import io
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from features.db import SQLitePool
+from features.jobs import JobStore
+from features.ml_utils import model_registry
+
+
+def worker(db_path, **config):
+    """A JobStore as a separate server process would have it: its own pool on the shared database."""
+    store = JobStore()
+    store.init_app(SimpleNamespace(config=config, extensions={"sqlite_pool": SQLitePool(db_path)}))
+    return store
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_job_progress_and_results_are_visible_to_another_worker(tmp_path):
+    db = str(tmp_path / "dermaai.db")
+    accepting, polling = worker(db), worker(db)
+    first_chunk_saved, finish = threading.Event(), threading.Event()
+
+    def work(job):
+        job.results.append({"filename": "a.jpg", "predicted": "Eczema"})
+        accepting.save(job)
+        first_chunk_saved.set()
+        finish.wait(5)
+        job.results.append({"filename": "b.jpg", "predicted": "Normal"})
+
+    job = accepting.submit("skin", 7, work, total=2)
+    assert first_chunk_saved.wait(5)
+    seen = polling.get(job.id)
+    assert (seen.status, seen.completed, seen.total, seen.owner) == ("running", 1, 2, 7)
+    # Results are only published once the whole job is done
+    assert seen.to_dict()["results"] == []
+
+    finish.set()
+    wait_for(lambda: polling.get(job.id).status == "done")
+    done = polling.get(job.id).to_dict()
+    assert done["completed"] == 2
+    assert [r["predicted"] for r in done["results"]] == ["Eczema", "Normal"]
+    assert done["finished_at"] >= done["created_at"]
+
+
+def test_failed_job_reports_its_error(tmp_path):
+    store = worker(str(tmp_path / "dermaai.db"))
+
+    def work(job):
+        raise RuntimeError("model crashed")
+
+    job = store.submit("nail", 1, work, total=1)
+    wait_for(lambda: store.get(job.id).status == "failed")
+    assert store.get(job.id).error == "model crashed"
+
+
+def test_expired_jobs_are_dropped_on_the_next_submit(tmp_path):
+    store = worker(str(tmp_path / "dermaai.db"), JOB_TTL_SECONDS=60)
+    old = store.submit("skin", 1, lambda job: None, total=0)
+    wait_for(lambda: store.get(old.id).status == "done")
+    store._execute("UPDATE jobs SET created_at=created_at-120, finished_at=finished_at-120 WHERE id=?", (old.id,))
+    store.submit("skin", 1, lambda job: None, total=0)
+    assert store.get(old.id) is None
+    assert store.get("no-such-job") is None
+
+
+class FakeClassifier:
+    model_path = "fake.keras"
+    version = "v1"
+
+    def predict_many(self, images_bytes):
+        return [ValueError("not an image") if data == b"broken" else {"label": "psoriasis", "probability": 0.87654}
+                for data in images_bytes]
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setattr(model_registry, "get", lambda name: FakeClassifier())
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 1
+    return client
+
+
+def test_batch_api_runs_a_job_and_serves_it_to_its_owner_only(app, client):
+    response = client.post("/nail/api/predict", data={"images": [
+        (io.BytesIO(b"image"), "a.jpg"), (io.BytesIO(b"broken"), "b.jpg")]})
+    assert response.status_code == 202
+    status_url = response.get_json()["status_url"]
+
+    wait_for(lambda: client.get(status_url).get_json()["status"] == "done")
+    results = client.get(status_url).get_json()["results"]
+    assert results[0] == {"filename": "a.jpg", "predicted": "Psoriasis", "confidence": 0.8765}
+    assert results[1]["filename"] == "b.jpg" and "error" in results[1]
+
+    # Another user, or the other model's route, does not see the job
+    assert client.get(status_url.replace("/nail/", "/skin/")).status_code == 404
+    with client.session_transaction() as session:
+        session["user_id"] = 2
+    assert client.get(status_url).status_code == 404
+
+
+def test_batch_api_requires_a_login(app):
+    assert app.test_client().post("/skin/api/predict").status_code == 401
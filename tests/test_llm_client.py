@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.stub_llm import REPLY, StubLLMHandler, serve
+from features.llm_client import LLMClient, LLMError
+
+MESSAGES = [{"role": "user", "content": "What is eczema?"}]
+
+
+def client_for(server, **config):
+    client = LLMClient()
+    client.init_app(SimpleNamespace(config={
+        "GROQ_API_URL": f"http://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions",
+        "GROQ_API_KEY": "test", **config}))
+    client.backoff = 0.0
+    return client
+
+
+def serve_handler(**attrs):
+    """The stub with some of its handler's behaviour replaced."""
+    handler = type("Handler", (StubLLMHandler,), {"connections": set(), **attrs})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def servers():
+    started = []
+    yield started
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+def test_completion_reuses_one_connection(servers):
+    server = serve()
+    servers.append(server)
+    client = client_for(server)
+    for _ in range(3):
+        body = client.chat_completion(MESSAGES)
+        assert json.loads(body["choices"][0]["message"]["content"]) == REPLY
+    assert len(server.RequestHandlerClass.connections) == 1
+    assert client.stats()["calls"] == 3
+
+
+def test_5xx_is_retried_a_bounded_number_of_times(servers):
+    server = serve(fail_rate=1.0)
+    servers.append(server)
+    client = client_for(server, LLM_MAX_RETRIES=2)
+    # The last answer is returned as is, error body included
+    assert client.chat_completion(MESSAGES)["error"]["message"] == "stub overloaded"
+    stats = client.stats()
+    assert (stats["attempts"], stats["retries"]) == (3, 2)
+
+
+def test_retry_waits_for_retry_after(servers):
+    answered = []
+
+    def do_POST(self):
+        answered.append(time.monotonic())
+        if len(answered) == 1:
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._send(429, {"error": {"message": "rate limited"}}, {"Retry-After": "1"})
+            return
+        StubLLMHandler.do_POST(self)
+
+    server = serve_handler(do_POST=do_POST)
+    servers.append(server)
+    body = client_for(server).chat_completion(MESSAGES)
+    assert "choices" in body
+    assert answered[1] - answered[0] >= 0.95
+
+
+def test_read_timeout_is_not_retried(servers):
+    server = serve(latency_ms=500)
+    servers.append(server)
+    client = client_for(server, LLM_READ_TIMEOUT=0.1)
+    with pytest.raises(LLMError, match="timed out"):
+        client.chat_completion(MESSAGES)
+    assert client.stats()["attempts"] == 1
+    assert client.stats()["errors"] == 1
+
+
+def test_connection_errors_raise_after_the_retries(servers):
+    server = serve()
+    port = server.server_address[1]
+    server.shutdown()
+    server.server_close()
+    client = client_for(SimpleNamespace(server_address=("127.0.0.1", port)), LLM_MAX_RETRIES=1)
+    with pytest.raises(LLMError, match="request failed"):
+        client.chat_completion(MESSAGES)
+    assert client.stats()["attempts"] == 2
+
+
+def test_calls_beyond_the_concurrency_limit_are_rejected(servers):
+    server = serve(latency_ms=500)
+    servers.append(server)
+    client = client_for(server, LLM_MAX_CONCURRENCY=1, LLM_CONNECT_TIMEOUT=0.05)
+    slow = threading.Thread(target=client.chat_completion, args=(MESSAGES,))
+    slow.start()
+    time.sleep(0.1)
+    with pytest.raises(LLMError, match="Too many"):
+        client.chat_completion(MESSAGES)
+    slow.join()
+    assert client.stats()["rejected"] == 1
+
+
+def test_stream_yields_the_reply_in_pieces(servers):
+    server = serve()
+    servers.append(server)
+    pieces = list(client_for(server).stream_chat_completion(MESSAGES))
+    assert len(pieces) > 1
+    assert json.loads("".join(pieces)) == REPLY
+
+
+def test_stream_cut_off_before_done_raises(servers):
+    def _stream(self, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunk = {"choices": [{"index": 0, "delta": {"content": content[:8]}}]}
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.close_connection = True
+
+    server = serve_handler(_stream=_stream)
+    servers.append(server)
+    stream = client_for(server).stream_chat_completion(MESSAGES)
+    assert next(stream)
+    with pytest.raises(LLMError, match="before \\[DONE\\]"):
+        next(stream)
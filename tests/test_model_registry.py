@@ -0,0 +1,68 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from features.ml_utils import ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, path):
+        self.model_path = path
+        self.version = "v1"
+
+    def predict_batch(self, batch):
+        return np.zeros((len(batch), 2))
+
+
+def file_loader(path):
+    with open(path):
+        return FakeModel(path)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def registry(tmp_path):
+    def make(preload, **config):
+        registry = ModelRegistry()
+        registry.register("skin", "skin.keras", file_loader, (4, 4), ["a", "b"])
+        registry.init_app(SimpleNamespace(config={"MODELS_DIR": str(tmp_path), "MODEL_PRELOAD": preload, **config}))
+        return registry
+    return make
+
+
+def test_readiness_probe_loads_lazy_models(registry, tmp_path):
+    (tmp_path / "skin.keras").write_bytes(b"weights")
+    models = registry("lazy")
+    assert models.wrapper("skin").state == "pending"
+    # The first probe starts the load in the background instead of waiting for a request
+    models.ready()
+    assert wait_for(lambda: models.wrapper("skin").state == "ready")
+    assert models.ready()
+    assert models.wrapper("skin").state == "ready"
+
+
+def test_failed_load_is_retried_once_the_file_appears(registry, tmp_path):
+    models = registry("eager", MODEL_RETRY_SECONDS=3600)
+    assert models.wrapper("skin").state == "failed"
+    assert models.get("skin") is None
+    (tmp_path / "skin.keras").write_bytes(b"weights")
+    assert wait_for(models.ready)
+    assert models.wrapper("skin").error is None
+
+
+def test_failed_load_waits_for_the_backoff(registry):
+    models = registry("eager", MODEL_RETRY_SECONDS=3600)
+    wrapper = models.wrapper("skin")
+    assert not wrapper.retry_due()
+    wrapper._failed_at -= 3600
+    assert wrapper.retry_due()
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from features.pdf import RoutinePDFRenderer, routine_etag, routine_pdf
+
+PLAN = {"skin_analysis": "Oily <b>skin</b> & shine", "morning_routine": ["Cleanser", "SPF 50"],
+        "evening_routine": ["Retinoid"], "diet_tips": [], "lifestyle": ["Sleep"]}
+
+
+def test_etag_depends_on_content_not_key_order():
+    assert routine_etag(PLAN) == routine_etag(dict(reversed(list(PLAN.items()))))
+    assert routine_etag(PLAN) != routine_etag({**PLAN, "lifestyle": ["Sleep", "Exercise"]})
+
+
+def test_each_plan_is_rendered_once():
+    renderer = RoutinePDFRenderer()
+    etag, pdf = renderer.render(PLAN)
+    assert pdf.startswith(b"%PDF")
+    assert renderer.render(dict(PLAN)) == (etag, pdf)
+    renderer.render({**PLAN, "diet_tips": ["Water"]})
+    assert renderer.renders == 2
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 1
+        session["routine"] = PLAN
+    return client
+
+
+def test_download_revalidates_with_etag(client):
+    first = client.get("/routine/download")
+    assert first.status_code == 200
+    assert first.mimetype == "application/pdf" and first.data.startswith(b"%PDF")
+    assert first.headers["ETag"] == f'"{routine_etag(PLAN)}"'
+    assert "private" in first.headers["Cache-Control"]
+
+    again = client.get("/routine/download", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
+
+    with client.session_transaction() as session:
+        session["routine"] = {**PLAN, "lifestyle": ["Walks"]}
+    changed = client.get("/routine/download", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200 and changed.headers["ETag"] != first.headers["ETag"]
+
+
+def test_prerender_fills_the_cache_in_the_background(app):
+    app.config["PDF_PRERENDER"] = True
+    routine_pdf.init_app(app)
+    try:
+        renders = routine_pdf.renders
+        routine_pdf.prerender({**PLAN, "skin_analysis": "Prerendered"})
+        deadline = time.monotonic() + 10
+        while routine_pdf.renders == renders and time.monotonic() < deadline:
+            time.sleep(0.01)
+        routine_pdf.render({**PLAN, "skin_analysis": "Prerendered"})
+        assert routine_pdf.renders == renders + 1
+    finally:
+        app.config["PDF_PRERENDER"] = False
+        routine_pdf.init_app(app)
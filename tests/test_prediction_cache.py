@@ -0,0 +1,119 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from features.ml_utils import model_file_version
+from features.prediction_cache import PredictionCache
+
+
+class FakeClassifier:
+    def __init__(self, model_path, tta_views=1):
+        self.model_path = model_path
+        self.version = model_file_version(model_path)
+        self.tta_views = tta_views
+        self.calls = 0
+
+    def predict(self, image_bytes):
+        self.calls += 1
+        return {"label": f"{os.path.basename(self.model_path)}:{self.version}", "probability": 0.9}
+
+    def predict_many(self, images_bytes):
+        self.calls += 1
+        return [self.predict(b) for b in images_bytes]
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    path = tmp_path / "skin.keras"
+    path.write_bytes(b"v1")
+    return path
+
+
+def replace(path, content):
+    path.write_bytes(content)
+    # Make sure the version changes even on filesystems with coarse timestamps
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_repeated_image_is_served_from_the_cache(model_file):
+    cache, clf = PredictionCache(), FakeClassifier(str(model_file))
+    first = cache.predict("skin", clf, b"image")
+    assert cache.predict("skin", clf, b"image") == first
+    assert cache.predict("skin", clf, b"other image") == first
+    assert clf.calls == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_replaced_model_file_invalidates_its_predictions(model_file):
+    cache = PredictionCache()
+    cache.version_check_seconds = 0
+    old = FakeClassifier(str(model_file))
+    cache.predict("skin", old, b"image")
+
+    replace(model_file, b"v2 weights")
+    # The loaded model no longer matches its file: bypass the cache and drop nothing new
+    cache.predict("skin", old, b"image")
+    assert old.calls == 2
+
+    new = FakeClassifier(str(model_file))
+    result = cache.predict("skin", new, b"image")
+    assert result["label"].endswith(new.version)
+    assert cache.predict("skin", new, b"image") == result
+    assert new.calls == 1
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_model_file_is_stat_ed_at_most_once_per_interval(model_file, monkeypatch):
+    import features.prediction_cache as module
+
+    stats = []
+    monkeypatch.setattr(module, "model_file_version", lambda path: stats.append(path) or model_file_version(path))
+    cache, clf = PredictionCache(), FakeClassifier(str(model_file))
+    for _ in range(5):
+        cache.predict("skin", clf, b"image")
+    cache.predict_many("skin", clf, [b"a", b"b"])
+    assert len(stats) == 1
+
+
+def test_disk_cache_survives_a_restart(model_file, tmp_path):
+    settings = SimpleNamespace(config={"PREDICTION_CACHE_DB": str(tmp_path / "prediction_cache.db")})
+    clf = FakeClassifier(str(model_file))
+    first = PredictionCache()
+    first.init_app(settings)
+    first.predict("skin", clf, b"image")
+    first.close()
+
+    second = PredictionCache()
+    second.init_app(settings)
+    assert second.predict("skin", clf, b"image")["probability"] == 0.9
+    assert clf.calls == 1
+    assert second.stats()["disk_hits"] == 1
+    second.close()
+
+
+def test_disk_cache_lives_next_to_the_configured_database(tmp_path, monkeypatch):
+    monkeypatch.setenv("PREDICTION_CACHE_PERSIST", "1")
+    monkeypatch.setenv("DATABASE", str(tmp_path / "data" / "dermaai.db"))
+    monkeypatch.setenv("UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setenv("MODEL_PRELOAD", "lazy")
+    (tmp_path / "data").mkdir()
+    from app import create_app
+    from features.prediction_cache import prediction_cache
+    app = create_app()
+    app.extensions["sqlite_pool"].close_all()
+    prediction_cache.close()
+    assert app.config["PREDICTION_CACHE_DB"] == str(tmp_path / "data" / "prediction_cache.db")
+
+
+def test_tta_predictions_are_cached_apart_from_single_view_ones(model_file):
+    cache = PredictionCache()
+    single, tta = FakeClassifier(str(model_file)), FakeClassifier(str(model_file), tta_views=4)
+    cache.predict("skin", single, b"image")
+    cache.predict("skin", tta, b"image")
+    assert (single.calls, tta.calls) == (1, 1)
+    cache.predict("skin", tta, b"image")
+    cache.predict_many("skin", tta, [b"image"])
+    assert tta.calls == 1
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,73 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageOps
+
+from features.preprocessing import (REUSED_BUFFER_ROWS, batch_buffer, decode_image, efficientnet_batch,
+                                    resnet50_batch)
+
+
+def random_images(n, size=(224, 224), seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (size[1], size[0], 3), dtype="uint8") for _ in range(n)]
+
+
+def caffe_reference(images):
+    """keras.applications.resnet50.preprocess_input ("caffe" mode), written out."""
+    x = np.stack(images).astype("float32")[..., ::-1]
+    return x - np.array([103.939, 116.779, 123.68], dtype="float32")
+
+
+def test_resnet50_batch_matches_caffe_preprocessing():
+    images = random_images(3)
+    np.testing.assert_allclose(resnet50_batch(images), caffe_reference(images), atol=1e-4)
+
+
+def test_efficientnet_batch_is_a_float_copy():
+    images = random_images(2)
+    batch = efficientnet_batch(images)
+    assert batch.dtype == np.float32
+    np.testing.assert_array_equal(batch, np.stack(images).astype("float32"))
+
+
+def test_batches_match_keras_preprocess_input():
+    keras = pytest.importorskip("tensorflow").keras
+    images = random_images(2)
+    reference = np.stack(images).astype("float32")
+    np.testing.assert_allclose(resnet50_batch(images),
+                               keras.applications.resnet50.preprocess_input(reference.copy()), atol=1e-4)
+    np.testing.assert_allclose(efficientnet_batch(images),
+                               keras.applications.efficientnet.preprocess_input(reference.copy()), atol=1e-4)
+
+
+def test_batch_buffer_is_reused_up_to_the_cap():
+    small = batch_buffer(4, 8, 8)
+    assert np.shares_memory(small, batch_buffer(2, 8, 8))
+    large = batch_buffer(REUSED_BUFFER_ROWS + 1, 8, 8)
+    assert large.shape == (REUSED_BUFFER_ROWS + 1, 8, 8, 3)
+    assert not np.shares_memory(large, batch_buffer(REUSED_BUFFER_ROWS + 1, 8, 8))
+    assert not np.shares_memory(large, batch_buffer(4, 8, 8))
+
+
+def jpeg_bytes(image, **save_args):
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=95, **save_args)
+    return out.getvalue()
+
+
+def test_decode_image_applies_exif_orientation():
+    # Left half red, right half blue, stored rotated as a camera would
+    image = Image.new("RGB", (400, 300), (0, 0, 255))
+    image.paste((255, 0, 0), (0, 0, 200, 300))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    data = jpeg_bytes(image, exif=exif)
+
+    decoded = decode_image(data, (224, 224))
+    upright = np.asarray(ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB")
+                         .resize((224, 224), Image.BILINEAR))
+    assert decoded.shape == (224, 224, 3) and decoded.dtype == np.uint8
+    # Orientation 6 turns the left (red) half into the top half
+    assert decoded[10, 112, 0] > 200 and decoded[200, 112, 2] > 200
+    assert np.abs(decoded.astype(int) - upright.astype(int)).mean() < 3
@@ -0,0 +1,60 @@
+import pytest
+
+from features.response_cache import ResponseCache, normalize_query, same_question
+
+
+def test_normalize_query_ignores_order_case_stopwords_and_suffixes():
+    assert normalize_query("How do I treat dandruff?") == "dandruff treat"
+    assert normalize_query("Dandruff treatment") == "dandruff treat"
+    assert normalize_query("Is THE best cream for eczema") == normalize_query("eczema: best cream?")
+
+
+def test_normalize_query_keeps_negations_and_numbers():
+    assert normalize_query("can I use retinol") != normalize_query("can I not use retinol")
+    assert normalize_query("1% hydrocortisone") != normalize_query("2.5% hydrocortisone")
+
+
+def test_normalize_query_of_only_stopwords_is_empty():
+    assert normalize_query("can you please?") == ""
+
+
+NEAR_MISSES = [
+    ("hydrocortisone cream on my baby face eczema", "hydrocortisone cream on my face eczema"),
+    ("stop using minoxidil for hair loss", "start using minoxidil for hair loss"),
+    ("is ketoconazole safe while pregnant", "is ketoconazole safe while breastfeeding"),
+    ("tretinoin 0.025 for acne", "tretinoin 0.05 for acne"),
+]
+
+
+@pytest.mark.parametrize("cached, asked", NEAR_MISSES)
+@pytest.mark.parametrize("threshold", [1.0, 0.5])
+def test_different_questions_never_share_a_reply(cached, asked, threshold):
+    cache = ResponseCache(similarity=threshold)
+    cache.set(cached, "reply")
+    assert cache.get(asked) is None
+    assert cache.get(cached) == "reply"
+
+
+def test_reworded_question_hits_the_exact_key_by_default():
+    cache = ResponseCache()
+    cache.set("How do I treat dandruff?", "reply")
+    assert cache.get("dandruff treatment") == "reply"
+    assert cache.stats()["hits"] == 1
+
+
+def test_typos_only_match_when_fuzzy_matching_is_enabled():
+    question, typo = "which psoriasis shampoo works on the scalp", "which psoriasys shampoo works on the scalp"
+    assert same_question(normalize_query(question), normalize_query(typo))
+
+    exact = ResponseCache()
+    exact.set(question, "reply")
+    assert exact.get(typo) is None
+
+    fuzzy = ResponseCache(similarity=0.7)
+    fuzzy.set(question, "reply")
+    assert fuzzy.get(typo) == "reply"
+    assert fuzzy.stats()["similar_hits"] == 1
+
+
+def test_short_words_must_match_exactly():
+    assert not same_question(normalize_query("acne on nose"), normalize_query("acne on nise"))
@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from features import routine
+from features.routine import RoutinePlanner, normalize_inputs
+
+PLAN = {"skin_analysis": "**Oily** skin", "morning_routine": ["Cleanser"], "evening_routine": ["Retinoid"],
+        "diet_tips": ["Water"], "lifestyle": ["Sleep"]}
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Stand-in for call_gemini that records prompts; set `delay`, `error` or `reply` to change its answer."""
+    fake = SimpleNamespace(prompts=[], delay=0.0, error=None, reply=json.dumps(PLAN), release=None)
+
+    def call(prompt):
+        fake.prompts.append(prompt)
+        if fake.release is not None:
+            fake.release.wait(5)
+        time.sleep(fake.delay)
+        if fake.error is not None:
+            raise fake.error
+        return fake.reply
+
+    monkeypatch.setattr(routine, "call_gemini", call)
+    return fake
+
+
+def planner(**config):
+    planner = RoutinePlanner()
+    planner.init_app(SimpleNamespace(config={"GEMINI_TIMEOUT": 5, **config}))
+    return planner
+
+
+def test_normalized_inputs_share_a_cache_entry():
+    assert normalize_inputs(" 025", "Oily ", "Latex and nuts", "None") == normalize_inputs(
+        "25", "oily", "nuts, LATEX", "")
+
+
+def test_plan_is_generated_once_and_cached(gemini):
+    plans = planner()
+    routine_plan, generated = plans.plan("25", "Oily", "nuts", "")
+    assert generated and routine_plan["skin_analysis"] == "Oily skin"
+    routine_plan["morning_routine"].append("changed by the caller")
+    again, generated = plans.plan("25", "oily", "Nuts", "none")
+    assert generated and again["morning_routine"] == ["Cleanser"]
+    assert len(gemini.prompts) == 1
+
+
+def test_prompt_keeps_the_inputs_as_entered(gemini):
+    planner().plan("25", "Combination, Oily T-zone", "Latex and Nuts", "Night shifts")
+    prompt = gemini.prompts[0]
+    assert "- Skin type: Combination, Oily T-zone" in prompt
+    assert "- Allergies: Latex and Nuts" in prompt
+    assert "- Lifestyle / Other concerns: Night shifts" in prompt
+
+
+def test_concurrent_requests_share_one_call(gemini):
+    plans, gemini.release = planner(), threading.Event()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(plans.plan("30", "dry", "", "")))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    while plans.stats()["coalescing"]["shared"] < 4:
+        time.sleep(0.01)
+    gemini.release.set()
+    for t in threads:
+        t.join(5)
+    assert len(gemini.prompts) == 1
+    assert [generated for _, generated in results] == [True] * 5
+
+
+def test_slow_call_answers_with_the_sample_plan_and_fills_the_cache_later(gemini):
+    plans, gemini.delay = planner(GEMINI_TIMEOUT=0.05), 0.3
+    routine_plan, generated = plans.plan("40", "normal", "", "")
+    assert not generated
+    assert routine_plan["skin_analysis"] == "Unable to generate routine. Showing sample plan."
+    assert plans.stats()["timeouts"] == 1
+    time.sleep(0.5)
+    _, generated = plans.plan("40", "normal", "", "")
+    assert generated and len(gemini.prompts) == 1
+
+
+@pytest.mark.parametrize("failure", ["error", "reply"])
+def test_failed_or_unparsable_answer_is_not_cached(gemini, failure):
+    if failure == "error":
+        gemini.error = RuntimeError("quota exceeded")
+    else:
+        gemini.reply = "Sorry, I cannot help with that."
+    plans = planner()
+    assert plans.plan("22", "dry", "", "")[1] is False
+    assert plans.plan("22", "dry", "", "")[1] is False
+    assert len(gemini.prompts) == 2
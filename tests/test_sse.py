@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from features import chatbot
+from features.llm_client import LLMError
+from features.response_cache import response_cache
+from features.sse import JSONSectionParser, sse_event
+
+
+def test_sse_event_format():
+    assert sse_event("token", {"text": "a"}) == 'event: token\ndata: {"text": "a"}\n\n'
+
+
+def test_json_section_parser_yields_sections_as_they_complete():
+    reply = '{"Definition": "An itchy rash, \\"often\\" on the hands.", "Recommendation": ["Moisturise", "See a GP"]}'
+    parser = JSONSectionParser()
+    pairs = []
+    for i in range(0, len(reply), 7):
+        pairs.extend(parser.feed(reply[i:i + 7]))
+    assert pairs == [
+        ("Definition", 'An itchy rash, "often" on the hands.'),
+        ("Recommendation", ["Moisturise", "See a GP"]),
+    ]
+    assert parser.text == reply
+
+
+def test_json_section_parser_waits_for_the_value_to_end():
+    parser = JSONSectionParser()
+    assert parser.feed('{"Definition": "a, b') == []
+    assert parser.feed(' and c",') == [("Definition", "a, b and c")]
+
+
+def test_json_section_parser_ignores_plain_text():
+    parser = JSONSectionParser()
+    assert parser.feed("Sorry, I can only answer skin questions.") == []
+    assert parser.text == "Sorry, I can only answer skin questions."
+
+
+def parse_events(body: str) -> list:
+    events = []
+    for raw in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in raw.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+REPLY = '{"Definition": "A dry, itchy rash.", "Recommendation": ["Moisturise daily."]}'
+
+
+@pytest.fixture
+def client(app):
+    response_cache.init_app(app)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 1
+    return client
+
+
+def fake_stream(pieces, fail=False):
+    def stream(messages, temperature=0.7):
+        yield from pieces
+        if fail:
+            raise LLMError("connection reset")
+    return stream
+
+
+def test_chat_stream_sends_sections_then_the_reply(client, monkeypatch):
+    pieces = [REPLY[i:i + 10] for i in range(0, len(REPLY), 10)]
+    monkeypatch.setattr(chatbot.llm_client, "stream_chat_completion", fake_stream(pieces))
+    response = client.post("/chat/api/chat/stream", json={"message": "what causes flaky skin patches"})
+    assert response.mimetype == "text/event-stream"
+    events = parse_events(response.get_data(as_text=True))
+    kinds = [kind for kind, _ in events]
+    assert kinds.count("section") == 2 and kinds[-1] == "done" and "error" not in kinds
+    assert "".join(data["text"] for kind, data in events if kind == "token") == REPLY
+    assert "Moisturise daily." in events[-1][1]["reply"]
+    assert response_cache.get("what causes flaky skin patches") == REPLY
+
+
+def test_chat_stream_failure_is_a_separate_event_and_not_cached(client, monkeypatch):
+    partial = REPLY[:REPLY.index('"Recommendation"') + 20]
+    monkeypatch.setattr(chatbot.llm_client, "stream_chat_completion", fake_stream([partial], fail=True))
+    response = client.post("/chat/api/chat/stream", json={"message": "why is my skin peeling"})
+    events = parse_events(response.get_data(as_text=True))
+    assert [kind for kind, _ in events][-2:] == ["error", "done"]
+    assert events[-2][1]["message"] == chatbot.GROQ_UNAVAILABLE
+    # The reply keeps the section completed before the failure, without the error or the cut-off one
+    reply = events[-1][1]["reply"]
+    assert "A dry, itchy rash." in reply and "Recommendation" not in reply and "⚠️" not in reply
+    assert response_cache.get("why is my skin peeling") is None
@@ -0,0 +1,90 @@
+import io
+import os
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+from features.uploads import UploadStore, image_extension, upload_store
+
+
+def photo(seed: int, size=(64, 48)) -> bytes:
+    """A distinct JPEG per seed (random pixels, so it does not compress to nothing)."""
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], 3), dtype="uint8")
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def make_store(tmp_path, **config):
+    store = UploadStore()
+    store.init_app(SimpleNamespace(config={"UPLOAD_FOLDER": str(tmp_path), "UPLOAD_PERSIST": "sync", **config}))
+    return store
+
+
+def stored(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name != UploadStore.THUMBS)
+
+
+def age(tmp_path, name, seconds):
+    past = time.time() - seconds
+    os.utime(tmp_path / name, (past, past))
+
+
+def test_same_photo_is_stored_once_with_a_thumbnail(tmp_path):
+    store = make_store(tmp_path)
+    name = store.save(photo(1))
+    assert store.save(photo(1)) == name
+    assert name.endswith(".jpg") and stored(tmp_path) == [name]
+    thumb = Image.open(tmp_path / "thumbs" / name)
+    assert thumb.format == "JPEG" and max(thumb.size) <= 256
+    assert store.stats()["duplicates"] == 1
+
+
+def test_quota_evicts_the_least_recently_uploaded_first(tmp_path):
+    sizes = [len(photo(i)) for i in range(3)]
+    store = make_store(tmp_path, UPLOAD_QUOTA_MB=(sum(sizes) * 1.2) / (1024 * 1024), UPLOAD_THUMB_SIZE=8)
+    names = [store.save(photo(i)) for i in range(3)]
+    for i, name in enumerate(names):
+        age(tmp_path, name, 300 - i * 100)
+    # Uploading the oldest photo again makes it the most recent
+    store.save(photo(0))
+    store.save(photo(3))
+    remaining = stored(tmp_path)
+    assert names[1] not in remaining
+    assert names[0] in remaining and store.stats()["evicted"] >= 1
+    assert not (tmp_path / "thumbs" / names[1]).exists()
+    assert store.stats()["bytes"] <= store.quota_bytes
+
+
+def test_photos_older_than_max_age_are_evicted(tmp_path):
+    store = make_store(tmp_path, UPLOAD_MAX_AGE_DAYS=1)
+    old, recent = store.save(photo(1)), store.save(photo(2))
+    age(tmp_path, old, 2 * 86400)
+    store.evict()
+    assert stored(tmp_path) == [recent]
+
+
+def test_off_mode_keeps_nothing(tmp_path):
+    store = make_store(tmp_path, UPLOAD_PERSIST="off")
+    assert store.save(photo(1)) is None
+    assert stored(tmp_path) == []
+
+
+def test_image_extension_comes_from_the_bytes():
+    assert image_extension(photo(1)) == ".jpg"
+    assert image_extension(b"\x89PNG\r\n\x1a\n....") == ".png"
+    assert image_extension(b"not an image") == ".bin"
+
+
+def test_uploads_are_served_privately_once_written(app):
+    app.config["UPLOAD_PERSIST"] = "async"
+    upload_store.init_app(app)
+    name = upload_store.save(photo(5))
+    client = app.test_client()
+    response = client.get(f"/uploads/{name}")
+    assert response.status_code == 200 and response.data == photo(5)
+    assert "private" in response.headers["Cache-Control"] and "immutable" in response.headers["Cache-Control"]
+    assert client.get(f"/uploads/thumbs/{name}").mimetype == "image/jpeg"
+    assert client.get("/uploads/..%2Fapp.py").status_code == 404